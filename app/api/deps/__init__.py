@@ -1,4 +1,6 @@
+from app.core import redis
 from app.services.keycloak_service import KeycloakService
+from app.services.user_service import UserService
 
 _keycloak_service: KeycloakService | None = None
 
@@ -8,3 +10,10 @@ def get_keycloak_service() -> KeycloakService:
     if _keycloak_service is None:
         _keycloak_service = KeycloakService()
     return _keycloak_service
+
+
+def get_user_service() -> UserService:
+    """Dependency function to get the cached (L1 + Redis) profile service"""
+    if redis.redis_client is None:
+        raise RuntimeError("Redis client not initialized. Make sure the app has started.")
+    return UserService(redis.redis_client, keycloak_service=get_keycloak_service())
@@ -1,23 +1,53 @@
-from fastapi import APIRouter, Depends, Path
+import json
+from typing import Literal, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Path, Query, Request, status
+from fastapi.responses import Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.core import redis
+from app.core.auth import require_roles
+from app.core.config import settings
+from app.db.database import get_db, get_read_db
 from app.services.certificate_service import CertificateService
-from app.services.keycloak_service import KeycloakService
-from app.schemas.certificate import CertificateVerifyResponse
-from app.api.deps import get_keycloak_service
+from app.services.certificate_renderer import MEDIA_TYPES, PDF, PNG
+from app.services.render_service import RenderService
+from app.services.issuance_service import CSV, NDJSON, IssuanceService, iter_lines, parse_rows
+from app.services.user_service import UserService
+from app.services.verify_cache import etag_matches
+from app.schemas.certificate import (
+    CertificateIssueReport,
+    CertificateVerifyBatchRequest,
+    CertificateVerifyBatchResponse,
+    CertificateVerifyResponse,
+)
+from app.api.deps import get_user_service
 
 
 
 
 router = APIRouter()
 
+# Lets browsers and the reverse proxy absorb repeat QR scans / shared-link opens
+VERIFY_CACHE_CONTROL = ", ".join([
+    "public" if settings.VERIFY_HTTP_PUBLIC else "private",
+    f"max-age={settings.VERIFY_HTTP_MAX_AGE}",
+    f"stale-while-revalidate={settings.VERIFY_HTTP_STALE_WHILE_REVALIDATE}",
+])
+
+
 # Dependency Injection Factory
 def get_certificate_service(
-    db: AsyncSession = Depends(get_db),
-    keycloak: KeycloakService = Depends(get_keycloak_service)
+    db: AsyncSession = Depends(get_read_db),
+    users: UserService = Depends(get_user_service)
 ) -> CertificateService:
-    return CertificateService(db=db, keycloak=keycloak)
+    return CertificateService(db=db, users=users)
+
+
+def get_render_service(
+    certificates: CertificateService = Depends(get_certificate_service)
+) -> RenderService:
+    return RenderService(certificates=certificates)
 
 
 @router.get(
@@ -33,11 +63,114 @@ async def verify_certificate(
         max_length=50,
         pattern=r"^[A-Z0-9-]+$"
     ),
+    if_none_match: Optional[str] = Header(None),
     service: CertificateService = Depends(get_certificate_service)
 ):
     """
         Endpoint to verify KSHRD certificate.
         It combines data from Postgres and Keycloak.
+        The service returns already validated JSON bytes, sent without re-serializing.
+        A matching If-None-Match is answered with 304 straight from the cached versions,
+        before anything is assembled or reloaded.
+    """
+    result = await service.get_by_code(code=code, if_none_match=if_none_match)
+    headers = {"ETag": result.etag, "Cache-Control": VERIFY_CACHE_CONTROL}
+
+    if result.body is None or etag_matches(if_none_match, result.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(content=result.body, media_type="application/json", headers=headers)
+
+
+@router.get(
+    "/{code}/render",
+    response_class=Response,
+    responses={200: {"content": {MEDIA_TYPES[PNG]: {}, MEDIA_TYPES[PDF]: {}}}},
+    summary="Render KSHRD Certificate as PNG or PDF"
+)
+async def render_certificate(
+    code: str = Path(
+        ...,
+        description="The verification code of the certificate.",
+        min_length=5,
+        max_length=50,
+        pattern=r"^[A-Z0-9-]+$"
+    ),
+    fmt: Literal["png", "pdf"] = Query(PNG, alias="format", description="Output format."),
+    if_none_match: Optional[str] = Header(None),
+    service: RenderService = Depends(get_render_service)
+):
+    """
+        Server-side rendering of the certificate's template layout, for email, print
+        and devices too slow to lay it out. Renders are cached on disk, keyed by the
+        template and data versions, so a re-request is a file read.
+    """
+    job = await service.prepare(code, fmt)
+    headers = {"ETag": job.etag, "Cache-Control": VERIFY_CACHE_CONTROL}
+
+    if etag_matches(if_none_match, job.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    content = await service.content(job)
+    headers["Content-Disposition"] = f'inline; filename="{code}.{fmt}"'
+    return Response(content=content, media_type=MEDIA_TYPES[fmt], headers=headers)
+
+
+@router.post(
+    "/verify:batch",
+    response_model=CertificateVerifyBatchResponse,
+    summary="Verify many KSHRD Certificates in one call"
+)
+async def verify_certificates(
+    request: CertificateVerifyBatchRequest,
+    service: CertificateService = Depends(get_certificate_service)
+):
+    """
+        Verify up to VERIFY_BATCH_MAX_CODES codes at once, for partner institutions
+        and the graduation portal. Unknown codes are reported with `found: false`.
+        Results are spliced from the cached JSON bytes, like the single verify.
+    """
+    if len(request.codes) > settings.VERIFY_BATCH_MAX_CODES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.VERIFY_BATCH_MAX_CODES} codes can be verified per request.",
+        )
+
+    results = await service.get_many_by_code(request.codes)
+
+    items = []
+    for code, result in results.items():
+        prefix = b'{"code":' + json.dumps(code).encode()
+        if result is None:
+            items.append(prefix + b',"found":false,"result":null}')
+        else:
+            items.append(prefix + b',"found":true,"result":' + result.body + b"}")
+
+    return Response(content=b'{"results":[' + b",".join(items) + b"]}", media_type="application/json")
+
+
+@router.post(
+    "/issue:bulk",
+    response_model=CertificateIssueReport,
+    summary="Bulk issue certificates from CSV or NDJSON"
+)
+async def issue_certificates(
+    request: Request,
+    fmt: Optional[Literal["csv", "ndjson"]] = Query(
+        None,
+        alias="format",
+        description="Input format; defaults from the Content-Type (text/csv or application/x-ndjson).",
+    ),
+    current_user: dict = Depends(require_roles(settings.ISSUANCE_ROLES)),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+        Issue certificates from the request body, one record per line: CSV with a header
+        (user_id, subject_id, type_id, issued_date[, certificate_number, verify_code, digital_url])
+        or NDJSON objects with the same fields. The body is streamed and processed in chunks;
+        rejected rows are listed in the report with their line number.
+        Needs one of the ISSUANCE_ROLES (Keycloak realm or client roles).
     """
-    result = await service.get_by_code(code=code)
-    return CertificateVerifyResponse(**result)
\ No newline at end of file
+    fmt = fmt or (NDJSON if "ndjson" in request.headers.get("content-type", "") else CSV)
+    service = IssuanceService(db, redis.redis_client)
+    return await service.issue(parse_rows(iter_lines(request.stream()), fmt))
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.services.certificate_type_service import CertificateTypeService
 from app.schemas.certificate_type import CertificateTypeCreate, CertificateTypeUpdate, CertificateTypeRead
 
@@ -14,6 +14,11 @@ def get_certificate_type_service(db: AsyncSession = Depends(get_db)) -> Certific
     return CertificateTypeService(db=db)
 
 
+def get_read_certificate_type_service(db: AsyncSession = Depends(get_read_db)) -> CertificateTypeService:
+    """For GET endpoints: served from the catalog snapshot, built from a replica if needed"""
+    return CertificateTypeService(db=db)
+
+
 @router.post(
     "/",
     response_model=CertificateTypeRead,
@@ -38,9 +43,9 @@ async def create_certificate_type(
 )
 async def get_certificate_types(
     current_user: dict = Depends(get_current_user),
-    service: CertificateTypeService = Depends(get_certificate_type_service)
+    service: CertificateTypeService = Depends(get_read_certificate_type_service)
 ):
-    return await service.get_all()
+    return Response(content=await service.get_all_json(), media_type="application/json")
 
 
 @router.get(
@@ -51,10 +56,10 @@ async def get_certificate_types(
 async def get_certificate_type(
     type_id: int = Path(..., description="The ID of the certificate type"),
     current_user: dict = Depends(get_current_user),
-    service: CertificateTypeService = Depends(get_certificate_type_service)
+    service: CertificateTypeService = Depends(get_read_certificate_type_service)
 ):
     try:
-        return await service.get_by_id(type_id)
+        return Response(content=await service.get_by_id_json(type_id), media_type="application/json")
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
@@ -1,34 +1,38 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 
 from app.core.auth import get_current_user
-from app.api.deps import get_keycloak_service
-from app.db.database import get_db
-from app.services.keycloak_service import KeycloakService
+from app.api.deps import get_user_service
+from app.db.database import get_read_db
+from app.services.user_service import UserService
 from app.services.certificate_service import CertificateService
 from app.schemas.user import UserProfile
-from app.schemas.certificate import CertificateListItem
+from app.core.config import settings
+from app.schemas.certificate import CertificateListPage
 from sqlalchemy.ext.asyncio import AsyncSession
 
 router = APIRouter()
 
 
 def get_certificate_service(
-    db: AsyncSession = Depends(get_db),
-    keycloak: KeycloakService = Depends(get_keycloak_service),
+    # The replica; pages read right after the user's certificates changed come from
+    # the primary instead (see CertificateService.get_page_by_user_id)
+    db: AsyncSession = Depends(get_read_db),
+    users: UserService = Depends(get_user_service),
 ) -> CertificateService:
-    return CertificateService(db=db, keycloak=keycloak)
+    return CertificateService(db=db, users=users)
 
 
 @router.get("/", response_model=UserProfile, summary="Get current user profile")
 async def get_me(
     current_user: dict = Depends(get_current_user),
-    keycloak: KeycloakService = Depends(get_keycloak_service),
+    users: UserService = Depends(get_user_service),
 ):
-    """Returns the full user profile from Keycloak for the authenticated user."""
+    """Returns the full user profile (cached, backed by Keycloak) for the authenticated user."""
     user_id = current_user.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
-    profile = await keycloak.get_user_profile(user_id)
+    profile = await users.get_user_profile(user_id)
     if not profile:
         raise HTTPException(status_code=404, detail="User profile not found")
     return profile
@@ -36,16 +40,26 @@ async def get_me(
 
 @router.get(
     "/certificates",
-    response_model=list[CertificateListItem],
+    response_model=CertificateListPage,
     summary="Get current user's certificates",
 )
 async def get_my_certificates(
+    cursor: Optional[str] = Query(None, max_length=200, description="next_cursor of the previous page"),
+    limit: int = Query(
+        settings.MY_CERTIFICATES_PAGE_SIZE, ge=1, le=settings.MY_CERTIFICATES_MAX_PAGE_SIZE
+    ),
     current_user: dict = Depends(get_current_user),
     service: CertificateService = Depends(get_certificate_service),
 ):
-    """Returns all certificates issued to the authenticated user."""
+    """
+    Returns the certificates issued to the authenticated user, newest first, one page at a time.
+    Since pagination the response is an object ({items, next_cursor}), no longer a bare list.
+    """
     user_id = current_user.get("sub")
     if not user_id:
         raise HTTPException(status_code=401, detail="Invalid token")
-    certs = await service.get_by_user_id(user_id)
-    return [CertificateListItem(**c) for c in certs]
+    try:
+        page = await service.get_page_by_user_id(user_id, cursor, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return Response(content=page, media_type="application/json")
@@ -1,9 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Path, status
+from fastapi import APIRouter, Depends, HTTPException, Path, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from uuid import UUID
 
 from app.core.auth import get_current_user
-from app.db.database import get_db
+from app.db.database import get_db, get_read_db
 from app.services.template_service import TemplateService
 from app.schemas.certificate_template import TemplateCreate, TemplateRead, TemplateUpdate
 
@@ -13,6 +13,11 @@ def get_template_service(db: AsyncSession = Depends(get_db)) -> TemplateService:
     return TemplateService(db=db)
 
 
+def get_read_template_service(db: AsyncSession = Depends(get_read_db)) -> TemplateService:
+    """For GET endpoints: served from the catalog snapshot, built from a replica if needed"""
+    return TemplateService(db=db)
+
+
 @router.post(
     "/",
     response_model=TemplateRead,
@@ -37,9 +42,9 @@ async def create_template(
 )
 async def get_templates(
     current_user: dict = Depends(get_current_user),
-    service: TemplateService = Depends(get_template_service)
+    service: TemplateService = Depends(get_read_template_service)
 ):
-    return await service.get_all()
+    return Response(content=await service.get_all_json(), media_type="application/json")
 
 
 @router.get(
@@ -50,10 +55,10 @@ async def get_templates(
 async def get_template(
     template_id: UUID = Path(..., description="The UUID of the template"),
     current_user: dict = Depends(get_current_user),
-    service: TemplateService = Depends(get_template_service)
+    service: TemplateService = Depends(get_read_template_service)
 ):
     try:
-        return await service.get_by_id(template_id)
+        return Response(content=await service.get_by_id_json(template_id), media_type="application/json")
     except ValueError as e:
         raise HTTPException(status_code=404, detail=str(e))
 
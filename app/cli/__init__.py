@@ -0,0 +1,4 @@
+"""
+Operational commands, run as modules from the project root, e.g.:
+    poetry run python -m app.cli.rebuild_verify_filter
+"""
@@ -0,0 +1,29 @@
+"""
+Rebuild the verify_code Bloom filter from Postgres and publish it to Redis.
+Running workers pick the new filter up within VERIFY_FILTER_SYNC_INTERVAL seconds.
+
+Usage:
+    poetry run python -m app.cli.rebuild_verify_filter
+"""
+import asyncio
+import time
+
+from app.core import redis
+from app.db.database import AsyncSessionLocal
+from app.services.verify_code_filter import verify_code_filter
+
+
+async def main():
+    await redis.init_redis()
+    try:
+        started = time.perf_counter()
+        async with AsyncSessionLocal() as db:
+            count = await verify_code_filter.rebuild(db, redis.redis_client)
+        elapsed = time.perf_counter() - started
+        print(f"✓ Verify code filter rebuilt with {count} codes in {elapsed:.2f}s")
+    finally:
+        await redis.close_redis()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
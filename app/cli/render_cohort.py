@@ -0,0 +1,54 @@
+"""
+Render the printable certificate of every student in a generation (and/or of a
+certificate type) into one ZIP. Rendering uses one process per core. If the job
+is interrupted, rerun the same command: certificates already rendered are skipped.
+
+Usage:
+    poetry run python -m app.cli.render_cohort --generation 13 --out gen13.zip
+    poetry run python -m app.cli.render_cohort --type 2 --format png --out type2.zip --workers 4
+"""
+import argparse
+import asyncio
+import logging
+import time
+from pathlib import Path
+
+from app.core import redis
+from app.core.keycloak import close_keycloak, init_keycloak
+from app.db.database import AsyncSessionLocal
+from app.services.certificate_renderer import PDF, PNG
+from app.services.cohort_render import CohortRender
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--generation", type=int, help="generation id")
+    parser.add_argument("--type", type=int, dest="type_id", help="certificate type id")
+    parser.add_argument("--format", choices=[PDF, PNG], default=PDF)
+    parser.add_argument("--out", type=Path, required=True, help="ZIP file to write")
+    parser.add_argument("--workers", type=int, help="render processes (default: one per core)")
+    args = parser.parse_args()
+    if args.generation is None and args.type_id is None:
+        parser.error("--generation and/or --type is required")
+    return args
+
+
+async def main():
+    args = parse_args()
+
+    await redis.init_redis()
+    await init_keycloak()
+    try:
+        started = time.perf_counter()
+        job = CohortRender(AsyncSessionLocal, redis.redis_client, args.out, args.format, args.workers)
+        count = await job.run(generation_id=args.generation, type_id=args.type_id)
+        elapsed = time.perf_counter() - started
+        print(f"✓ Rendered {count} certificates into {args.out} in {elapsed:.2f}s")
+    finally:
+        await close_keycloak()
+        await redis.close_redis()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""
+Warm the verify cache (`cert_verify:*` and its fragments) from Postgres, most
+recently issued certificates first. Run it after a deploy or a Redis failover.
+
+Usage:
+    poetry run python -m app.cli.warm_verify_cache --days 30
+    poetry run python -m app.cli.warm_verify_cache --generation 13 --type 2 --limit 5000
+"""
+import argparse
+import asyncio
+import logging
+import time
+from datetime import date, timedelta
+
+from app.core import redis
+from app.core.keycloak import close_keycloak, init_keycloak
+from app.db.database import AsyncSessionLocal
+from app.services.verify_warmup import warm_verify_cache
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--days", type=int, help="only certificates issued in the last N days")
+    parser.add_argument("--since", type=date.fromisoformat, help="only certificates issued on or after YYYY-MM-DD")
+    parser.add_argument("--generation", type=int, help="generation id")
+    parser.add_argument("--type", type=int, dest="type_id", help="certificate type id")
+    parser.add_argument("--limit", type=int, help="maximum number of certificates")
+    parser.add_argument("--batch-size", type=int, help="certificates per batch")
+    parser.add_argument("--concurrency", type=int, help="batches in flight")
+    return parser.parse_args()
+
+
+async def main():
+    args = parse_args()
+    issued_since = args.since
+    if args.days is not None:
+        issued_since = date.today() - timedelta(days=args.days)
+
+    await redis.init_redis()
+    await init_keycloak()
+    try:
+        started = time.perf_counter()
+        count = await warm_verify_cache(
+            AsyncSessionLocal,
+            redis.redis_client,
+            issued_since=issued_since,
+            generation_id=args.generation,
+            type_id=args.type_id,
+            limit=args.limit,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+        )
+        elapsed = time.perf_counter() - started
+        print(f"✓ Warmed {count} verify cache entries in {elapsed:.2f}s")
+    finally:
+        await close_keycloak()
+        await redis.close_redis()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    asyncio.run(main())
@@ -1,59 +1,141 @@
+import asyncio
+import hashlib
+import logging
+import time
 from typing import Optional
 
+import httpx
 import jwt
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from jwt import PyJWKClient
+from jwt import PyJWK, PyJWKSet, PyJWTError
 
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.keycloak import KEYCLOAK_ERRORS, KEYCLOAK_REQUEST_DURATION
+from app.core.tracing import CLIENT, span
+
+logger = logging.getLogger(__name__)
 
 # HTTPBearer extracts "Bearer <token>" from authorization header
 # auto_error=False lets us return a custom 401 message
 security = HTTPBearer(auto_error=False)
 
-# PyJWKClient fetches the JWKS from Keycloak and caches keys (handles rotation)
-_jwks_client: Optional[PyJWKClient] = None
+# Verified token payloads, keyed by a hash of the token (the token itself is never
+# kept) and expiring at the token's `exp`, capped at AUTH_TOKEN_CACHE_MAX_TTL
+_verified_tokens: TTLCache[dict] = TTLCache(
+    maxsize=settings.AUTH_TOKEN_CACHE_SIZE, ttl=settings.AUTH_TOKEN_CACHE_MAX_TTL
+)
 
 
-def get_jwks_client() -> PyJWKClient:
-    """Lazy-initialize the JWKS client (fetches/caches Keycloak public key)"""
-    global _jwks_client
-    if _jwks_client is None:
-        _jwks_client = PyJWKClient(
-            uri=settings.JWKS_URL,
-            cache_keys=True,
-            cache_jwk_set=True,
-            lifespan=3600,
-        )
-    return _jwks_client
+class JWKSUnavailable(Exception):
+    """The signing keys could not be fetched or parsed"""
 
 
-def get_current_user(
-    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
-) -> dict:
+class JWKSCache:
     """
-    FastAPI dependency that verifies the JWT and returns the token payload.
-    Use as: current_user: dict = Depends(get_current_user)
+    Keycloak's signing keys, by `kid`.
+    Fetched at startup and refreshed in the background every JWKS_REFRESH_INTERVAL;
+    a token signed with a key we do not know yet (a rotation) only schedules an
+    early refresh, it never waits for one. The request path only fetches the
+    keys itself if none could ever be loaded.
     """
 
-    if credentials is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    def __init__(self):
+        self.keys: dict[str, PyJWK] = {}
+        self._fetched_at = 0.0  # time.monotonic() based
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._early_refresh: Optional[asyncio.Task] = None
 
-    token = credentials.credentials
+    async def fetch(self) -> None:
+        """Load the keys; raises JWKSUnavailable when Keycloak cannot be reached or sends no usable set"""
+        start = time.perf_counter()
+        try:
+            with span("keycloak.jwks", CLIENT):
+                async with httpx.AsyncClient(timeout=settings.KEYCLOAK_TIMEOUT) as client:
+                    response = await client.get(settings.JWKS_URL)
+                    response.raise_for_status()
+            # Keys we cannot use (e.g. the realm's encryption keys) are skipped; a body
+            # that is not JSON or holds no usable key is an outage like a failed request
+            data = response.json()
+            if not isinstance(data, dict):
+                raise ValueError("JWKS is not a JSON object")
+            jwk_set = PyJWKSet.from_dict(data)
+        except (httpx.HTTPError, ValueError, PyJWTError) as e:
+            KEYCLOAK_ERRORS.inc("jwks")
+            raise JWKSUnavailable(str(e)) from e
+        finally:
+            KEYCLOAK_REQUEST_DURATION.observe(time.perf_counter() - start, "jwks")
+        self.keys = {key.key_id: key for key in jwk_set.keys if key.key_id}
+        self._fetched_at = time.monotonic()
+
+    async def get_signing_key(self, kid: Optional[str]) -> Optional[PyJWK]:
+        if not self.keys:
+            async with self._lock:
+                if not self.keys:
+                    await self.fetch()
+
+        key = self.keys.get(kid)
+        if key is None:
+            self._schedule_early_refresh()
+        return key
+
+    def _schedule_early_refresh(self) -> None:
+        if self._early_refresh is not None and not self._early_refresh.done():
+            return
+        if time.monotonic() - self._fetched_at < settings.JWKS_MIN_REFRESH_INTERVAL:
+            return
+        self._early_refresh = asyncio.create_task(self._refresh())
 
+    async def _refresh(self) -> None:
+        try:
+            async with self._lock:
+                await self.fetch()
+        except Exception as e:
+            logger.warning(f"JWKS refresh failed, keeping {len(self.keys)} known keys: {e}")
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.JWKS_REFRESH_INTERVAL)
+            await self._refresh()
+
+    async def start(self) -> None:
+        """Prefetch the keys and start the background refresher"""
+        await self._refresh()
+        self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        for task in (self._refresh_task, self._early_refresh):
+            if task is not None:
+                task.cancel()
+        self._refresh_task = self._early_refresh = None
+
+
+# Process-wide signing keys
+jwks_cache = JWKSCache()
+
+
+def _unauthorized(detail: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=detail,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+async def _verify(token: str) -> dict:
+    """Check the signature and claims of a token (no cache)"""
     try:
-        # 1. Get the signing key from JWKS (matches token's 'kid' in header)
-        jwks_client = get_jwks_client()
-        signing_key = jwks_client.get_signing_key_from_jwt(token)
+        # 1. Get the signing key matching the token's 'kid' header
+        signing_key = await jwks_cache.get_signing_key(jwt.get_unverified_header(token).get("kid"))
+        if signing_key is None:
+            raise jwt.InvalidTokenError("Unknown signing key")
 
         # 2. Verify and decode the token
         # - algorithms: MUST specify RS256 (prevents algorithm confusion attacks)
         # - options: validate exp (expiration) by default
-        payload = jwt.decode(
+        return jwt.decode(
             token,
             signing_key.key,
             algorithms=["RS256"],
@@ -65,18 +147,81 @@ def get_current_user(
             audience=settings.KEYCLOAK_CLIENT_ID,  # Optional: validate token was issued for your client
             issuer=f"{settings.KEYCLOAK_URL.rstrip('/')}/realms/{settings.KEYCLOAK_REALM}",
         )
-        return payload
 
     except jwt.ExpiredSignatureError:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Token has expired",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+        raise _unauthorized("Token has expired")
+
+    except jwt.InvalidTokenError:
+        raise _unauthorized("Invalid token")
 
-    except jwt.InvalidTokenError as e:
+    except JWKSUnavailable as e:
+        logger.error(f"JWKS unavailable, cannot verify tokens: {e}")
         raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Invalid token",
-            headers={"WWW-Authenticate": "Bearer"},
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is currently unavailable",
         )
+
+
+async def get_current_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(security),
+) -> dict:
+    """
+    FastAPI dependency that verifies the JWT and returns the token payload.
+    A token already verified is answered from memory until its `exp`.
+    Use as: current_user: dict = Depends(get_current_user)
+    """
+
+    if credentials is None:
+        raise _unauthorized("Could not validate credentials")
+
+    token = credentials.credentials
+    key = hashlib.sha256(token.encode()).digest()
+
+    payload = _verified_tokens.get(key)
+    if payload is None:
+        payload = await _verify(token)
+        ttl = min(payload.get("exp", 0) - time.time(), settings.AUTH_TOKEN_CACHE_MAX_TTL)
+        if ttl > 0:
+            _verified_tokens.set(key, payload, ttl)
+    elif payload.get("exp", 0) <= time.time():
+        # TTLCache is monotonic-clock based; never trust an entry past the token's own exp
+        _verified_tokens.pop(key)
+        raise _unauthorized("Token has expired")
+
+    return dict(payload)
+
+
+def _roles(payload: dict) -> set[str]:
+    """Realm roles plus this client's roles, as Keycloak puts them in the access token"""
+    roles = set(payload.get("realm_access", {}).get("roles", []))
+    client = payload.get("resource_access", {}).get(settings.KEYCLOAK_CLIENT_ID, {})
+    roles.update(client.get("roles", []))
+    return roles
+
+
+def require_roles(roles: list[str]):
+    """
+    Dependency factory: like get_current_user, but the token must also carry one of
+    `roles`, otherwise 403.
+    Use as: current_user: dict = Depends(require_roles(settings.ISSUANCE_ROLES))
+    """
+
+    async def dependency(current_user: dict = Depends(get_current_user)) -> dict:
+        if not _roles(current_user) & set(roles):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not allowed to perform this action",
+            )
+        return current_user
+
+    return dependency
+
+
+async def init_auth():
+    """Prefetch the JWKS so the first requests do not wait on Keycloak"""
+    await jwks_cache.start()
+    print(f"✓ JWKS loaded ({len(jwks_cache.keys)} keys)")
+
+
+async def close_auth():
+    await jwks_cache.stop()
@@ -0,0 +1,59 @@
+"""
+Bloom Filter
+
+A compact probabilistic set: `item in bloom` is never False for an added item,
+and is True for an item that was never added only with probability ~error_rate.
+
+The bit layout matches Redis SETBIT/GETBIT (bit 0 is the most significant bit
+of byte 0), so the same bytes can be kept in a Redis string, updated there with
+SETBIT, and loaded back into memory with a plain GET.
+"""
+import hashlib
+import math
+from typing import Iterable, Optional
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one blake2b digest"""
+
+    def __init__(self, size_bits: int, hash_count: int, bits: Optional[bytes] = None):
+        if size_bits <= 0 or hash_count <= 0:
+            raise ValueError("Bloom filter size and hash count must be positive")
+        self.size_bits = size_bits
+        self.hash_count = hash_count
+        self.bits = bytearray((size_bits + 7) // 8)
+        if bits:
+            # Redis trims trailing zero bytes, so a shorter value is still valid
+            self.bits[: len(bits)] = bits[: len(self.bits)]
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float) -> "BloomFilter":
+        """Size the filter for `capacity` items at the given false-positive rate"""
+        capacity = max(capacity, 1)
+        size_bits = math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))
+        hash_count = max(1, round(size_bits / capacity * math.log(2)))
+        return cls(size_bits, hash_count)
+
+    def positions(self, item: str) -> list[int]:
+        """Bit offsets for an item (Kirsch-Mitzenmacher double hashing)"""
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size_bits for i in range(self.hash_count)]
+
+    def add(self, item: str) -> list[int]:
+        """Add an item and return the bit offsets that were set"""
+        offsets = self.positions(item)
+        for offset in offsets:
+            self.bits[offset >> 3] |= 0x80 >> (offset & 7)
+        return offsets
+
+    def update(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self.bits[offset >> 3] & (0x80 >> (offset & 7))
+            for offset in self.positions(item)
+        )
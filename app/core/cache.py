@@ -0,0 +1,89 @@
+"""
+In-Process Cache Primitives
+
+Small building blocks shared by the service-layer caches:
+    - TTLCache: a bounded LRU with per-entry expiry, used as the L1 tier in front of Redis
+    - CacheStats: plain hit/miss/error counters a cache exposes for monitoring
+    - jittered_ttl: randomised TTLs so bulk-written keys do not expire together
+
+Everything here runs on the event loop thread, so no locking is needed.
+"""
+import random
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, Optional, TypeVar
+
+V = TypeVar("V")
+
+
+class CacheStats:
+    """Hit/miss/error counters for one cache tier"""
+
+    __slots__ = ("hits", "misses", "errors")
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def as_dict(self) -> dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "errors": self.errors}
+
+
+class TTLCache(Generic[V]):
+    """
+    Size-bounded LRU cache whose entries expire after `ttl` seconds.
+    Entries are stored as compact (expires_at, value) tuples; the least recently
+    used entry is evicted once `maxsize` is reached.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stats = CacheStats()
+        self._data: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.stats.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.stats.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: V, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+def jittered_ttl(ttl: int, jitter: float) -> int:
+    """
+    Spread a TTL uniformly over ±`jitter` (a fraction, e.g. 0.1 for ±10%)
+    so keys written in bulk do not all expire at the same moment.
+    """
+    if jitter <= 0:
+        return ttl
+    spread = int(ttl * jitter)
+    return max(1, ttl + random.randint(-spread, spread))
@@ -1,4 +1,5 @@
 import urllib.parse
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
 
@@ -14,6 +15,23 @@ class Settings(BaseSettings):
     DB_HOST: str = "localhost"
     DB_PORT: int = 5432
     DB_NAME: str
+    DB_ECHO: bool = False  # log every SQL statement (debugging only)
+
+    # Pool of each engine (per worker process)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 10.0  # seconds to wait for a free connection
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE: int = 1800  # seconds; below any idle timeout of a proxy / load balancer
+    DB_STATEMENT_CACHE_SIZE: int = 100  # asyncpg prepared statements per connection; 0 behind PgBouncer
+
+    # Optional read replica, for public reads (verify, /me, catalog); same user / database
+    DB_REPLICA_HOST: str | None = None
+    DB_REPLICA_PORT: int | None = None  # defaults to DB_PORT
+    DB_REPLICA_POOL_SIZE: int = 20
+    DB_REPLICA_MAX_OVERFLOW: int = 10
+    DB_REPLICA_CHECK_INTERVAL: float = 10.0  # seconds between replica health probes
+    DB_REPLICA_MAX_LAG: float = 30.0  # seconds after a write during which its readers use the primary
 
     # --- Keycloak Configuration ---
     KEYCLOAK_URL: str
@@ -22,11 +40,117 @@ class Settings(BaseSettings):
     # Usually needed if your Keycloak client is set to 'confidential'
     KEYCLOAK_CLIENT_SECRET: str | None = None
 
+    # --- Keycloak Admin Client (async, pooled) ---
+    KEYCLOAK_TIMEOUT: float = 5.0  # seconds allowed per admin API call
+    KEYCLOAK_CONNECT_TIMEOUT: float = 2.0
+    KEYCLOAK_MAX_CONNECTIONS: int = 20
+    KEYCLOAK_MAX_KEEPALIVE: int = 10
+    KEYCLOAK_TOKEN_REFRESH_MARGIN: int = 30  # refresh the service-account token this many seconds before expiry
+    KEYCLOAK_BULK_CONCURRENCY: int = 10  # parallel user fetches in KeycloakService.get_user_profiles
+
+    # --- Bearer token verification ---
+    JWKS_REFRESH_INTERVAL: float = 600.0  # background refresh of Keycloak's signing keys
+    JWKS_MIN_REFRESH_INTERVAL: float = 30.0  # earliest refresh after an unknown `kid` shows up
+    AUTH_TOKEN_CACHE_SIZE: int = 10000  # verified tokens kept per worker
+    AUTH_TOKEN_CACHE_MAX_TTL: int = 300  # bounds how long a token outlives a removed signing key
+
     # --- Redis Configuration ---
     REDIS_HOST: str
     REDIS_PORT: int
     REDIS_PASSWORD: str
 
+    # --- Profile Cache (L1 in-process LRU + L2 Redis `user_cache:`) ---
+    PROFILE_CACHE_TTL: int = 1800  # Redis tier, 30mn
+    PROFILE_CACHE_L1_SIZE: int = 10000  # max profiles kept per worker
+    PROFILE_CACHE_L1_TTL: int = 300
+
+    # --- Verify Cache (`cert_verify:` core + `cert_frag:` fragments) ---
+    VERIFY_CACHE_TTL: int = 3600  # certificate core fragment, hard expiry: past it a request blocks
+    VERIFY_CACHE_SOFT_TTL: int = 900  # past it the core is still served, refreshed in the background
+    # Per certificate type (soft, hard) overrides, as JSON: {"2": [300, 1800]}
+    VERIFY_TYPE_TTLS: dict[int, tuple[int, int]] = {}
+    VERIFY_SUBJECT_TTL: int = 86400
+    VERIFY_LAYOUT_TTL: int = 86400  # invalidated explicitly on template/type writes
+    VERIFY_PROFILE_TTL: int = 1800
+    VERIFY_CORE_L1_SIZE: int = 50000  # per-worker memo of code -> core, enables single-MGET hits
+    VERIFY_CORE_L1_TTL: int = 300
+    VERIFY_CACHE_TTL_JITTER: float = 0.1  # ±10% so keys written in bulk do not expire together
+    VERIFY_LOCK_TTL_MS: int = 5000  # recompute lock, so one worker across replicas rebuilds a key
+    VERIFY_LOCK_WAIT: float = 2.0  # seconds other workers wait for the lock holder's result
+    VERIFY_NEGATIVE_TTL: int = 60  # how long an unknown code is remembered as not found
+    VERIFY_INVALIDATE_BATCH: int = 500  # fragments deleted per pipeline on invalidation
+    VERIFY_REDELETE_DELAY: float = 5.0  # invalidated fragments are deleted again after this, 0 disables
+
+    VERIFY_BATCH_MAX_CODES: int = 100  # per POST /verify:batch request
+
+    # --- Certificate type / template catalog snapshot (`catalog:version`) ---
+    CATALOG_SYNC_INTERVAL: float = 5.0  # seconds between version checks in each worker
+
+    # --- /me/certificates (`cert_list:`) ---
+    MY_CERTIFICATES_PAGE_SIZE: int = 20
+    MY_CERTIFICATES_MAX_PAGE_SIZE: int = 100
+    MY_CERTIFICATES_CACHE_TTL: int = 600  # pages are also dropped on issuance / revocation
+
+    # --- Verify HTTP caching (browsers / reverse proxy) ---
+    VERIFY_HTTP_MAX_AGE: int = 300
+    VERIFY_HTTP_STALE_WHILE_REVALIDATE: int = 3600
+    VERIFY_HTTP_PUBLIC: bool = True  # allow shared caches (our reverse proxy) to store responses
+
+    # --- Verify Code Bloom Filter (`cert_bloom:`) ---
+    VERIFY_FILTER_ENABLED: bool = True
+    VERIFY_FILTER_CAPACITY: int = 1_000_000
+    VERIFY_FILTER_ERROR_RATE: float = 0.001
+    VERIFY_FILTER_SYNC_INTERVAL: float = 10.0  # seconds between version checks in each worker
+    VERIFY_FILTER_REBUILD_INTERVAL: float = 86400.0  # rebuilt from Postgres this often (0: only by the CLI)
+    VERIFY_FILTER_LOG_MAX: int = 10_000  # `cert_bloom:log` entries kept for incremental sync
+
+    # --- Bulk Issuance ---
+    ISSUANCE_CHUNK_SIZE: int = 1000  # rows per validation pass / INSERT / transaction (max ~4600 params-wise)
+    ISSUANCE_ROLES: list[str] = ["certificate-issuer", "admin"]  # realm or client roles allowed to issue
+
+    # --- Certificate Code Allocation ---
+    VERIFY_CODE_BLOCK_SIZE: int = 1000  # sequence values reserved per Postgres round trip
+    VERIFY_CODE_KEY: str  # required: keys the code permutation; a long random secret, never changed once codes are issued
+
+    # --- Certificate Rendering (PNG / PDF) ---
+    VERIFY_PUBLIC_URL: str = "https://verify.kshrd.app/{code}"  # encoded in qr_code elements
+    RENDER_WIDTH: int = 2000  # canvas px, the coordinate space of layout_config x/y
+    RENDER_HEIGHT: int = 1414  # A4 landscape ratio
+    RENDER_DPI: int = 200  # PDF page size = canvas / DPI
+    RENDER_FONT_DIR: str = "app/assets/fonts"  # fontFamily "Kantumruy Pro" -> KantumruyPro.ttf
+    RENDER_FALLBACK_FONT: str | None = None  # .ttf for families not in RENDER_FONT_DIR; should cover Khmer
+    RENDER_CACHE_DIR: str = ".cache/renders"
+    RENDER_CACHE_MAX_BYTES: int = 1024 ** 3  # least recently used renders are pruned past this
+    RENDER_CACHE_PRUNE_INTERVAL: float = 600.0  # seconds between size checks in each worker
+    RENDER_CONCURRENCY: int = 2  # renders running at once per worker (CPU-bound)
+    RENDER_IMAGE_HOSTS: list[str] = []  # hosts images are fetched from (https only); empty: no remote images
+    RENDER_IMAGE_TIMEOUT: float = 5.0
+    RENDER_IMAGE_MAX_BYTES: int = 5 * 1024 * 1024  # per downloaded image
+    RENDER_IMAGE_MAX_PIXELS: int = 25_000_000  # larger images are refused before decoding (decompression bombs)
+
+    # --- Verify Cache Warm-up ---
+    VERIFY_WARMUP_ON_STARTUP: bool = False  # run once per deploy (one worker) from the lifespan
+    VERIFY_WARMUP_DAYS: int = 30  # startup warm-up covers certificates issued this recently
+    VERIFY_WARMUP_LIMIT: int = 50000
+    VERIFY_WARMUP_BATCH: int = 200  # certificates per query / pipeline
+    VERIFY_WARMUP_CONCURRENCY: int = 4  # batches in flight, each holding one DB connection
+
+    # --- Metrics ---
+    METRICS_TOKEN: str | None = None  # bearer token Prometheus scrapes /metrics with; unset: /metrics is off
+
+    # --- Tracing (OTLP JSON spans, see app/core/tracing.py) ---
+    TRACING_ENABLED: bool = False
+    TRACING_SAMPLE_RATIO: float = 0.01  # share of traces kept, also of those continuing an incoming traceparent
+    TRACING_TRUST_PARENT: bool = False  # keep the caller's sampled flag instead (only behind a proxy that sets it)
+    TRACING_EXPORTER: Literal["file", "otlp"] = "file"
+    TRACING_FILE: str = "traces.jsonl"  # one ExportTraceServiceRequest per line
+    TRACING_FILE_MAX_BYTES: int = 100 * 1024 * 1024  # past this the file is rotated to <TRACING_FILE>.1
+    TRACING_OTLP_ENDPOINT: str = "http://localhost:4318/v1/traces"  # OTLP/HTTP collector
+    TRACING_SERVICE_NAME: str = "certificate-verify-service"
+    TRACING_EXPORT_INTERVAL: float = 5.0  # seconds between batch exports
+    TRACING_EXPORT_TIMEOUT: float = 5.0
+    TRACING_MAX_QUEUE: int = 2048  # finished spans buffered between exports; beyond it they are dropped
+
     model_config = SettingsConfigDict(env_file=".env", extra="ignore")
 
     @property
@@ -39,6 +163,14 @@ class Settings(BaseSettings):
         encoded_pw = urllib.parse.quote_plus(self.DB_PASSWORD)
         return f"postgresql+asyncpg://{self.DB_USER}:{encoded_pw}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    @property
+    def DATABASE_REPLICA_URL(self) -> str | None:
+        if not self.DB_REPLICA_HOST:
+            return None
+        encoded_pw = urllib.parse.quote_plus(self.DB_PASSWORD)
+        port = self.DB_REPLICA_PORT or self.DB_PORT
+        return f"postgresql+asyncpg://{self.DB_USER}:{encoded_pw}@{self.DB_REPLICA_HOST}:{port}/{self.DB_NAME}"
+
     @property
     def JWKS_URL(self) -> str:
         """The URL where your API finds the public keys to verify JWT signatures."""
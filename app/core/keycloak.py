@@ -0,0 +1,206 @@
+"""
+Async Keycloak Admin Client
+
+The python-keycloak `KeycloakAdmin` client is synchronous, so calling it from an
+async route blocks the whole event loop for a full HTTP round trip. This module
+keeps one process-wide httpx.AsyncClient (persistent, pooled connections) for the
+admin REST API and re-uses the service-account token until it nears expiry; a
+background task refreshes it so requests never wait on the token endpoint.
+
+Usage:
+    client = get_keycloak_client()
+    user = await client.get_user(user_id)
+"""
+import asyncio
+import logging
+import time
+from typing import Optional
+
+import httpx
+from keycloak.exceptions import KeycloakAuthenticationError, KeycloakGetError
+
+from app.core.config import settings
+from app.core.metrics import Counter, Histogram
+from app.core.tracing import CLIENT, span
+
+logger = logging.getLogger(__name__)
+
+# A token this close to expiry is never sent, even if the refresher is late
+_TOKEN_EXPIRY_SKEW = 5.0
+# Wait between retries when the background refresh fails
+_REFRESH_RETRY_DELAY = 5.0
+
+KEYCLOAK_REQUEST_DURATION = Histogram(
+    "keycloak_request_duration_seconds",
+    "Keycloak call latency (operation: token, admin, jwks)",
+    ("operation",),
+)
+KEYCLOAK_ERRORS = Counter(
+    "keycloak_errors_total",
+    "Failed Keycloak calls: error responses, timeouts and connection errors",
+    ("operation",),
+)
+
+
+class KeycloakAdminClient:
+    """Non-blocking client for the Keycloak admin API using client_credentials"""
+
+    def __init__(self):
+        base_url = settings.KEYCLOAK_URL.rstrip("/")
+        self.token_url = f"{base_url}/realms/{settings.KEYCLOAK_REALM}/protocol/openid-connect/token"
+        self.admin_url = f"{base_url}/admin/realms/{settings.KEYCLOAK_REALM}"
+
+        self.http = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.KEYCLOAK_TIMEOUT, connect=settings.KEYCLOAK_CONNECT_TIMEOUT
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.KEYCLOAK_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.KEYCLOAK_MAX_KEEPALIVE,
+            ),
+        )
+
+        self._token: Optional[str] = None
+        self._token_expires_at: float = 0.0  # time.monotonic() based
+        self._token_lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def _token_is_usable(self) -> bool:
+        return self._token is not None and time.monotonic() < self._token_expires_at - _TOKEN_EXPIRY_SKEW
+
+    async def _fetch_token(self) -> None:
+        """Request a new service-account access token from Keycloak"""
+        data = {
+            "grant_type": "client_credentials",
+            "client_id": settings.KEYCLOAK_CLIENT_ID,
+        }
+        if settings.KEYCLOAK_CLIENT_SECRET:
+            data["client_secret"] = settings.KEYCLOAK_CLIENT_SECRET
+
+        start = time.perf_counter()
+        try:
+            with span("keycloak.token", CLIENT):
+                response = await self.http.post(self.token_url, data=data)
+        except httpx.HTTPError:
+            KEYCLOAK_ERRORS.inc("token")
+            raise
+        finally:
+            KEYCLOAK_REQUEST_DURATION.observe(time.perf_counter() - start, "token")
+        if response.status_code != 200:
+            KEYCLOAK_ERRORS.inc("token")
+            raise KeycloakAuthenticationError(
+                error_message=response.text, response_code=response.status_code
+            )
+
+        body = response.json()
+        self._token = body["access_token"]
+        self._token_expires_at = time.monotonic() + float(body.get("expires_in", 60))
+
+    async def get_token(self) -> str:
+        """Return a valid access token, fetching one only if none is usable"""
+        if not self._token_is_usable():
+            async with self._token_lock:
+                if not self._token_is_usable():
+                    await self._fetch_token()
+        self._ensure_refresher()
+        return self._token
+
+    def _ensure_refresher(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self) -> None:
+        """Refresh the token shortly before it expires so requests never wait on it"""
+        while True:
+            delay = self._token_expires_at - settings.KEYCLOAK_TOKEN_REFRESH_MARGIN - time.monotonic()
+            await asyncio.sleep(max(delay, 1.0))
+            try:
+                async with self._token_lock:
+                    await self._fetch_token()
+            except Exception as e:
+                logger.warning(f"Keycloak token refresh failed: {e}")
+                await asyncio.sleep(_REFRESH_RETRY_DELAY)
+
+    async def request(
+        self, method: str, path: str, timeout: Optional[float] = None, **kwargs
+    ) -> httpx.Response:
+        """
+        Call the admin API with the cached bearer token.
+        A 401 drops the token and retries once (e.g. the token was revoked early).
+        """
+        request_timeout = timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT
+
+        for attempt in range(2):
+            token = await self.get_token()
+            start = time.perf_counter()
+            try:
+                with span("keycloak.admin", CLIENT) as current:
+                    current.set_attribute("http.request.method", method)
+                    current.set_attribute("url.path", path)
+                    response = await self.http.request(
+                        method,
+                        f"{self.admin_url}{path}",
+                        headers={"Authorization": f"Bearer {token}"},
+                        timeout=request_timeout,
+                        **kwargs,
+                    )
+                    current.set_attribute("http.response.status_code", response.status_code)
+            except httpx.HTTPError:
+                KEYCLOAK_ERRORS.inc("admin")
+                raise
+            finally:
+                KEYCLOAK_REQUEST_DURATION.observe(time.perf_counter() - start, "admin")
+            if response.status_code == 401 and attempt == 0:
+                self._token = None
+                continue
+            break
+
+        if response.status_code >= 400:
+            KEYCLOAK_ERRORS.inc("admin")
+            raise KeycloakGetError(
+                error_message=response.text, response_code=response.status_code
+            )
+        return response
+
+    async def get_user(self, user_id: str, timeout: Optional[float] = None) -> dict:
+        """GET /admin/realms/{realm}/users/{id}"""
+        response = await self.request("GET", f"/users/{user_id}", timeout=timeout)
+        return response.json()
+
+    async def aclose(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            self._refresh_task = None
+        await self.http.aclose()
+
+
+# Global Keycloak admin client instance
+keycloak_client: Optional[KeycloakAdminClient] = None
+
+
+def get_keycloak_client() -> KeycloakAdminClient:
+    """Lazy-initialize the shared admin client (one connection pool per process)"""
+    global keycloak_client
+    if keycloak_client is None:
+        keycloak_client = KeycloakAdminClient()
+    return keycloak_client
+
+
+async def init_keycloak():
+    """Create the admin client and prefetch the service-account token"""
+    client = get_keycloak_client()
+    try:
+        await client.get_token()
+        print("✓ Keycloak admin client ready")
+    except Exception as e:
+        # Not fatal: the token is fetched again on the first admin call
+        logger.warning(f"Keycloak token prefetch failed: {e}")
+
+
+async def close_keycloak():
+    """Close the pooled connections and stop the token refresher"""
+    global keycloak_client
+    if keycloak_client:
+        await keycloak_client.aclose()
+        keycloak_client = None
+        print("✓ Keycloak admin client closed")
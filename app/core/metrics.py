@@ -0,0 +1,191 @@
+"""
+Prometheus Metrics
+
+Counters, gauges and histograms rendered in the Prometheus text format
+(version 0.0.4) by GET /metrics. Every module declares the metrics it records
+next to the code that records them; declaring one registers it here.
+
+Recording is a dict lookup and an add on plain Python numbers: everything runs on
+the event loop thread, so no locking is needed, and the only allocation is the
+label tuple. Values another module already counts (e.g. a CacheStats) are not
+copied on every event but read at scrape time through a `collect` callback.
+
+Usage:
+    LOOKUPS = Counter("profile_lookups_total", "Profile lookups", ("source",))
+    LOOKUPS.inc("keycloak")
+    LATENCY = Histogram("keycloak_request_duration_seconds", "...", ("operation",))
+    LATENCY.observe(elapsed, "admin")
+"""
+import math
+import time
+from bisect import bisect_left
+from typing import Callable, Iterable, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds (seconds) for request-scale latencies
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Upper bounds (seconds) for sub-millisecond work: Redis commands, pool checkouts
+FAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0)
+
+Labels = tuple[str, ...]
+Collect = Callable[[], Iterable[tuple[Labels, float]]]
+
+_registry: list["_Metric"] = []
+
+
+def _format_value(value: float) -> str:
+    if isinstance(value, int):
+        return str(value)
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Labels, values: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = (), collect: Optional[Collect] = None):
+        if any(metric.name == name for metric in _registry):
+            raise ValueError(f"Metric '{name}' is already registered")
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._collect = collect
+        self._values: dict[Labels, float] = {}
+        _registry.append(self)
+
+    def _samples(self) -> Iterable[tuple[Labels, float]]:
+        return self._collect() if self._collect is not None else self._values.items()
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in self._samples():
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """A value that only goes up (totals); label values are passed positionally"""
+
+    type = "counter"
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that goes up and down, set on change or read by `collect` at scrape time"""
+
+    type = "gauge"
+
+    def set(self, value: float, *labels: str) -> None:
+        self._values[labels] = value
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+
+class Histogram(_Metric):
+    """
+    Observations counted into buckets by upper bound. Each series is one flat list:
+    a count per bucket (the last one for +Inf), then the sum; bucket counts are only
+    made cumulative when rendered.
+    """
+
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Labels = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: dict[Labels, list] = {}
+
+    def observe(self, value: float, *labels: str) -> None:
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        bounds = [_format_value(float(bound)) for bound in self.buckets] + ["+Inf"]
+        for labels, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(bounds, series):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+def render() -> bytes:
+    """Every registered metric, in the Prometheus text format"""
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    lines.append("")
+    return "\n".join(lines).encode()
+
+
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route", "status"),
+)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing every HTTP request into HTTP_REQUEST_DURATION.
+    Requests are labelled by the route template (/api/v1/certificate/{code}), never
+    the raw path, so the number of series stays bounded; paths no route matched
+    share the label "unmatched".
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # unless the app gets to start a response
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.observe(
+                time.perf_counter() - start,
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                str(status),
+            )
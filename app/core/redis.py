@@ -1,23 +1,58 @@
+import time
 from typing import Optional
-from redis.asyncio import Redis, from_url
+from redis.asyncio import Redis
+from redis.asyncio.client import Pipeline
 from app.core.config import settings
-from app.services.user_service import UserService
+from app.core.metrics import FAST_BUCKETS, Histogram
+from app.core.tracing import CLIENT, span
 
-# Global Redis client instance
-redis_client: Optional[Redis] = None
+REDIS_COMMAND_DURATION = Histogram(
+    "redis_command_duration_seconds",
+    "Redis round trip latency by command (a pipeline counts as one PIPELINE)",
+    ("command",),
+    buckets=FAST_BUCKETS,
+)
+
+_SPAN_ATTRIBUTES = {"db.system": "redis"}
+
+
+class InstrumentedPipeline(Pipeline):
+    """Pipeline that times (and traces) its one round trip"""
+
+    async def execute(self, raise_on_error: bool = True):
+        start = time.perf_counter()
+        try:
+            with span("PIPELINE", CLIENT, _SPAN_ATTRIBUTES) as current:
+                current.set_attribute("db.redis.commands", len(self.command_stack))
+                return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - start, "PIPELINE")
 
 
-def get_user_service() -> UserService:
-    """Dependency function to get UserService instance with Redis client"""
-    if redis_client is None:
-        raise RuntimeError("Redis client not initialized. Make sure the app has started.")
-    return UserService(redis_client)
+class InstrumentedRedis(Redis):
+    """Redis client that times every command into REDIS_COMMAND_DURATION, with a span per command"""
+
+    async def execute_command(self, *args, **options):
+        command = str(args[0])
+        start = time.perf_counter()
+        try:
+            with span(command, CLIENT, _SPAN_ATTRIBUTES):
+                return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.observe(time.perf_counter() - start, command)
+
+    def pipeline(self, transaction: bool = True, shard_hint: Optional[str] = None) -> Pipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+# Global Redis client instance
+redis_client: Optional[Redis] = None
 
 
 async def init_redis():
     """Initialize Redis connection"""
     global redis_client
-    redis_client = await from_url(
+    redis_client = await InstrumentedRedis.from_url(
         settings.REDIS_URL,
         encoding="utf-8",
         decode_responses=False,  # We're storing JSON strings
@@ -30,4 +65,4 @@ async def close_redis():
     global redis_client
     if redis_client:
         await redis_client.close()
-        print("✓ Redis disconnected")
\ No newline at end of file
+        print("✓ Redis disconnected")
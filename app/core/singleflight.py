@@ -0,0 +1,41 @@
+"""
+Request Coalescing ("singleflight")
+
+Concurrent callers asking for the same key share one in-flight task instead of
+each doing the same expensive work (a Keycloak call, a DB query...). The task is
+shielded, so a caller that gets cancelled does not cancel the work for others.
+
+Usage:
+    flight = SingleFlight()
+    profile = await flight.do(user_id, lambda: fetch_profile(user_id))
+"""
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """Merge concurrent calls for the same key into one shared task"""
+
+    def __init__(self):
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark the exception as retrieved when every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    def inflight(self) -> int:
+        """Number of keys currently being computed"""
+        return len(self._inflight)
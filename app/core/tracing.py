@@ -0,0 +1,327 @@
+"""
+Request Tracing
+
+Spans for one request: the HTTP server span opened by TracingMiddleware, and child
+spans around Redis commands, SQL statements, Keycloak calls and the verify steps.
+Trace context comes in through the W3C `traceparent` header, so a trace started by
+the proxy or the frontend continues here.
+
+Sampling is decided once per trace, at the root, with probability
+TRACING_SAMPLE_RATIO; an incoming `traceparent` keeps its trace id either way.
+Its sampled flag is only obeyed with TRACING_TRUST_PARENT, since any client can
+set it (and would otherwise make every one of its requests traced). Outside a
+sampled trace span() returns a shared no-op, so instrumented code costs one
+context variable lookup.
+
+Finished spans are buffered and exported every TRACING_EXPORT_INTERVAL as OTLP
+JSON (ExportTraceServiceRequest), either appended to TRACING_FILE, one request per
+line, or POSTed to an OTLP/HTTP collector at TRACING_OTLP_ENDPOINT. Both work
+without leaving the host (air-gapped setups read the file with the collector's
+`otlpjsonfile` receiver). The file is rotated to `<TRACING_FILE>.1` once it
+passes TRACING_FILE_MAX_BYTES, so at most about twice that is kept.
+
+Usage:
+    with span("verify.rebuild") as current:
+        current.set_attribute("verify.code", code)
+        ...
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import time
+from contextvars import ContextVar
+from typing import Optional, Union
+
+import httpx
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+# OTLP span kinds
+INTERNAL = 1
+SERVER = 2
+CLIENT = 3
+
+_STATUS_ERROR = 2
+
+# version-trace_id-parent_id-flags, e.g. 00-4bf92f3577b34da6a3ce929d0e0e4736-00f067aa0ba902b7-01
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+TRACING_SPANS = Counter(
+    "tracing_spans_total",
+    "Finished spans by outcome (exported, dropped: buffer full, failed: export error)",
+    ("result",),
+)
+
+_current: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed operation of a sampled trace; use as a context manager to make it the current span"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "start", "end", "attributes", "error", "_token")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int, attributes: Optional[dict]):
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.start = time.time_ns()
+        self.end = 0
+        self.attributes = dict(attributes) if attributes else {}
+        self.error: Optional[str] = None
+        self._token = None
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    def finish(self) -> None:
+        if not self.end:
+            self.end = time.time_ns()
+            _exporter.add(self)
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc is not None and not isinstance(exc, asyncio.CancelledError):
+            self.record_error(exc)
+        _current.reset(self._token)
+        self.finish()
+
+
+class _NoopSpan:
+    """Stands in for a span outside a sampled trace"""
+
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def record_error(self, exc: BaseException) -> None:
+        pass
+
+    def finish(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        pass
+
+
+_NOOP = _NoopSpan()
+
+AnySpan = Union[Span, _NoopSpan]
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def span(name: str, kind: int = INTERNAL, attributes: Optional[dict] = None) -> AnySpan:
+    """
+    A child of the current span (a no-op outside a sampled trace). Enter it to make
+    it current for the block, or call finish() on it from a callback.
+    """
+    parent = _current.get()
+    if parent is None:
+        return _NOOP
+    return Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+
+def root_span(name: str, traceparent: Optional[str] = None) -> AnySpan:
+    """The server span of a request, continuing `traceparent` if it is valid"""
+    if not settings.TRACING_ENABLED:
+        return _NOOP
+    match = _TRACEPARENT.match(traceparent) if traceparent else None
+    if match:
+        trace_id, parent_id, flags = match.groups()
+    else:
+        trace_id, parent_id, flags = f"{random.getrandbits(128):032x}", None, None
+    if flags is not None and settings.TRACING_TRUST_PARENT:
+        sampled = int(flags, 16) & 1
+    else:
+        sampled = random.random() < settings.TRACING_SAMPLE_RATIO
+    if not sampled:
+        return _NOOP
+    return Span(name, trace_id, parent_id, SERVER, None)
+
+
+def _attribute(key: str, value) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _otlp_span(span: Span) -> dict:
+    otlp = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": span.kind,
+        "startTimeUnixNano": str(span.start),
+        "endTimeUnixNano": str(span.end),
+        "attributes": [_attribute(key, value) for key, value in span.attributes.items()],
+    }
+    if span.parent_id:
+        otlp["parentSpanId"] = span.parent_id
+    if span.error:
+        otlp["status"] = {"code": _STATUS_ERROR, "message": span.error}
+    return otlp
+
+
+def otlp_json(spans: list[Span]) -> bytes:
+    """Spans as one OTLP ExportTraceServiceRequest, JSON encoded"""
+    return json.dumps(
+        {
+            "resourceSpans": [{
+                "resource": {"attributes": [_attribute("service.name", settings.TRACING_SERVICE_NAME)]},
+                "scopeSpans": [{"scope": {"name": "app"}, "spans": [_otlp_span(span) for span in spans]}],
+            }]
+        },
+        separators=(",", ":"),
+    ).encode()
+
+
+def _append(path: str, body: bytes) -> None:
+    with open(path, "ab") as f:
+        f.write(body + b"\n")
+        size = f.tell()
+    if size > settings.TRACING_FILE_MAX_BYTES:
+        # One generation is kept; a collector tailing the file follows the rename
+        os.replace(path, f"{path}.1")
+
+
+class SpanExporter:
+    """Buffers finished spans and ships them in batches from a background task"""
+
+    def __init__(self):
+        self._buffer: list[Span] = []
+        self._http: Optional[httpx.AsyncClient] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def add(self, span: Span) -> None:
+        if len(self._buffer) >= settings.TRACING_MAX_QUEUE:
+            TRACING_SPANS.inc("dropped")
+            return
+        self._buffer.append(span)
+
+    async def flush(self) -> None:
+        if not self._buffer:
+            return
+        spans, self._buffer = self._buffer, []
+        try:
+            body = otlp_json(spans)
+            if settings.TRACING_EXPORTER == "otlp":
+                response = await self._http.post(
+                    settings.TRACING_OTLP_ENDPOINT, content=body, headers={"Content-Type": "application/json"}
+                )
+                response.raise_for_status()
+            else:
+                # File I/O off the event loop
+                await asyncio.to_thread(_append, settings.TRACING_FILE, body)
+        except Exception as e:
+            TRACING_SPANS.inc("failed", amount=len(spans))
+            logger.warning(f"Trace export failed, {len(spans)} spans lost: {e}")
+        else:
+            TRACING_SPANS.inc("exported", amount=len(spans))
+
+    async def _export_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.TRACING_EXPORT_INTERVAL)
+            await self.flush()
+
+    async def start(self) -> None:
+        if settings.TRACING_EXPORTER == "otlp":
+            self._http = httpx.AsyncClient(timeout=settings.TRACING_EXPORT_TIMEOUT)
+        self._task = asyncio.create_task(self._export_loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+
+# Process-wide exporter
+_exporter = SpanExporter()
+
+
+async def init_tracing():
+    if settings.TRACING_ENABLED:
+        await _exporter.start()
+        print(f"✓ Tracing on ({settings.TRACING_EXPORTER}, sample ratio {settings.TRACING_SAMPLE_RATIO})")
+
+
+async def close_tracing():
+    if settings.TRACING_ENABLED:
+        await _exporter.stop()
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware opening the server span of every sampled request. The span is
+    named after the route template ("GET /api/v1/certificate/{code}") once routing
+    has run; paths no route matched are named "unmatched".
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not settings.TRACING_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+
+        root = root_span(scope["method"], traceparent)
+        if root is _NOOP:
+            await self.app(scope, receive, send)
+            return
+
+        status = 500  # unless the app gets to start a response
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        with root:
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                route_path = route.path if route is not None else "unmatched"
+                root.name = f"{scope['method']} {route_path}"
+                root.set_attribute("http.request.method", scope["method"])
+                root.set_attribute("http.route", route_path)
+                root.set_attribute("url.path", scope["path"])
+                root.set_attribute("http.response.status_code", status)
+                if status >= 500 and root.error is None:
+                    root.error = f"HTTP {status}"
@@ -1,20 +1,125 @@
-from curses import echo
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError, SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import DeclarativeBase, Session
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from ..core.config import settings
+from ..core.metrics import FAST_BUCKETS, Gauge, Histogram
+from ..core.tracing import CLIENT, current_span, span
+from .statements import statement_name
 
-# 1. The engine: the actual connection "pipe" to PostgreSQL
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,  # Logs all the SQL queries to terminal if DEBUG is True
+logger = logging.getLogger(__name__)
+
+
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection (including connecting a new one)",
+    ("engine",),
+    buckets=FAST_BUCKETS,
+)
+
+
+class _TimedQueuePool(AsyncAdaptedQueuePool):
+    """The asyncio queue pool, timing every checkout into DB_POOL_CHECKOUT_WAIT"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            # logging_name is the engine's label, and survives the pool being recreated
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - start, self.logging_name)
+
+
+def _create_engine(name: str, url: str, pool_size: int, max_overflow: int) -> AsyncEngine:
+    return create_async_engine(
+        url,
+        echo=settings.DB_ECHO,  # Logs all the SQL queries; never on in production (hot path)
+        poolclass=_TimedQueuePool,
+        pool_logging_name=name,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        # asyncpg's per-connection prepared statement cache; 0 behind PgBouncer (transaction mode)
+        connect_args={"statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE},
+    )
+
+
+# 1. The engines: the actual connection "pipes" to PostgreSQL.
+#    Writes (and reads that must see them) go to the primary; public reads go to
+#    the replica when one is configured, otherwise they share the primary's pool.
+engine = _create_engine("primary", settings.DATABASE_URL, settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
+reader_engine = (
+    _create_engine(
+        "replica",
+        settings.DATABASE_REPLICA_URL,
+        settings.DB_REPLICA_POOL_SIZE,
+        settings.DB_REPLICA_MAX_OVERFLOW,
+    )
+    if settings.DATABASE_REPLICA_URL
+    else engine
+)
+
+
+def _connections_in_use():
+    yield ("primary",), engine.pool.checkedout()
+    if reader_engine is not engine:
+        yield ("replica",), reader_engine.pool.checkedout()
+
+
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Connections currently checked out of the pool",
+    ("engine",),
+    collect=_connections_in_use,
 )
 
-# 2. The Session Maker: A factory that creates new "conversations" with the DB
+def _trace_statements(target: AsyncEngine) -> None:
+    """A span per SQL statement, named after the registered statement (else its first keyword)"""
+    sync_engine = target.sync_engine
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        if current_span() is None:
+            return
+        context._trace_span = span(
+            statement_name(context) or statement.split(None, 1)[0],
+            CLIENT,
+            {"db.system": "postgresql", "db.statement": statement, "db.pool": sync_engine.pool.logging_name},
+        )
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        sql_span = getattr(context, "_trace_span", None)
+        if sql_span is not None:
+            sql_span.finish()
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _fail(context):
+        sql_span = getattr(context.execution_context, "_trace_span", None)
+        if sql_span is not None:
+            sql_span.record_error(context.original_exception)
+            sql_span.finish()
+
+
+_trace_statements(engine)
+if reader_engine is not engine:
+    _trace_statements(reader_engine)
+
+# 2. The Session Makers: factories that create new "conversations" with the DB
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
-    expire_on_commit=False, 
+    expire_on_commit=False,
 )
+# ReadSessionLocal (reads that may go to the replica) is defined with ReadSession below
 
 
 # 3. Base class: for every table that will inherite from
@@ -22,10 +127,116 @@ class Base(DeclarativeBase):
     pass
 
 
-# function for getting database session
+# Whether reads go to the replica. Failed or lost replica connections
+# clear it at once; monitor_replica() probes the replica and sets it back.
+_replica_healthy = reader_engine is not engine
+
+
+def replica_available() -> bool:
+    return _replica_healthy
+
+
+def _set_replica_health(healthy: bool, reason: object = None) -> None:
+    global _replica_healthy
+    if healthy != _replica_healthy:
+        if healthy:
+            logger.info("Read replica is back, reads use it again")
+        else:
+            logger.warning(f"Read replica unavailable, reads fall back to the primary: {reason}")
+    _replica_healthy = healthy
+
+
+if reader_engine is not engine:
+    @event.listens_for(reader_engine.sync_engine, "handle_error")
+    def _on_replica_error(context):
+        # No connection: the connect itself failed; is_disconnect: an established one was lost
+        if context.connection is None or context.is_disconnect:
+            _set_replica_health(False, context.original_exception)
+
+
+async def check_replica() -> bool:
+    """Probe the replica with a `SELECT 1` and record the outcome"""
+    try:
+        async with reader_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except (SQLAlchemyError, OSError) as e:
+        _set_replica_health(False, e)
+    else:
+        _set_replica_health(True)
+    return _replica_healthy
+
+
+async def monitor_replica() -> None:
+    """Background task (from the lifespan): keeps replica_available() current"""
+    while True:
+        await check_replica()
+        await asyncio.sleep(settings.DB_REPLICA_CHECK_INTERVAL)
+
+
+class _ReadRoutingSession(Session):
+    """Sync side of ReadSession: binds to the replica while it is healthy, else to the primary"""
+
+    def get_bind(self, mapper=None, clause=None, **kw):
+        return (reader_engine if replica_available() else engine).sync_engine
+
+
+class ReadSession(AsyncSession):
+    """
+    Session for reads that tolerate replication lag, on the replica while it is
+    healthy, else on the primary. A statement the replica fails for lack of a
+    connection (refused, or lost) marks it down and runs again on the primary, so
+    the request that finds the replica down is still answered.
+    """
+
+    async def execute(self, *args, **kwargs):
+        return await self._with_fallback(super().execute, *args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return await self._with_fallback(super().scalar, *args, **kwargs)
+
+    async def _with_fallback(self, method, *args, **kwargs):
+        if not replica_available():
+            return await method(*args, **kwargs)
+        try:
+            return await method(*args, **kwargs)
+        except (OSError, DBAPIError) as e:
+            if isinstance(e, OSError):
+                # A refused connect surfaces raw, past the handle_error listener
+                _set_replica_health(False, e)
+            if replica_available():
+                raise  # The replica is up: the statement itself failed
+            logger.warning(f"Read replica failed a statement, running it on the primary: {e}")
+            await self.rollback()
+            return await method(*args, **kwargs)
+
+
+ReadSessionLocal = async_sessionmaker(
+    class_=ReadSession,
+    sync_session_class=_ReadRoutingSession,
+    expire_on_commit=False,
+)
+
+
+@asynccontextmanager
+async def read_session() -> AsyncIterator[AsyncSession]:
+    """
+    A ReadSession. Routing costs no I/O, and the session only checks a connection
+    out if it runs a query.
+    """
+    async with ReadSessionLocal() as session:
+        yield session
+
+
+# function for getting database session (primary: writes, and reads of what was just written)
 async def get_db():
     async with AsyncSessionLocal() as session:
         try:
             yield session
         finally:
             await session.close()
+
+
+# function for getting a read-only session (replica when healthy)
+async def get_read_db():
+    async with read_session() as session:
+        yield session
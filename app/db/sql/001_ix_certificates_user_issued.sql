@@ -0,0 +1,6 @@
+-- Index behind the /api/v1/me/certificates keyset pages (Certificate.__table_args__).
+-- Apply once on existing databases, before deploying the paginated endpoint:
+--     psql "$DATABASE_URL" -f app/db/sql/001_ix_certificates_user_issued.sql
+-- CONCURRENTLY does not lock certificates against writes (and cannot run in a transaction).
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_certificates_user_issued
+    ON certificates (user_id, issued_date, id);
@@ -1,13 +1,26 @@
+import asyncio
+import secrets
 from contextlib import asynccontextmanager
 import logging
-from fastapi import FastAPI
+from typing import Optional
+from fastapi import FastAPI, Header, HTTPException
 from app.core.redis import init_redis, close_redis
+from app.core.keycloak import init_keycloak, close_keycloak
+from app.core.auth import init_auth, close_auth
+from app.db.database import AsyncSessionLocal, monitor_replica, read_session
+from app.services.catalog import catalog
+from app.services.render_service import render_cache
+from app.services.verify_code_filter import verify_code_filter
+from app.services.verify_warmup import warm_on_startup
+from app.core.config import settings
 from app.api.v1.endpoints.certificate import router as certificate_router
 from app.api.v1.endpoints.template import router as template_router
 from app.api.v1.endpoints.certificate_type import router as certificate_type_router
 from app.api.v1.endpoints.me import router as me_router
 from app.core.exceptions import CertificateNotFoundError
-from fastapi.responses import JSONResponse
+from app.core.metrics import CONTENT_TYPE, MetricsMiddleware, render
+from app.core.tracing import TracingMiddleware, close_tracing, init_tracing
+from fastapi.responses import JSONResponse, Response
 from fastapi.requests import Request
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -28,12 +41,15 @@ logger = logging.getLogger(__name__)
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
-    Lifespan event handler for initializing Redis connections on application startup
-    and closing them on application shutdown.
+    Lifespan event handler for initializing Redis and Keycloak connections on
+    application startup and closing them on application shutdown.
     """
     # Startup
     print("Starting up...")
+    await init_tracing()
     await init_redis()
+    await init_keycloak()
+    await init_auth()
 
     from app.core.redis import redis_client
 
@@ -41,11 +57,33 @@ async def lifespan(app: FastAPI):
     val = await redis_client.get("connection_test")
     print(f"✅ Redis Test: {val}")  # Should print 'ready'
 
+    replica_task = None
+    if settings.DATABASE_REPLICA_URL:
+        replica_task = asyncio.create_task(monitor_replica())
+
+    await verify_code_filter.start(redis_client, AsyncSessionLocal)
+    await catalog.start(redis_client, AsyncSessionLocal)
+    render_cache.start()
+
+    warmup_task = None
+    if settings.VERIFY_WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(warm_on_startup(read_session, redis_client))
+
     yield
 
     # Shutdown
     print("Shutting down...")
+    if warmup_task is not None:
+        warmup_task.cancel()
+    if replica_task is not None:
+        replica_task.cancel()
+    render_cache.stop()
+    await catalog.stop()
+    await verify_code_filter.stop()
+    await close_auth()
+    await close_keycloak()
     await close_redis()
+    await close_tracing()
 
 
 app = FastAPI(
@@ -64,6 +102,24 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Last added runs first: metrics, then the request's server span, then CORS
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """
+    Prometheus scrape endpoint (text exposition format). Only for a scraper sending
+    `Authorization: Bearer <METRICS_TOKEN>`; without a token configured it does not exist.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if not authorization or not secrets.compare_digest(authorization.encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return Response(content=render(), media_type=CONTENT_TYPE)
+
 
 @app.exception_handler(CertificateNotFoundError)
 async def certificate_not_found_handler(
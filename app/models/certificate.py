@@ -1,5 +1,5 @@
 import uuid
-from sqlalchemy import Column, String, Integer, ForeignKey, Date, DateTime
+from sqlalchemy import Column, String, Integer, ForeignKey, Date, DateTime, Index
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -8,6 +8,9 @@ from ..db.database import Base
 
 class Certificate(Base):
     __tablename__ = "certificates"
+    # Serves /me/certificates keyset pages: (user_id, issued_date, id) in index order.
+    # Existing databases: app/db/sql/001_ix_certificates_user_issued.sql
+    __table_args__ = (Index("ix_certificates_user_issued", "user_id", "issued_date", "id"),)
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     certificate_number = Column(String(100), unique=True, nullable=False)
@@ -1,8 +1,8 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from datetime import date
 from uuid import UUID
 from app.schemas.curriculum import SubjectDetail
-from typing import Optional, List, Dict, Any
+from typing import Annotated, Optional, List, Dict, Any
 
 
 class CertificateListItem(BaseModel):
@@ -17,6 +17,12 @@ class CertificateListItem(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class CertificateListPage(BaseModel):
+    """A page of CertificateListItem, newest first; pass next_cursor back to get the next one"""
+    items: List[CertificateListItem]
+    next_cursor: Optional[str] = None
+
+
 class CertificateData(BaseModel):
     """Certificate data portion containing student info, issue date, and verification code"""
     certificate_number: str
@@ -34,4 +40,48 @@ class CertificateVerifyResponse(BaseModel):
     certificate_data: CertificateData
     layout_config: List[Dict[str, Any]]
 
-    model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
+    model_config = ConfigDict(from_attributes=True)
+
+
+VerifyCode = Annotated[str, Field(min_length=5, max_length=50, pattern=r"^[A-Z0-9-]+$")]
+
+
+class CertificateVerifyBatchRequest(BaseModel):
+    """Codes to verify in one call (duplicates are answered once)"""
+    codes: List[VerifyCode] = Field(..., min_length=1)
+
+
+class CertificateVerifyBatchItem(BaseModel):
+    """Result for one code; `result` is null when the code does not exist"""
+    code: str
+    found: bool
+    result: Optional[CertificateVerifyResponse] = None
+
+
+class CertificateVerifyBatchResponse(BaseModel):
+    results: List[CertificateVerifyBatchItem]
+
+
+class CertificateIssueRow(BaseModel):
+    """One input row of a bulk issuance; codes are generated when left empty"""
+    user_id: UUID
+    subject_id: Optional[int] = None
+    type_id: int
+    issued_date: date
+    certificate_number: Optional[str] = Field(None, max_length=100)
+    verify_code: Optional[VerifyCode] = None
+    digital_url: Optional[str] = None
+
+
+class CertificateIssueRejected(BaseModel):
+    """A row that was not issued, with its 1-based line number in the input"""
+    line: int
+    reason: str
+
+
+class CertificateIssueReport(BaseModel):
+    """`publish_errors`: caches not updated for issued rows (they may verify late)"""
+    total: int = 0
+    issued: int = 0
+    rejected: List[CertificateIssueRejected] = []
+    publish_errors: List[str] = []
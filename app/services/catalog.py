@@ -0,0 +1,186 @@
+import asyncio
+import logging
+from types import MappingProxyType
+from typing import Mapping, NamedTuple, Optional
+from uuid import UUID
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from app.core.config import settings
+from app.core.tracing import span
+from app.models.certificate_template import CertificateTemplate
+from app.models.certificate_type import CertificateType
+from app.schemas.certificate_template import TemplateRead
+from app.schemas.certificate_type import CertificateTypeRead, TemplateInfo
+from app.services.layout_plan import get_layout_plan
+
+
+logger = logging.getLogger(__name__)
+
+_VERSION_KEY = "catalog:version"
+
+
+def template_read(template: CertificateTemplate) -> TemplateRead:
+    """TemplateRead from the compiled layout plan, without validating the layout again"""
+    plan = get_layout_plan(template.id, template.layout_config)
+    return TemplateRead.model_construct(
+        id=template.id,
+        name=template.name,
+        description=template.description,
+        layout_config=list(plan.elements),
+    )
+
+
+def type_read(cert_type: CertificateType) -> CertificateTypeRead:
+    """CertificateTypeRead of a type loaded with its template"""
+    template_info = None
+    if cert_type.template:
+        template = cert_type.template
+        plan = get_layout_plan(template.id, template.layout_config)
+        template_info = TemplateInfo.model_construct(
+            id=template.id, name=template.name, layout_config=list(plan.elements)
+        )
+
+    return CertificateTypeRead(
+        id=cert_type.id,
+        name=cert_type.name,
+        category=cert_type.category,
+        target_role=cert_type.target_role,
+        template_id=cert_type.template_id,
+        template=template_info,
+    )
+
+
+def _json_list(items: Mapping[object, bytes]) -> bytes:
+    return b"[" + b",".join(items.values()) + b"]"
+
+
+class CatalogSnapshot(NamedTuple):
+    """
+    Every certificate type and template, as read models and as the JSON the
+    API sends. Immutable: a change builds a new snapshot, readers keep whichever
+    one they already hold.
+    """
+    version: Optional[int]  # catalog:version it was built at; None if Redis was unavailable
+    types: Mapping[int, CertificateTypeRead]
+    templates: Mapping[UUID, TemplateRead]
+    type_json: Mapping[int, bytes]
+    template_json: Mapping[UUID, bytes]
+    types_json: bytes  # GET /certificate-types
+    templates_json: bytes  # GET /templates
+
+
+class Catalog:
+    """
+    In-process snapshot of the certificate type / template catalog, which
+    changes a few times a month, so that reads cost no I/O.
+
+    Writes (through CertificateTypeService / TemplateService) bump
+    `catalog:version` in Redis and rebuild the writer's snapshot right away;
+    every other worker compares its version every CATALOG_SYNC_INTERVAL seconds
+    and rebuilds when it changed.
+    """
+
+    def __init__(self):
+        self.snapshot: Optional[CatalogSnapshot] = None
+        self._sync_task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, db: AsyncSession) -> CatalogSnapshot:
+        """
+        The current snapshot; only builds one (with `db`) if none was loaded yet.
+        `db` may be a lagging replica, so that snapshot is versionless: the next
+        sync replaces it with one built from the primary.
+        """
+        if self.snapshot is None:
+            async with self._lock:
+                if self.snapshot is None:
+                    await self.load(db, None)
+        return self.snapshot
+
+    async def load(self, db: AsyncSession, version: Optional[int]) -> CatalogSnapshot:
+        """
+        Build a snapshot from Postgres. `version` must be read before the queries:
+        a write that lands in between bumps it again, so the next sync reloads.
+        """
+        templates = (await db.scalars(select(CertificateTemplate))).all()
+        types = (await db.scalars(
+            select(CertificateType)
+            .options(joinedload(CertificateType.template))
+            .order_by(CertificateType.id)
+        )).unique().all()
+
+        type_models = {cert_type.id: type_read(cert_type) for cert_type in types}
+        template_models = {template.id: template_read(template) for template in templates}
+        type_json = {key: model.model_dump_json().encode() for key, model in type_models.items()}
+        template_json = {key: model.model_dump_json().encode() for key, model in template_models.items()}
+
+        self.snapshot = CatalogSnapshot(
+            version=version,
+            types=MappingProxyType(type_models),
+            templates=MappingProxyType(template_models),
+            type_json=MappingProxyType(type_json),
+            template_json=MappingProxyType(template_json),
+            types_json=_json_list(type_json),
+            templates_json=_json_list(template_json),
+        )
+        logger.info(f"Catalog snapshot v{version}: {len(types)} types, {len(templates)} templates")
+        return self.snapshot
+
+    async def _version(self, redis_client: Redis) -> Optional[int]:
+        try:
+            return int(await redis_client.get(_VERSION_KEY) or 0)
+        except Exception as e:
+            logger.warning(f"Catalog version lookup failed: {e}")
+            return None
+
+    async def changed(self, db: AsyncSession, redis_client: Redis) -> None:
+        """After a committed write: tell the other workers, and rebuild our own snapshot"""
+        version = None
+        try:
+            version = await redis_client.incr(_VERSION_KEY)
+        except Exception as e:
+            logger.warning(f"Catalog version bump failed, other workers keep their snapshot: {e}")
+
+        async with self._lock:
+            try:
+                with span("catalog.reload"):
+                    await self.load(db, version)
+            except Exception as e:
+                logger.warning(f"Catalog snapshot rebuild failed: {e}")
+                self.snapshot = None  # the next reader rebuilds it
+
+    async def sync(self, redis_client: Redis, session_factory) -> None:
+        """Rebuild the snapshot only if the catalog changed in another worker"""
+        version = await self._version(redis_client)
+        if self.snapshot is not None and version in (None, self.snapshot.version):
+            return  # unchanged, or Redis unavailable: keep serving what we have
+        async with self._lock, session_factory() as db:
+            await self.load(db, version)
+
+    async def start(self, redis_client: Redis, session_factory) -> None:
+        """Load the snapshot and start the background task that keeps it current"""
+        try:
+            await self.sync(redis_client, session_factory)
+        except Exception as e:
+            logger.warning(f"Catalog snapshot unavailable, built on first read: {e}")
+
+        self._sync_task = asyncio.create_task(self._sync_loop(redis_client, session_factory))
+
+    async def _sync_loop(self, redis_client: Redis, session_factory) -> None:
+        while True:
+            await asyncio.sleep(settings.CATALOG_SYNC_INTERVAL)
+            try:
+                await self.sync(redis_client, session_factory)
+            except Exception as e:
+                logger.warning(f"Catalog snapshot sync failed: {e}")
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+
+
+# Process-wide catalog instance
+catalog = Catalog()
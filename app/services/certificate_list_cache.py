@@ -0,0 +1,101 @@
+import logging
+import secrets
+import time
+from typing import Iterable, Optional
+from uuid import UUID
+from redis.asyncio import Redis
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# The user's current generation, and the page cached in it (if any), in one round trip.
+# A Lua table ends at its first nil, so a miss comes back as {generation}
+_GET_PAGE_SCRIPT = """
+local generation = redis.call("get", KEYS[1]) or "0"
+return {generation, redis.call("hget", ARGV[1] .. generation, ARGV[2])}
+"""
+
+# The TTL is set when a generation's hash is created only: later pages must not
+# keep the earlier ones alive past MY_CERTIFICATES_CACHE_TTL
+_SET_PAGE_SCRIPT = """
+redis.call("hset", KEYS[1], ARGV[1], ARGV[2])
+if redis.call("ttl", KEYS[1]) < 0 then
+    redis.call("expire", KEYS[1], ARGV[3])
+end
+"""
+
+
+class CertificateListCache:
+    """
+    Per-user cache of /me/certificates pages, as ready-to-send JSON.
+    All pages of a user live in one Redis hash per generation
+    (`cert_list:{user_id}:{generation}`, one field per cursor + page size), which
+    expires MY_CERTIFICATES_CACHE_TTL after its first page was cached.
+
+    Invalidating a user's list gives them a new random generation
+    (`cert_list:{user_id}:gen`, "0" while unset) instead of deleting pages, so a
+    page read from the DB before an invalidation and written after it lands in
+    the old generation, which nobody reads anymore.
+    Callers therefore write a page with the generation `get_page` returned.
+    A generation starts with the time of its invalidation (see `invalidated_within`).
+    The `{user_id}` hash tag keeps a user's keys in one cluster slot.
+    """
+
+    def __init__(self, redis_client: Redis):
+        self.redis = redis_client
+        self.prefix = "cert_list:"
+        self.ttl = settings.MY_CERTIFICATES_CACHE_TTL
+
+    def _generation_key(self, user_id: UUID | str) -> str:
+        return f"{self.prefix}{{{user_id}}}:gen"
+
+    def _pages_prefix(self, user_id: UUID | str) -> str:
+        return f"{self.prefix}{{{user_id}}}:"
+
+    @staticmethod
+    def _field(cursor: Optional[str], limit: int) -> str:
+        return f"{cursor or ''}:{limit}"
+
+    async def get_page(
+        self, user_id: UUID | str, cursor: Optional[str], limit: int
+    ) -> tuple[Optional[bytes], bytes]:
+        """The cached page (or None) and the generation to cache it under on a miss"""
+        result = await self.redis.eval(
+            _GET_PAGE_SCRIPT,
+            1,
+            self._generation_key(user_id),
+            self._pages_prefix(user_id),
+            self._field(cursor, limit),
+        )
+        generation = result[0]
+        return (result[1] if len(result) > 1 else None), generation
+
+    async def set_page(
+        self, user_id: UUID | str, generation: bytes, cursor: Optional[str], limit: int, page: bytes
+    ) -> None:
+        key = self._pages_prefix(user_id) + generation.decode()
+        await self.redis.eval(_SET_PAGE_SCRIPT, 1, key, self._field(cursor, limit), page, self.ttl)
+
+    @staticmethod
+    def invalidated_within(generation: bytes, seconds: float) -> bool:
+        """Whether the generation began (the user's certificates changed) less than `seconds` ago"""
+        return time.time() - int(generation.split(b"-", 1)[0]) < seconds
+
+    async def invalidate(self, user_ids: Iterable[UUID | str]) -> int:
+        """
+        Drop every cached page of these users (after issuing or revoking their
+        certificates). The pages of the old generation expire on their own.
+        """
+        user_ids = set(map(str, user_ids))
+        if not user_ids:
+            return 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id in user_ids:
+                # Random, so a generation is never reused; kept longer than a late
+                # write to the previous one lives, so an expiry cannot bring back "0"
+                # while it still holds pages from before the invalidation
+                generation = f"{int(time.time())}-{secrets.token_hex(6)}"
+                pipe.set(self._generation_key(user_id), generation, ex=self.ttl * 2)
+            await pipe.execute()
+        return len(user_ids)
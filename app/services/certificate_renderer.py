@@ -0,0 +1,172 @@
+import io
+import logging
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Optional
+
+import qrcode
+from PIL import Image, ImageColor, ImageDraw, ImageFont
+
+from app.core.config import settings
+from app.schemas.certificate_template import TemplateElement
+from app.services.layout_plan import LayoutPlan
+
+
+logger = logging.getLogger(__name__)
+
+# Everything here is synchronous, CPU-bound and free of I/O: remote images are
+# fetched by the caller and passed in as bytes, so a render can run in a thread
+# or in a worker process.
+
+PNG, PDF = "png", "pdf"
+MEDIA_TYPES = {PNG: "image/png", PDF: "application/pdf"}
+
+# Pillow refuses to open images past twice this many pixels (DecompressionBombError);
+# _open_image refuses them past the limit itself, before anything is decoded
+Image.MAX_IMAGE_PIXELS = settings.RENDER_IMAGE_MAX_PIXELS
+
+
+# Bounds of an element: x, y, right, bottom (see LayoutPlan.bounds)
+Box = tuple[int, int, int, int]
+
+
+def field_value(field: Optional[str], data: dict[str, Any]) -> Optional[str]:
+    """Value of the CertificateData field an element is bound to (LayoutPlan.bindings)"""
+    if field is None:
+        return None
+    if field == "subject_name":
+        return (data.get("subject_detail") or {}).get("name")
+    if field == "verify_url":
+        return settings.VERIFY_PUBLIC_URL.format(code=data["verify_code"])
+    value = data.get(field)
+    return None if value is None else str(value)
+
+
+def image_sources(plan: LayoutPlan, data: dict[str, Any]) -> dict[str, str]:
+    """label -> URL of every image element, for the caller to fetch before rendering"""
+    sources = {}
+    for element, field in zip(plan.elements, plan.bindings):
+        if element.type != "image":
+            continue
+        url = (element.style or {}).get("src") or field_value(field, data)
+        if url:
+            sources[element.label] = url
+    return sources
+
+
+@lru_cache(maxsize=64)
+def _font(family: Optional[str], size: int) -> ImageFont.FreeTypeFont:
+    """
+    Fonts are loaded once per (family, size) per process: the family from
+    RENDER_FONT_DIR, else RENDER_FALLBACK_FONT, else Pillow's default font
+    (Latin only: Khmer text would come out as boxes)
+    """
+    paths = []
+    if family:
+        paths.append(Path(settings.RENDER_FONT_DIR) / f"{family.replace(' ', '')}.ttf")
+    if settings.RENDER_FALLBACK_FONT:
+        paths.append(Path(settings.RENDER_FALLBACK_FONT))
+    for path in paths:
+        try:
+            return ImageFont.truetype(str(path), size)
+        except OSError:
+            logger.warning(f"Font {path} not found")
+    return ImageFont.load_default(size)
+
+
+def _color(value: Optional[str], default: str = "#000000") -> tuple:
+    try:
+        return ImageColor.getrgb(value or default)
+    except ValueError:
+        return ImageColor.getrgb(default)
+
+
+def _draw_text(canvas: Image.Image, element: TemplateElement, box: Box, text: str) -> None:
+    style = element.style or {}
+    font = _font(style.get("fontFamily"), int(style.get("fontSize", 24)))
+    draw = ImageDraw.Draw(canvas)
+
+    x, y, right, _ = box
+    width = right - x
+    align = style.get("textAlign", "left")
+    if align not in ("left", "center", "right"):
+        align = "left"
+    if width and align != "left":
+        left, _, right, _ = draw.textbbox((0, 0), text, font=font)
+        x += (width - (right - left)) / (2 if align == "center" else 1)
+
+    draw.text((x, y), text, font=font, fill=_color(style.get("color")), align=align)
+
+
+def _open_image(content: bytes) -> Image.Image:
+    """Decode a fetched image, refusing more than RENDER_IMAGE_MAX_PIXELS"""
+    image = Image.open(io.BytesIO(content))  # reads the header only
+    if image.width * image.height > settings.RENDER_IMAGE_MAX_PIXELS:
+        raise ValueError(f"{image.width}x{image.height} exceeds RENDER_IMAGE_MAX_PIXELS")
+    image.load()
+    return image
+
+
+def _paste(canvas: Image.Image, box: Box, image: Image.Image) -> None:
+    x, y, right, bottom = box
+    size = (right - x or image.width, bottom - y or image.height)
+    image = image.convert("RGBA").resize(size)
+    canvas.paste(image, (x, y), image)
+
+
+def _draw_qr_code(canvas: Image.Image, element: TemplateElement, box: Box, value: str) -> None:
+    qr = qrcode.QRCode(border=1, error_correction=qrcode.constants.ERROR_CORRECT_M)
+    qr.add_data(value)
+    qr.make(fit=True)
+    style = element.style or {}
+    image = qr.make_image(fill_color=style.get("color", "black"), back_color="white").get_image()
+    x, y, right, bottom = box
+    side = right - x or bottom - y or image.width
+    _paste(canvas, (x, y, x + side, y + side), image)
+
+
+def render_certificate(
+    plan: LayoutPlan,
+    data: dict[str, Any],
+    fmt: str,
+    images: Optional[dict[str, bytes]] = None,
+) -> bytes:
+    """
+    Render a template's compiled layout filled with CertificateData into PNG or PDF.
+    Every element is drawn on a RENDER_WIDTH x RENDER_HEIGHT canvas, in order, at
+    its precomputed bounds:
+      - text:    the CertificateData field its label binds, or `style.text`
+      - image:   the fetched bytes for `label` (`style.src` or e.g. student_photo)
+      - qr_code: the public verify URL (or the field its label binds)
+    Elements with nothing to show are skipped.
+    """
+    images = images or {}
+    canvas = Image.new("RGB", (settings.RENDER_WIDTH, settings.RENDER_HEIGHT), "white")
+
+    for element, field, box in zip(plan.elements, plan.bindings, plan.bounds):
+        kind, label = element.type, element.label
+        try:
+            if kind == "text":
+                text = field_value(field, data) or (element.style or {}).get("text")
+                if text:
+                    _draw_text(canvas, element, box, text)
+            elif kind == "image" and label in images:
+                try:
+                    image = _open_image(images[label])
+                except (OSError, ValueError, Image.DecompressionBombError) as e:
+                    # Not an image, truncated, or too large to decode
+                    logger.warning(f"Skipping image '{label}': {e}")
+                    continue
+                _paste(canvas, box, image)
+            elif kind == "qr_code":
+                _draw_qr_code(canvas, element, box, field_value(field, data) or field_value("verify_url", data))
+        except Exception as e:
+            # One broken element (bad image, bad style) must not fail the whole certificate
+            logger.warning(f"Skipping {kind} element '{label}': {e}")
+
+    output = io.BytesIO()
+    if fmt == PDF:
+        canvas.save(output, "PDF", resolution=settings.RENDER_DPI)
+    else:
+        canvas.save(output, "PNG", optimize=False)
+    return output.getvalue()
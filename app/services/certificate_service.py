@@ -1,126 +1,408 @@
-import json
+import asyncio
+import base64
+from datetime import date
+from typing import Optional
 from uuid import UUID
+from pydantic import ValidationError
+from sqlalchemy import Date, Integer, bindparam, func, literal, tuple_
+from sqlalchemy.dialects.postgresql import UUID as PG_UUID
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import joinedload, selectinload
 from app.core.exceptions import CertificateNotFoundError
+from app.db.statements import register
 from app.models.certificate import Certificate
 from app.models.certificate_type import CertificateType
-from app.models.curriculum import Subject
-from app.models.user import User
-from app.services.keycloak_service import KeycloakService
+from app.services.certificate_list_cache import CertificateListCache
+from app.services.layout_plan import get_layout_plan
+from app.services.user_service import UserService
+from app.services.verify_cache import (
+    DEFAULT_PARTS,
+    LAYOUT,
+    NOT_FOUND,
+    PARTS,
+    PROFILE,
+    SUBJECT,
+    CachedVerify,
+    Fragment,
+    VerifyCache,
+    VerifyPayload,
+    core_fragment,
+    etag,
+    etag_matches,
+    layout_fragment,
+    part_id,
+    payload,
+    profile_fragment,
+    subject_fragment,
+)
+from app.services.verify_code_filter import verify_code_filter
+from app.services.verify_query import (
+    VERIFY_BY_CODE,
+    VERIFY_BY_CODES,
+    VERIFY_BY_IDS,
+    VERIFY_LAYOUT,
+    VERIFY_SUBJECT,
+)
+from app.core.config import settings
+from app.core.cache import CacheStats, TTLCache
+from app.core.metrics import Counter
+from app.core.tracing import span
+from app.core.singleflight import SingleFlight
+from app.db.database import AsyncSessionLocal, read_session, replica_available
+from app.schemas.certificate import CertificateListItem, CertificateListPage, CertificateVerifyResponse
 from app.schemas.curriculum import SubjectDetail
+from app.schemas.user import UserProfile
 import logging
 from app.core import redis
 
 
 logger = logging.getLogger(__name__)
 
+# Process-wide: concurrent cache misses for the same verify code share one rebuild
+_verify_flight = SingleFlight()
+# Same for reloading a single expired fragment, keyed by (part, id)
+_part_flight = SingleFlight()
+# Codes this worker recently started a background refresh for; the Redis lock
+# dedupes across workers, this saves the lock round trip on every stale hit
+_refreshing: TTLCache[bool] = TTLCache(
+    maxsize=10000, ttl=settings.VERIFY_LOCK_TTL_MS / 1000
+)
+# Strong references to running refresh tasks, so they are not garbage collected
+_refresh_tasks: set[asyncio.Task] = set()
+# Verify cache (`cert_verify:`) lookups; a cached "not found" counts as a hit
+_verify_stats = CacheStats()
 
-def _build_normalized_response(cert, student_name: str, student_photo: str | None, generation_name: str) -> dict:
-    """Build a normalized dict ready for CertificateVerifyResponse from DB result."""
-    layout_config = []
-    if cert.type and cert.type.template and cert.type.template.layout_config is not None:
-        layout_config = cert.type.template.layout_config if isinstance(cert.type.template.layout_config, list) else []
-
-    subject_data = None
-    if cert.subject:
-        subject_data = SubjectDetail.model_validate(cert.subject).model_dump(mode="json")
-
-    certificate_data = {
-        "certificate_number": cert.certificate_number,
-        "issued_date": cert.issued_date.isoformat(),
-        "verify_code": cert.verify_code,
-        "target_role": cert.type.target_role if cert.type else "STUDENT",
-        "subject_detail": subject_data,
-        "student_name": student_name,
-        "student_photo": student_photo,
-        "generation_name": generation_name,
+
+def get_verify_stats() -> dict[str, int]:
+    """Hit/miss/error counters of the verify cache"""
+    return _verify_stats.as_dict()
+
+
+Counter(
+    "cert_verify_cache_total",
+    "Verify cache lookups by result (hits, misses, errors)",
+    ("result",),
+    collect=lambda: (((result,), value) for result, value in get_verify_stats().items()),
+)
+
+
+def _core_fragment(doc: dict) -> Fragment:
+    """The certificate row itself, plus the ids of the parts it is composed with"""
+    fields = {
+        "certificate_number": doc["certificate_number"],
+        "issued_date": doc["issued_date"],
+        "verify_code": doc["verify_code"],
+        "generation_name": doc["generation_name"],
+    }
+    ids = {
+        "subject_id": doc["subject_id"],
+        "type_id": doc["type_id"],
+        "user_id": doc["user_id"],
     }
+    return core_fragment(fields, ids)
+
+
+def _subject_fragment(subject: Optional[dict]) -> Fragment:
+    if subject is None:
+        return DEFAULT_PARTS[SUBJECT]
+    return subject_fragment(SubjectDetail.model_validate(subject).model_dump(mode="json"))
+
+
+def _layout_fragment(layout: Optional[dict]) -> Fragment:
+    """The persona (target_role) and the template layout, as resolved through the type"""
+    if layout is None:
+        return DEFAULT_PARTS[LAYOUT]
+
+    template_id, layout_config = layout["template_id"], layout["layout_config"]
+    if template_id is None:
+        return layout_fragment(layout["target_role"], [])
 
+    try:
+        layout_json = get_layout_plan(template_id, layout_config).json
+    except ValidationError as e:
+        # A layout stored before elements were validated: send it as is, like before
+        logger.warning(f"Template {template_id} has an invalid layout_config: {e}")
+        layout_config = layout_config if isinstance(layout_config, list) else []
+        return layout_fragment(layout["target_role"], layout_config)
+
+    return layout_fragment(layout["target_role"], layout_json)
+
+
+def _profile_fragment(profile: Optional[UserProfile]) -> Fragment:
+    if profile is None:
+        return DEFAULT_PARTS[PROFILE]
+    return profile_fragment(profile.full_name_en, profile.photo_url)
+
+
+def _parts(doc: dict, profile: Optional[UserProfile]) -> dict[str, Fragment]:
     return {
-        "certificate_data": certificate_data,
-        "layout_config": layout_config,
+        SUBJECT: _subject_fragment(doc["subject"]),
+        LAYOUT: _layout_fragment(doc["layout"]),
+        PROFILE: _profile_fragment(profile),
     }
 
 
+def _encode_cursor(issued_date: date, cert_id: UUID) -> str:
+    """Opaque /me/certificates cursor: the (issued_date, id) of the last item of a page"""
+    raw = f"{issued_date.isoformat()}|{cert_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[date, UUID]:
+    """Inverse of _encode_cursor; raises ValueError for anything else"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        issued_date, cert_id = raw.split("|")
+        return date.fromisoformat(issued_date), UUID(cert_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def _page_query():
+    """/me/certificates rows (CertificateListItem fields), newest first"""
+    return (
+        select(
+            Certificate.id,
+            Certificate.certificate_number,
+            Certificate.issued_date,
+            Certificate.verify_code,
+            func.coalesce(CertificateType.name, literal("Unknown")).label("type_name"),
+            func.coalesce(CertificateType.target_role, literal("STUDENT")).label("target_role"),
+        )
+        .outerjoin(CertificateType, CertificateType.id == Certificate.type_id)
+        .where(Certificate.user_id == bindparam("user_id"))
+        .order_by(Certificate.issued_date.desc(), Certificate.id.desc())
+        .limit(bindparam("limit", type_=Integer))
+    )
+
+
+_FIRST_PAGE = register("my_certificates_first_page", _page_query())
+_PAGE_AFTER = register(
+    "my_certificates_page_after",
+    _page_query().where(
+        tuple_(Certificate.issued_date, Certificate.id)
+        < tuple_(bindparam("after_date", type_=Date), bindparam("after_id", type_=PG_UUID(as_uuid=True)))
+    ),
+)
+
+
+def _validated(result: VerifyPayload) -> VerifyPayload:
+    """Full model validation, run only when an entry is (re)written, never on a hit"""
+    CertificateVerifyResponse.model_validate_json(result.body)
+    return result
+
+
 class CertificateService:
-    def __init__(self, db: AsyncSession, keycloak: KeycloakService):
+    def __init__(self, db: AsyncSession, users: UserService):
         self.db = db
-        self.keycloak = keycloak
+        self.users = users
+        self.cache = VerifyCache(redis.redis_client)
 
-    async def get_by_code(self, code: str):
-        """Find a certificate in postgresql by it code"""
+    async def get_by_code(self, code: str, if_none_match: Optional[str] = None) -> VerifyPayload:
+        """
+        Find a certificate in postgresql by it code.
+        Returns the serialized CertificateVerifyResponse JSON, ready to send as is,
+        with an ETag derived from the versions of the fragments it was built from.
+        When every fragment is cached and `if_none_match` matches their versions, the
+        body is None: nothing is assembled, and no missing part is reloaded for it.
+        """
 
         if not code:
             raise ValueError("Verification code cannot be empty.")
 
-        cache_key = f"cert_verify:{code}"
+        # Bloom filter: a code that was never issued is rejected with no I/O at all
+        if not verify_code_filter.might_exist(code):
+            raise CertificateNotFoundError(code=code)
 
         # Cached Hit & Cached Miss Logic
+        cached = None
         try:
-            cached_data = await redis.redis_client.get(cache_key)
-            if cached_data:
-                parsed = json.loads(cached_data)
-                # Backward compatibility: check for new structure with certificate_data
-                if parsed.get("certificate_data") is not None and parsed.get("layout_config") is not None:
-                    logger.info(f"Cached Hit for code : {code}")
-                    return parsed
-                # Old format - fall through to DB; will repopulate cache with new format
+            with span("verify.cache_lookup"):
+                cached = await self.cache.get(code)
         except Exception as e:
+            # Counted as an error only: the cache was not asked, so it did not miss
+            _verify_stats.errors += 1
             logger.warning(f"Redis lookup failed: {e}")
+        else:
+            if cached is not None:
+                _verify_stats.hits += 1
+            else:
+                _verify_stats.misses += 1
+
+        if cached is NOT_FOUND:
+            raise CertificateNotFoundError(code=code)
+        if cached is not None:
+            if cached.stale:
+                # Stale-while-revalidate: answer now, refresh in the background
+                self._schedule_refresh(code)
+            if if_none_match and all(part in cached.parts for part in PARTS):
+                current = etag(cached.core, cached.parts)
+                if etag_matches(if_none_match, current):
+                    return VerifyPayload(None, current)
+            with span("verify.assemble"):
+                return await self._complete(cached)
+
+        # Stampede protection: concurrent misses for the same code in this worker
+        # share one rebuild instead of each running the query + Keycloak call
+        with span("verify.rebuild"):
+            return await _verify_flight.do(code, lambda: self._rebuild(code))
+
+    async def _complete(self, cached: CachedVerify) -> VerifyPayload:
+        """Assemble a cached entry, reloading only the parts that expired or were invalidated"""
+        core, ids, parts = cached.core, cached.ids, cached.parts
+        missing = [part for part in PARTS if part not in parts]
+        if not missing:
+            return payload(core, parts)
+
+        for part in missing:
+            key_id = part_id(ids, part)
+            parts[part] = await _part_flight.do(
+                (part, key_id), lambda part=part, key_id=key_id: self._refresh_part(ids, part, key_id)
+            )
+        return _validated(payload(core, parts))
 
+    async def _refresh_part(self, ids: dict, part: str, key_id) -> Fragment:
+        fragment = await self._load_part(part, key_id)
         try:
-            query = (
-                select(Certificate)
-                .where(Certificate.verify_code == code)
-                .options(
-                    joinedload(Certificate.type).joinedload(
-                        CertificateType.template
-                    ),
-                    selectinload(Certificate.subject).selectinload(Subject.topics),
-                    joinedload(Certificate.user).joinedload(User.generation),
-                )
+            await self.cache.set_parts(ids, {part: fragment})
+        except Exception as e:
+            logger.warning(f"Redis write failed for {part} fragment {key_id}: {e}")
+        return fragment
+
+    async def _load_part(self, part: str, key_id) -> Fragment:
+        """Load one fragment (subject / layout / profile) from its source"""
+        if part == PROFILE:
+            return _profile_fragment(await self.users.get_user_profile(str(key_id)))
+
+        try:
+            # Shared by every caller of the part flight: on a session of its own,
+            # never on the request session of whichever caller started it
+            async with read_session() as db:
+                if part == SUBJECT:
+                    return _subject_fragment(await db.scalar(VERIFY_SUBJECT, {"id": key_id}))
+                return _layout_fragment(await db.scalar(VERIFY_LAYOUT, {"id": key_id}))
+
+        except SQLAlchemyError as e:
+            logger.error(f"Database error during {part} lookup: {e}")
+            raise ConnectionError(
+                f"Database service is currently unavailable or down detail: {e}"
             )
 
-            result = await self.db.execute(query)
-            cert = result.scalar_one_or_none()
+    async def _rebuild(self, code: str) -> VerifyPayload:
+        """Rebuild a cache entry, letting only one worker across replicas hit the DB"""
+        lock_token = None
+        try:
+            lock_token = await self.cache.acquire_lock(code)
+            if lock_token is None:
+                # Another worker holds the lock: wait briefly for it to publish the entry,
+                # then fall back to computing it ourselves (the holder may have died)
+                cached = await self.cache.wait_for(code, settings.VERIFY_LOCK_WAIT)
+                if cached is NOT_FOUND:
+                    raise CertificateNotFoundError(code=code)
+                if cached is not None:
+                    return await self._complete(cached)
+        except CertificateNotFoundError:
+            raise
+        except Exception as e:
+            logger.warning(f"Redis lock failed for code {code}: {e}")
 
-            if cert is None:
-                raise CertificateNotFoundError(code=code)
+        try:
+            try:
+                # Shared by every waiter of the flight: on a session of its own, since the
+                # starting request's session closes with it (e.g. when its client disconnects)
+                core, parts = await self._load_own_session(code)
+                with span("verify.build_response"):
+                    result = _validated(payload(core, parts))
+            except CertificateNotFoundError:
+                # Negative cache: scrapers and typos stop reaching Postgres for a while
+                try:
+                    await self.cache.set_not_found(code)
+                except Exception as e:
+                    logger.warning(f"Redis write failed for code {code}: {e}")
+                raise
 
-            generation_name = "N/A"
-            if cert.user and cert.user.generation:
-                generation_name = cert.user.generation.name
+            # Save to redis for future cache hits
+            try:
+                await self.cache.set(code, core, parts)
+            except Exception as e:
+                logger.warning(f"Redis write failed for code {code}: {e}")
 
-            student_name = "User not Found"
-            student_photo = None
+            return result
+        finally:
+            if lock_token is not None:
+                try:
+                    await self.cache.release_lock(code, lock_token)
+                except Exception as e:
+                    logger.warning(f"Redis lock release failed for code {code}: {e}")
 
-            if cert.user_id:
-                user_profile = await self.keycloak.get_user_profile(str(cert.user_id))
+    def _schedule_refresh(self, code: str) -> None:
+        if _refreshing.get(code):
+            return
+        _refreshing.set(code, True)
+        task = asyncio.create_task(self._refresh(code))
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
 
-                if user_profile:
-                    student_name = user_profile.full_name_en
-                    student_photo = user_profile.photo_url
+    async def _refresh(self, code: str) -> None:
+        """
+        Background rebuild of a stale entry. Runs on its own DB session, since the
+        request's session is closed by then, and only in the worker holding the lock.
+        """
+        try:
+            lock_token = await self.cache.acquire_lock(code)
+            if lock_token is None:
+                return  # Another worker is refreshing it
+            try:
+                core, parts = await self._load_own_session(code)
+                _validated(payload(core, parts))
+                await self.cache.set(code, core, parts)
+            finally:
+                await self.cache.release_lock(code, lock_token)
+        except CertificateNotFoundError:
+            # Deleted since it was cached
+            try:
+                await self.cache.set_not_found(code)
+            except Exception as e:
+                logger.warning(f"Redis write failed for code {code}: {e}")
+        except Exception as e:
+            logger.warning(f"Background refresh failed for code {code}: {e}")
 
-                else:
-                    logger.warning(
-                        f"Keycloak sync issue: User {cert.user_id} not found"
-                    )
+    async def _load_own_session(self, code: str) -> tuple[Fragment, dict[str, Fragment]]:
+        """
+        _load on a read session of its own. A code the replica does not have is looked
+        up again on the primary before it is reported (and negative-cached): the replica
+        may not have replayed the insert yet, and the marker would hide it until it expires.
+        """
+        on_replica = replica_available()
+        try:
+            async with read_session() as db:
+                return await CertificateService(db, self.users)._load(code)
+        except CertificateNotFoundError:
+            if not on_replica:
+                raise
+        async with AsyncSessionLocal() as db:
+            return await CertificateService(db, self.users)._load(code)
 
-            # Build normalized response (same shape for both cache and DB paths)
-            normalized = _build_normalized_response(
-                cert=cert,
-                student_name=student_name,
-                student_photo=student_photo,
-                generation_name=generation_name,
-            )
+    async def _load(self, code: str) -> tuple[Fragment, dict[str, Fragment]]:
+        """Load the certificate + profile from Postgres/Keycloak as cache fragments"""
+        try:
+            doc = await self.db.scalar(VERIFY_BY_CODE, {"code": code})
 
-            # Save to redis for future cache hits
-            await redis.redis_client.setex(cache_key, 3600, json.dumps(normalized))
+            if doc is None:
+                raise CertificateNotFoundError(code=code)
+
+            user_profile = None
+            if doc["user_id"]:
+                with span("verify.profile"):
+                    user_profile = await self.users.get_user_profile(doc["user_id"])
+
+                if not user_profile:
+                    logger.warning(
+                        f"Keycloak sync issue: User {doc['user_id']} not found"
+                    )
 
-            return normalized
+            return _core_fragment(doc), _parts(doc, user_profile)
 
         except (CertificateNotFoundError, ValueError):
             raise
@@ -135,24 +417,139 @@ class CertificateService:
             logger.critical(f"Unexpected error in Certificate Service: {e}")
             raise
 
-    async def get_by_user_id(self, user_id: str) -> list:
-        """Get all certificates for a user (for /me/certificates endpoint)."""
-        query = (
-            select(Certificate)
-            .where(Certificate.user_id == UUID(user_id))
-            .options(joinedload(Certificate.type))
-            .order_by(Certificate.issued_date.desc())
-        )
-        result = await self.db.execute(query)
-        certs = result.scalars().unique().all()
+    async def get_many_by_code(self, codes: list[str]) -> dict[str, Optional[VerifyPayload]]:
+        """
+        Batch variant of get_by_code, keyed by code; None marks a code that does not exist.
+        Hits come from one MGET, all misses are loaded with one `verify_code IN (...)`
+        query and one bulk profile lookup, then written back in one pipeline.
+        """
+        codes = list(dict.fromkeys(codes))
+        results: dict[str, Optional[VerifyPayload]] = {
+            code: None for code in codes if not verify_code_filter.might_exist(code)
+        }
+        lookup = [code for code in codes if code not in results]
+
+        cached = None
+        if lookup:
+            try:
+                cached = await self.cache.get_many(lookup)
+            except Exception as e:
+                _verify_stats.errors += 1
+                logger.warning(f"Redis batch lookup failed: {e}")
+
+        misses = []
+        for code in lookup:
+            entry = cached.get(code) if cached is not None else None
+            if entry is NOT_FOUND:
+                results[code] = None
+            elif entry is None:
+                misses.append(code)
+            else:
+                if entry.stale:
+                    self._schedule_refresh(code)
+                results[code] = await self._complete(entry)
+        if cached is not None:
+            _verify_stats.hits += len(lookup) - len(misses)
+            _verify_stats.misses += len(misses)
+
+        if misses:
+            on_replica = replica_available()
+            entries = await self._load_many(self.db, VERIFY_BY_CODES, {"codes": misses})
+            for code, core, parts in entries:
+                results[code] = _validated(payload(core, parts))
+            not_found = [code for code in misses if code not in results]
+            if not_found and on_replica:
+                # Not replayed on the replica yet? Check on the primary before negative caching
+                async with AsyncSessionLocal() as db:
+                    late = await self._load_many(db, VERIFY_BY_CODES, {"codes": not_found})
+                for code, core, parts in late:
+                    results[code] = _validated(payload(core, parts))
+                entries += late
+                not_found = [code for code in not_found if code not in results]
+            for code in not_found:
+                results[code] = None
+            try:
+                await self.cache.set_many(entries)
+                if not_found:
+                    await self.cache.set_not_found_many(not_found)
+            except Exception as e:
+                logger.warning(f"Redis batch write failed: {e}")
+
+        return {code: results[code] for code in codes}
+
+    async def warm(self, cert_ids: list[UUID]) -> int:
+        """
+        Cache the verify entries of a batch of certificates: one eager-loaded query,
+        one bulk profile lookup and one Redis pipeline. Returns the number cached.
+        """
+        entries = await self._load_many(self.db, VERIFY_BY_IDS, {"ids": list(cert_ids)})
+        for _, core, parts in entries:
+            _validated(payload(core, parts))
+        return await self.cache.set_many(entries)
+
+    async def _load_many(
+        self, db: AsyncSession, statement, params: dict
+    ) -> list[tuple[str, Fragment, dict[str, Fragment]]]:
+        """Load the certificates a verify statement selects as (code, core, parts), profiles in bulk"""
+        try:
+            docs = (await db.scalars(statement, params)).all()
+        except SQLAlchemyError as e:
+            logger.error(f"Database error during certificate batch lookup: {e}")
+            raise ConnectionError(
+                f"Database service is currently unavailable or down detail: {e}"
+            )
+
+        profiles = await self.users.get_user_profiles(doc["user_id"] for doc in docs if doc["user_id"])
         return [
-            {
-                "id": cert.id,
-                "certificate_number": cert.certificate_number,
-                "issued_date": cert.issued_date,
-                "verify_code": cert.verify_code,
-                "type_name": cert.type.name if cert.type else "Unknown",
-                "target_role": cert.type.target_role if cert.type else "STUDENT",
-            }
-            for cert in certs
+            (doc["verify_code"], _core_fragment(doc), _parts(doc, profiles.get(doc["user_id"])))
+            for doc in docs
         ]
+
+    async def get_page_by_user_id(self, user_id: str, cursor: Optional[str], limit: int) -> bytes:
+        """
+        One page of a user's certificates (for /me/certificates), newest first, as
+        serialized CertificateListPage JSON. Pages are keyset-paginated on
+        (issued_date, id) and cached per user until their certificates change.
+        Read on the request's session (the replica), except shortly after a change.
+        Raises ValueError for a cursor this service did not issue.
+        """
+        after = _decode_cursor(cursor) if cursor else None
+        list_cache = CertificateListCache(self.cache.redis)
+        generation = None
+        try:
+            cached, generation = await list_cache.get_page(user_id, cursor, limit)
+            if cached is not None:
+                return cached
+        except Exception as e:
+            logger.warning(f"Redis certificate list lookup failed for user {user_id}: {e}")
+
+        params = {"user_id": UUID(user_id), "limit": limit + 1}
+        if after:
+            params["after_date"], params["after_id"] = after
+        statement = _PAGE_AFTER if after else _FIRST_PAGE
+        try:
+            if generation is not None and list_cache.invalidated_within(generation, settings.DB_REPLICA_MAX_LAG):
+                # Certificates just issued / revoked: the replica may not have them yet,
+                # and the page would stay cached; read them where they were written
+                async with AsyncSessionLocal() as db:
+                    certs = (await db.execute(statement, params)).all()
+            else:
+                certs = (await self.db.execute(statement, params)).all()
+        except SQLAlchemyError as e:
+            logger.error(f"Database error during certificate list lookup: {e}")
+            raise ConnectionError(
+                f"Database service is currently unavailable or down detail: {e}"
+            )
+
+        items = [CertificateListItem(**cert._mapping) for cert in certs[:limit]]
+        next_cursor = None
+        if len(certs) > limit:
+            next_cursor = _encode_cursor(certs[limit - 1].issued_date, certs[limit - 1].id)
+        page = CertificateListPage(items=items, next_cursor=next_cursor).model_dump_json().encode()
+
+        if generation is not None:  # else the lookup failed: no way to tell a stale write
+            try:
+                await list_cache.set_page(user_id, generation, cursor, limit, page)
+            except Exception as e:
+                logger.warning(f"Redis certificate list write failed for user {user_id}: {e}")
+        return page
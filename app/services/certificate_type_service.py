@@ -1,15 +1,32 @@
+import logging
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from sqlalchemy.orm import joinedload
+from app.core import redis
+from app.core.tracing import span
 from app.models.certificate_type import CertificateType
 from app.models.certificate_template import CertificateTemplate
 from app.schemas.certificate_type import CertificateTypeCreate, CertificateTypeUpdate, CertificateTypeRead
-from uuid import UUID
+from app.services.catalog import catalog
+from app.services.verify_cache import VerifyCache
+
+
+logger = logging.getLogger(__name__)
 
 
 class CertificateTypeService:
     def __init__(self, db: AsyncSession):
         self.db = db
+        self.verify_cache = VerifyCache(redis.redis_client)
+
+    async def _invalidate_verify_cache(self, type_id: int) -> None:
+        """Drop only the cached layout fragment of this type"""
+        try:
+            with span("verify.invalidate_layouts"):
+                await self.verify_cache.invalidate_layouts([type_id])
+            logger.info(f"Invalidated verify layout fragment for certificate type {type_id}")
+        except Exception as e:
+            logger.warning(f"Verify cache invalidation failed for certificate type {type_id}: {e}")
 
     async def create(self, payload: CertificateTypeCreate) -> CertificateTypeRead:
         if payload.template_id:
@@ -29,26 +46,29 @@ class CertificateTypeService:
         self.db.add(new_type)
         await self.db.commit()
         await self.db.refresh(new_type)
+        await catalog.changed(self.db, redis.redis_client)
 
-        return await self._to_read(new_type)
+        return await self.get_by_id(new_type.id)
 
     async def get_all(self) -> list[CertificateTypeRead]:
-        result = await self.db.execute(
-            select(CertificateType).options(joinedload(CertificateType.template))
-        )
-        types = result.scalars().all()
-        return [await self._to_read(t) for t in types]
+        snapshot = await catalog.get(self.db)
+        return list(snapshot.types.values())
+
+    async def get_all_json(self) -> bytes:
+        """GET /certificate-types, already serialized"""
+        return (await catalog.get(self.db)).types_json
 
     async def get_by_id(self, type_id: int) -> CertificateTypeRead:
-        result = await self.db.execute(
-            select(CertificateType)
-            .where(CertificateType.id == type_id)
-            .options(joinedload(CertificateType.template))
-        )
-        cert_type = result.scalar_one_or_none()
+        cert_type = (await catalog.get(self.db)).types.get(type_id)
+        if not cert_type:
+            raise ValueError(f"CertificateType with id '{type_id}' not found")
+        return cert_type
+
+    async def get_by_id_json(self, type_id: int) -> bytes:
+        cert_type = (await catalog.get(self.db)).type_json.get(type_id)
         if not cert_type:
             raise ValueError(f"CertificateType with id '{type_id}' not found")
-        return await self._to_read(cert_type)
+        return cert_type
 
     async def update(self, type_id: int, payload: CertificateTypeUpdate) -> CertificateTypeRead:
         result = await self.db.execute(
@@ -80,7 +100,12 @@ class CertificateTypeService:
         await self.db.commit()
         await self.db.refresh(cert_type)
 
-        return await self._to_read(cert_type)
+        # target_role and the template layout make up the cached layout fragment
+        if payload.template_id is not None or payload.target_role is not None:
+            await self._invalidate_verify_cache(type_id)
+        await catalog.changed(self.db, redis.redis_client)
+
+        return await self.get_by_id(type_id)
 
     async def delete(self, type_id: int) -> None:
         result = await self.db.execute(
@@ -92,19 +117,5 @@ class CertificateTypeService:
         
         await self.db.delete(cert_type)
         await self.db.commit()
-
-    async def _to_read(self, cert_type: CertificateType) -> CertificateTypeRead:
-        from app.schemas.certificate_type import TemplateInfo
-        
-        template_info = None
-        if cert_type.template:
-            template_info = TemplateInfo.model_validate(cert_type.template)
-        
-        return CertificateTypeRead(
-            id=cert_type.id,
-            name=cert_type.name,
-            category=cert_type.category,
-            target_role=cert_type.target_role,
-            template_id=cert_type.template_id,
-            template=template_info,
-        )
+        await self._invalidate_verify_cache(type_id)
+        await catalog.changed(self.db, redis.redis_client)
@@ -0,0 +1,128 @@
+import asyncio
+import hashlib
+import logging
+from datetime import date
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.db.database import AsyncSessionLocal
+
+
+logger = logging.getLogger(__name__)
+
+SEQUENCE_NAME = "certificate_code_seq"
+
+# Crockford base32: no I, L, O, U, so codes read back unambiguously and match ^[A-Z0-9-]+$
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_BASE = len(_ALPHABET)
+_CODE_PREFIX = "KSHRD-"
+_CODE_DIGITS = 8  # 8 base32 digits = 40 bits, ~1.1e12 codes
+_HALF_BITS = 20
+_HALF_MASK = (1 << _HALF_BITS) - 1
+_FEISTEL_ROUNDS = 4
+
+
+def _round(half: int, round_no: int) -> int:
+    digest = hashlib.blake2b(
+        half.to_bytes(3, "big") + bytes([round_no]),
+        digest_size=3,
+        key=settings.VERIFY_CODE_KEY.encode(),
+    ).digest()
+    return int.from_bytes(digest, "big") & _HALF_MASK
+
+
+def _permute(value: int) -> int:
+    """
+    Keyed Feistel permutation over 40 bits: a bijection, so distinct sequence
+    values give distinct codes, while consecutive values give unrelated codes.
+    """
+    left, right = value >> _HALF_BITS, value & _HALF_MASK
+    for round_no in range(_FEISTEL_ROUNDS):
+        left, right = right, left ^ _round(right, round_no)
+    return (left << _HALF_BITS) | right
+
+
+def _check_digit(digits: str) -> str:
+    """Luhn mod 32: catches any single mistyped character and most adjacent swaps"""
+    factor, total = 2, 0
+    for char in reversed(digits):
+        addend = factor * _ALPHABET.index(char)
+        total += addend // _BASE + addend % _BASE
+        factor = 3 - factor
+    return _ALPHABET[(_BASE - total % _BASE) % _BASE]
+
+
+def encode_verify_code(value: int) -> str:
+    """Sequence value -> fixed-length verify code, e.g. KSHRD-7K3M9Q2XH"""
+    permuted = _permute(value)
+    digits = ""
+    for _ in range(_CODE_DIGITS):
+        permuted, digit = divmod(permuted, _BASE)
+        digits = _ALPHABET[digit] + digits
+    return f"{_CODE_PREFIX}{digits}{_check_digit(digits)}"
+
+
+def certificate_number(value: int, issued_date: date) -> str:
+    """Human-facing, sequential certificate number, e.g. KSHRD-2026-000123"""
+    return f"{_CODE_PREFIX}{issued_date.year}-{value:06d}"
+
+
+class CodeAllocator:
+    """
+    Hands out unique sequence values for new certificates from memory.
+    Each `nextval` on `certificate_code_seq` (INCREMENT BY the block size) reserves
+    a whole block for this worker, so only one round trip in every block_size
+    allocations touches Postgres, and workers can never hand out the same value.
+    Values skipped by a crash or a rolled back insert are simply never used.
+    Blocks are reserved on a session of their own, committed right away, so they
+    never depend on the outcome of the caller's transaction.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self._next = 0
+        self._end = 0
+        self._block_size = None
+        self._lock = asyncio.Lock()
+
+    async def allocate(self, count: int) -> list[int]:
+        async with self._lock:
+            values = []
+            while len(values) < count:
+                if self._next >= self._end:
+                    await self._reserve()
+                take = min(count - len(values), self._end - self._next)
+                values.extend(range(self._next, self._next + take))
+                self._next += take
+            return values
+
+    async def _reserve(self) -> None:
+        async with self.session_factory() as db:
+            if self._block_size is None:
+                self._block_size = await self._ensure_sequence(db)
+            start = await db.scalar(text(f"SELECT nextval('{SEQUENCE_NAME}')"))
+            await db.commit()
+        self._next, self._end = start, start + self._block_size
+        logger.debug(f"Reserved certificate code block [{self._next}, {self._end})")
+
+    async def _ensure_sequence(self, db: AsyncSession) -> int:
+        """Create the sequence on first use; returns its actual increment (the block size)"""
+        await db.execute(text(
+            f"CREATE SEQUENCE IF NOT EXISTS {SEQUENCE_NAME} "
+            f"START WITH 1 INCREMENT BY {settings.VERIFY_CODE_BLOCK_SIZE}"
+        ))
+        await db.commit()
+        increment = await db.scalar(
+            text("SELECT increment_by FROM pg_sequences WHERE sequencename = :name"),
+            {"name": SEQUENCE_NAME},
+        )
+        if increment != settings.VERIFY_CODE_BLOCK_SIZE:
+            logger.warning(
+                f"{SEQUENCE_NAME} increments by {increment}, not VERIFY_CODE_BLOCK_SIZE="
+                f"{settings.VERIFY_CODE_BLOCK_SIZE}; using {increment}"
+            )
+        return increment
+
+
+# Process-wide allocator, shared by every issuance in this worker
+code_allocator = CodeAllocator()
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Optional
+from redis.asyncio import Redis
+from sqlalchemy import select
+from app.core.config import settings
+from app.models.certificate import Certificate
+from app.models.user import User
+from app.services.certificate_renderer import image_sources, render_certificate
+from app.services.certificate_service import CertificateService
+from app.services.layout_plan import layout_plan_for
+from app.services.render_service import fetch_images
+from app.services.user_service import UserService
+
+
+logger = logging.getLogger(__name__)
+
+
+def _write_part(path: Path, content: bytes) -> None:
+    """Write then rename: a part file on disk is always complete, which is what makes resuming safe"""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    with os.fdopen(fd, "wb") as file:
+        file.write(content)
+    os.replace(tmp, path)
+
+
+class CohortRender:
+    """
+    Renders every certificate of a generation and/or type into one ZIP.
+    Each certificate is rendered in a process pool (one process per core) into its
+    own part file under `{output}.parts/`; a rerun after a crash skips the parts
+    already on disk. Batches are loaded by a separate task, one ahead of the
+    renders, so the pool does not drain at batch boundaries. The ZIP is then
+    written part by part from disk, so no more than the in-flight renders and one
+    loaded batch are ever held in memory.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        redis_client: Redis,
+        output: Path,
+        fmt: str,
+        workers: Optional[int] = None,
+    ):
+        self.session_factory = session_factory
+        self.users = UserService(redis_client)
+        self.output = output
+        self.fmt = fmt
+        self.workers = workers or os.cpu_count() or 1
+        self.parts_dir = output.with_name(output.name + ".parts")
+
+    async def run(self, generation_id: Optional[int] = None, type_id: Optional[int] = None) -> int:
+        codes = await self._select_codes(generation_id, type_id)
+        self.parts_dir.mkdir(parents=True, exist_ok=True)
+        todo = [code for code in codes if not self._part(code).exists()]
+        logger.info(
+            f"Cohort render: {len(codes)} certificates, {len(codes) - len(todo)} already rendered, "
+            f"{self.workers} processes"
+        )
+
+        started = time.perf_counter()
+        done = 0
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            # Enough renders in flight to keep every process busy (images download meanwhile)
+            in_flight = asyncio.Semaphore(self.workers * 2)
+            # The next batch waits here, loaded, while the current one renders; then
+            # None when all are loaded, or the exception that stopped the loading
+            batches: asyncio.Queue = asyncio.Queue(maxsize=1)
+
+            async def load() -> None:
+                batch_size = settings.VERIFY_BATCH_MAX_CODES
+                try:
+                    for start in range(0, len(todo), batch_size):
+                        async with self.session_factory() as db:
+                            await batches.put(await CertificateService(db, self.users).get_many_by_code(
+                                todo[start:start + batch_size]
+                            ))
+                except Exception as e:
+                    await batches.put(e)
+                else:
+                    await batches.put(None)
+
+            async def render(code: str, body: bytes) -> None:
+                nonlocal done
+                try:
+                    payload = json.loads(body)
+                    plan, data = layout_plan_for(payload["layout_config"]), payload["certificate_data"]
+                    images = await fetch_images(image_sources(plan, data))
+                    content = await loop.run_in_executor(
+                        pool, render_certificate, plan, data, self.fmt, images
+                    )
+                    await asyncio.to_thread(_write_part, self._part(code), content)
+                finally:
+                    in_flight.release()
+                done += 1
+                if done % 100 == 0:
+                    rate = done / (time.perf_counter() - started)
+                    logger.info(f"Cohort render: {done}/{len(todo)} rendered ({rate:.1f}/s)")
+
+            loader = asyncio.create_task(load())
+            renders: list[asyncio.Task] = []
+            try:
+                while (results := await batches.get()) is not None:
+                    if isinstance(results, Exception):
+                        raise results
+                    for code, result in results.items():
+                        if result is None:
+                            continue
+                        await in_flight.acquire()
+                        renders.append(asyncio.create_task(render(code, result.body)))
+                    # Forget finished renders; a failed one stops the job
+                    finished = [task for task in renders if task.done()]
+                    renders = [task for task in renders if not task.done()]
+                    for task in finished:
+                        task.result()
+                await asyncio.gather(*renders)
+            finally:
+                loader.cancel()
+                for task in renders:
+                    task.cancel()
+
+        count = await asyncio.to_thread(self._write_zip, codes)
+        logger.info(
+            f"Cohort render: {done} rendered, {count} certificates written to {self.output} "
+            f"in {time.perf_counter() - started:.1f}s"
+        )
+        return count
+
+    def _part(self, code: str) -> Path:
+        return self.parts_dir / f"{code}.{self.fmt}"
+
+    async def _select_codes(self, generation_id: Optional[int], type_id: Optional[int]) -> list[str]:
+        query = select(Certificate.verify_code).order_by(Certificate.certificate_number)
+        if generation_id is not None:
+            query = query.join(Certificate.user).where(User.generation_id == generation_id)
+        if type_id is not None:
+            query = query.where(Certificate.type_id == type_id)
+        async with self.session_factory() as db:
+            return list((await db.scalars(query)).all())
+
+    def _write_zip(self, codes: list[str]) -> int:
+        """Stream the parts into the archive (stored: PNG / PDF are already compressed)"""
+        count = 0
+        tmp = self.output.with_name(self.output.name + ".tmp")
+        with zipfile.ZipFile(tmp, "w", compression=zipfile.ZIP_STORED) as archive:
+            for code in codes:
+                part = self._part(code)
+                if part.exists():
+                    archive.write(part, arcname=part.name)
+                    count += 1
+        os.replace(tmp, self.output)
+        shutil.rmtree(self.parts_dir)
+        return count
@@ -0,0 +1,329 @@
+import csv
+import json
+import logging
+from typing import AsyncIterator, Iterable, Optional
+from pydantic import ValidationError
+from redis.asyncio import Redis
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.models.certificate import Certificate
+from app.models.certificate_type import CertificateType
+from app.models.curriculum import Subject
+from app.models.user import User
+from app.schemas.certificate import (
+    CertificateIssueRejected,
+    CertificateIssueReport,
+    CertificateIssueRow,
+)
+from app.services.certificate_list_cache import CertificateListCache
+from app.services.code_allocator import certificate_number, code_allocator, encode_verify_code
+from app.services.verify_cache import VerifyCache
+from app.services.verify_code_filter import verify_code_filter
+
+
+logger = logging.getLogger(__name__)
+
+CSV, NDJSON = "csv", "ndjson"
+
+# Allocated codes are unique among themselves, so a conflict can only come from a
+# legacy row with the same value; such a row gets new codes this many times
+_MAX_CODE_ATTEMPTS = 3
+
+
+def _codes(row: CertificateIssueRow, value: int) -> tuple[str, str]:
+    """(certificate_number, verify_code): the given ones, or derived from an allocated value"""
+    return (
+        row.certificate_number or certificate_number(value, row.issued_date),
+        row.verify_code or encode_verify_code(value),
+    )
+
+
+# A CSV record (a quoted field may span lines) is rejected past this many characters,
+# so an unterminated quote cannot buffer the rest of the body
+_MAX_RECORD_LENGTH = 64 * 1024
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a byte stream (request body, file) into lines; decoding is left to parse_rows"""
+    pending = b""
+    async for chunk in chunks:
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+def _csv_row(header: list[str], record: str) -> dict:
+    values = next(csv.reader([record]))
+    if len(values) != len(header):
+        raise ValueError(f"expected {len(header)} columns, got {len(values)}")
+    # Empty CSV cells mean "not set"
+    return {name: value or None for name, value in zip(header, values)}
+
+
+async def parse_rows(lines: AsyncIterator[bytes], fmt: str) -> AsyncIterator[tuple[int, object]]:
+    """
+    Yield (line number, raw row) from CSV (header line first) or NDJSON, one record
+    per line; a CSV record with a quoted line break spans lines and is numbered by its
+    first. A record that cannot be decoded or parsed is yielded as an Exception to be
+    reported.
+    """
+    header = None
+    record, record_line = None, 0
+    line_no = 0
+    async for raw in lines:
+        line_no += 1
+        try:
+            line = raw.decode("utf-8-sig").rstrip("\r")
+        except UnicodeDecodeError as e:
+            yield (record_line if record is not None else line_no), ValueError(f"not valid UTF-8: {e}")
+            record = None
+            continue
+
+        if fmt == NDJSON:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                row = e
+            yield line_no, row
+            continue
+
+        if record is None:
+            if not line.strip():
+                continue
+            record, record_line = line, line_no
+        else:
+            record += "\n" + line
+        if record.count('"') % 2:
+            # Inside a quoted field: the record goes on on the next line
+            if len(record) <= _MAX_RECORD_LENGTH:
+                continue
+            yield record_line, ValueError(f"record longer than {_MAX_RECORD_LENGTH} characters")
+            record = None
+            continue
+
+        text, record = record, None
+        try:
+            if header is None:
+                header = [name.strip() for name in next(csv.reader([text]))]
+                continue
+            row = _csv_row(header, text)
+        except (ValueError, csv.Error) as e:
+            row = e
+        yield record_line, row
+
+    if record is not None:
+        yield record_line, ValueError("unterminated quoted field")
+
+
+class IssuanceService:
+    """
+    Bulk issuance of certificates from a stream of rows.
+    Rows are validated and inserted in chunks of ISSUANCE_CHUNK_SIZE: three queries
+    check the referenced subjects / types / users of the whole chunk, then one
+    multi-row INSERT ... ON CONFLICT DO NOTHING runs in one transaction per chunk.
+    Invalid rows are reported and skipped; they never abort the batch.
+    """
+
+    def __init__(self, db: AsyncSession, redis_client: Redis):
+        self.db = db
+        self.redis = redis_client
+        self.verify_cache = VerifyCache(redis_client)
+
+    async def issue(
+        self, rows: AsyncIterator[tuple[int, object]], chunk_size: Optional[int] = None
+    ) -> CertificateIssueReport:
+        chunk_size = chunk_size or settings.ISSUANCE_CHUNK_SIZE
+        report = CertificateIssueReport()
+
+        chunk = []
+        async for line, raw in rows:
+            report.total += 1
+            chunk.append((line, raw))
+            if len(chunk) >= chunk_size:
+                await self._issue_chunk(chunk, report)
+                chunk = []
+        if chunk:
+            await self._issue_chunk(chunk, report)
+        report.rejected.sort(key=lambda rejected: rejected.line)
+
+        logger.info(
+            f"Bulk issuance: {report.issued}/{report.total} issued, {len(report.rejected)} rejected"
+        )
+        return report
+
+    async def _issue_chunk(self, chunk: list[tuple[int, object]], report: CertificateIssueReport) -> None:
+        rows: list[tuple[int, CertificateIssueRow]] = []
+        for line, raw in chunk:
+            if isinstance(raw, Exception):
+                report.rejected.append(
+                    CertificateIssueRejected(line=line, reason=f"Unreadable row: {raw}")
+                )
+                continue
+            try:
+                rows.append((line, CertificateIssueRow.model_validate(raw)))
+            except ValidationError as e:
+                errors = "; ".join(
+                    f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()
+                )
+                report.rejected.append(CertificateIssueRejected(line=line, reason=errors))
+
+        rejected: list[CertificateIssueRejected] = []
+        try:
+            valid = await self._check_references(rows, rejected)
+            issued = await self._insert(valid, rejected)
+            await self.db.commit()
+        except SQLAlchemyError as e:
+            await self.db.rollback()
+            logger.error(f"Database error during bulk issuance: {e}")
+            report.rejected.extend(
+                CertificateIssueRejected(line=line, reason="Database error, chunk rolled back")
+                for line, _ in rows
+            )
+            return
+
+        report.rejected.extend(rejected)
+        report.issued += len(issued)
+        await self._publish(issued, {row.user_id for _, row in valid}, report)
+
+    async def _existing(self, column, ids: Iterable) -> set:
+        ids = {value for value in ids if value is not None}
+        if not ids:
+            return set()
+        return set((await self.db.scalars(select(column).where(column.in_(ids)))).all())
+
+    async def _check_references(
+        self, rows: list[tuple[int, CertificateIssueRow]], rejected: list[CertificateIssueRejected]
+    ) -> list[tuple[int, CertificateIssueRow]]:
+        """Reject rows whose subject / type / user does not exist (one query per table)"""
+        subjects = await self._existing(Subject.id, (row.subject_id for _, row in rows))
+        types = await self._existing(CertificateType.id, (row.type_id for _, row in rows))
+        users = await self._existing(User.id, (row.user_id for _, row in rows))
+
+        valid = []
+        for line, row in rows:
+            if row.subject_id is not None and row.subject_id not in subjects:
+                rejected.append(CertificateIssueRejected(
+                    line=line, reason=f"Subject {row.subject_id} not found"
+                ))
+            elif row.type_id not in types:
+                rejected.append(CertificateIssueRejected(
+                    line=line, reason=f"Certificate type {row.type_id} not found"
+                ))
+            elif row.user_id not in users:
+                rejected.append(CertificateIssueRejected(
+                    line=line, reason=f"User {row.user_id} not found"
+                ))
+            else:
+                valid.append((line, row))
+        return valid
+
+    async def _insert(
+        self, rows: list[tuple[int, CertificateIssueRow]], rejected: list[CertificateIssueRejected]
+    ) -> list[str]:
+        """
+        Multi-row insert of a chunk, returning the issued verify codes. Missing codes
+        come from the block allocator, from memory. Rows that hit a unique constraint
+        are skipped by ON CONFLICT. A row whose given certificate_number / verify_code
+        is taken is reported as a duplicate; only a conflict on a generated value is
+        retried with new codes.
+        """
+        issued = []
+        pending = rows
+        for _ in range(_MAX_CODE_ATTEMPTS):
+            if not pending:
+                break
+
+            allocated = iter(await code_allocator.allocate(
+                sum(1 for _, row in pending if not (row.certificate_number and row.verify_code))
+            ))
+            batch = {}  # verify_code -> (line, row, values)
+            numbers = set()
+            conflicts = []
+            for line, row in pending:
+                value = None if row.certificate_number and row.verify_code else next(allocated)
+                number, verify_code = _codes(row, value)
+                if verify_code in batch or number in numbers:
+                    conflicts.append((line, row))
+                    continue
+                numbers.add(number)
+                batch[verify_code] = (line, row, {
+                    "user_id": row.user_id,
+                    "subject_id": row.subject_id,
+                    "type_id": row.type_id,
+                    "issued_date": row.issued_date,
+                    "certificate_number": number,
+                    "verify_code": verify_code,
+                    "digital_url": row.digital_url,
+                })
+
+            inserted = set()
+            if batch:
+                result = await self.db.execute(
+                    insert(Certificate)
+                    .values([values for _, _, values in batch.values()])
+                    .on_conflict_do_nothing()
+                    .returning(Certificate.verify_code)
+                )
+                inserted = set(result.scalars().all())
+                issued.extend(inserted)
+            conflicts.extend(
+                (line, row) for verify_code, (line, row, _) in batch.items() if verify_code not in inserted
+            )
+
+            # Which given values are taken (by an older row, or one of this chunk just
+            # inserted); only rows with one given value need asking, both-given ones
+            # cannot be retried anyway
+            partial = [row for _, row in conflicts if not (row.certificate_number and row.verify_code)]
+            taken_numbers = await self._existing(
+                Certificate.certificate_number, (row.certificate_number for row in partial)
+            )
+            taken_codes = await self._existing(Certificate.verify_code, (row.verify_code for row in partial))
+
+            pending = []
+            for line, row in conflicts:
+                if (
+                    (row.verify_code and row.certificate_number)
+                    or row.certificate_number in taken_numbers
+                    or row.verify_code in taken_codes
+                ):
+                    rejected.append(CertificateIssueRejected(
+                        line=line, reason="certificate_number or verify_code already exists"
+                    ))
+                else:
+                    pending.append((line, row))
+
+        for line, _ in pending:
+            rejected.append(CertificateIssueRejected(
+                line=line, reason="Could not generate a unique certificate_number / verify_code"
+            ))
+        return issued
+
+    async def _publish(self, codes: list[str], user_ids: set, report: CertificateIssueReport) -> None:
+        """
+        Make new codes verifiable right away (Bloom filter + drop negative cache
+        markers), and drop the cached certificate lists of their users. Each step is
+        tried on its own; a failed one is listed in the report, the certificates
+        stay issued.
+        """
+        if not codes:
+            return
+        steps = (
+            ("Verify code filter", lambda: verify_code_filter.add_codes(self.redis, codes)),
+            ("Verify cache", lambda: self.verify_cache.delete(codes)),
+            ("Certificate list cache", lambda: CertificateListCache(self.redis).invalidate(user_ids)),
+        )
+        for name, step in steps:
+            try:
+                await step()
+            except Exception as e:
+                error = f"{name} not updated for {len(codes)} issued codes: {e}"
+                logger.warning(error)
+                report.publish_errors.append(error)
@@ -1,22 +1,22 @@
-from typing import Optional
+import asyncio
+from typing import Iterable, Optional
 from uuid import UUID
-from keycloak import KeycloakAdmin, KeycloakError
+from keycloak import KeycloakError
 from app.core.config import settings
+from app.core.keycloak import get_keycloak_client
+from app.core.singleflight import SingleFlight
 from ..schemas.user import UserProfile
 
+# Process-wide: concurrent lookups of the same user share one Keycloak call
+_profile_flight = SingleFlight()
+
 
 class KeycloakService:
     """Class for managing all Keycloak services and connections"""
 
     def __init__(self):
-        # Inititalize the connections to the admin API
-        self.admin = KeycloakAdmin(
-            server_url=settings.KEYCLOAK_URL,
-            realm_name=settings.KEYCLOAK_REALM,
-            client_id=settings.KEYCLOAK_CLIENT_ID,
-            client_secret_key=settings.KEYCLOAK_CLIENT_SECRET,
-            grant_type="client_credentials",
-        )
+        # Shared async admin client (pooled connections + cached service-account token)
+        self.admin = get_keycloak_client()
 
     def _extract_attribute(
         self, attributes: dict, key: str, default: Optional[str] = None
@@ -36,10 +36,34 @@ class KeycloakService:
 
     async def get_user_profile(self, user_id: str) -> Optional[UserProfile]:
         """
-        Fetches the user from Keycloak admin api and maps it to the UserProfile Pydantic Model
+        Fetches the user from Keycloak admin api and maps it to the UserProfile Pydantic Model.
+        Concurrent calls for the same user_id are merged into one request.
+        """
+        return await _profile_flight.do(user_id, lambda: self._fetch_user_profile(user_id))
+
+    async def get_user_profiles(self, user_ids: Iterable[str]) -> dict[str, Optional[UserProfile]]:
+        """
+        Bulk variant of get_user_profile, keyed by user_id.
+        Duplicate ids are fetched once, and the distinct ids are fetched concurrently
+        (bounded by KEYCLOAK_BULK_CONCURRENCY) over the pooled admin connection.
+        The admin API has no multi-id lookup, so this costs one call per unique user.
         """
+        unique_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        if not unique_ids:
+            return {}
+
+        semaphore = asyncio.Semaphore(settings.KEYCLOAK_BULK_CONCURRENCY)
+
+        async def fetch(user_id: str) -> Optional[UserProfile]:
+            async with semaphore:
+                return await self.get_user_profile(user_id)
+
+        profiles = await asyncio.gather(*(fetch(user_id) for user_id in unique_ids))
+        return dict(zip(unique_ids, profiles))
+
+    async def _fetch_user_profile(self, user_id: str) -> Optional[UserProfile]:
         try:
-            user_data = self.admin.get_user(user_id=user_id)
+            user_data = await self.admin.get_user(user_id)
 
             if not user_data:
                 return None
@@ -89,13 +113,13 @@ class KeycloakService:
 
         except KeycloakError as e:
             error_msg = str(e)
-            if "403" in error_msg or "Forbidden" in error_msg:
+            if e.response_code == 403:
                 raise PermissionError(
                     f"Keycloak Permission Denied (403): The client '{settings.KEYCLOAK_CLIENT_ID}' "
                     f"does not have permission to read users. Please assign the 'view-users' role "
                     f"from the 'realm-management' client to the service account."
                 ) from e
-            elif "404" in error_msg or "Not Found" in error_msg:
+            elif e.response_code == 404:
                 return None  # User doesn't exist
             else:
                 raise RuntimeError(f"Keycloak API Error: {error_msg}") from e
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import logging
+from typing import Any, NamedTuple, Optional
+from uuid import UUID
+from pydantic import ValidationError
+from app.core.cache import TTLCache
+from app.schemas.certificate import CertificateData
+from app.schemas.certificate_template import TemplateElement
+
+
+logger = logging.getLogger(__name__)
+
+# Labels that bind an element to certificate data rather than to static content
+# (subject_name / verify_url are derived fields, see certificate_renderer.field_value)
+BINDABLE_FIELDS = frozenset(CertificateData.model_fields) | {"subject_name", "verify_url"}
+
+
+class LayoutPlan(NamedTuple):
+    """
+    A template's layout_config, validated once per version. Immutable: shared by
+    every reader in the worker, and picklable, so render processes get it as is.
+    """
+    source: Any  # layout_config as stored; a different value means a new version
+    version: str
+    elements: tuple[TemplateElement, ...]
+    bindings: tuple[Optional[str], ...]  # per element: the CertificateData field its label binds, or None
+    bounds: tuple[tuple[int, int, int, int], ...]  # per element: x, y, right, bottom (no size: right = x)
+    json: bytes  # the stored element dicts, serialized for verify responses
+
+
+def _serialize(layout_config: list) -> bytes:
+    return json.dumps(layout_config, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _version(layout_json: bytes) -> str:
+    return hashlib.blake2b(layout_json, digest_size=8).hexdigest()
+
+
+def compile_layout(layout_config: Any) -> LayoutPlan:
+    """Validate a stored layout_config (raises pydantic.ValidationError) into a plan"""
+    source = layout_config
+    # Same fixups as TemplateRead.convert_layout_config: missing / legacy dict layouts are empty
+    if not isinstance(layout_config, list):
+        layout_config = []
+
+    elements = tuple(TemplateElement.model_validate(element) for element in layout_config)
+    # Verify responses send the elements as stored, not the model's dump: keys the
+    # model does not know are kept and unset optional fields are not added as null
+    layout_json = _serialize(layout_config)
+
+    return LayoutPlan(
+        source=source,
+        version=_version(layout_json),
+        elements=elements,
+        bindings=tuple(e.label if e.label in BINDABLE_FIELDS else None for e in elements),
+        bounds=tuple((e.x, e.y, e.x + (e.width or 0), e.y + (e.height or 0)) for e in elements),
+        json=layout_json,
+    )
+
+
+# Templates are few and change rarely, so every plan stays in memory; the TTL only
+# bounds how long a plan of a deleted template lingers in other workers
+_plans: TTLCache[LayoutPlan] = TTLCache(maxsize=1024, ttl=86400)
+# The same plans by version, for renders: they start from a verify response,
+# which carries the layout but not the template id
+_plans_by_version: TTLCache[LayoutPlan] = TTLCache(maxsize=1024, ttl=86400)
+
+
+def get_layout_plan(template_id: UUID, layout_config: Any) -> LayoutPlan:
+    """
+    The plan for a template's current layout. Recompiled only when the stored layout
+    differs from the one the cached plan was built from, which also catches updates
+    made through other workers (a plain equality check, much cheaper than validation).
+    """
+    key = str(template_id)
+    plan = _plans.get(key)
+    if plan is None or plan.source != layout_config:
+        plan = compile_layout(layout_config)
+        _plans.set(key, plan)
+        _plans_by_version.set(plan.version, plan)
+    return plan
+
+
+def layout_plan_for(layout_config: list) -> LayoutPlan:
+    """
+    The plan for the layout_config of a verify response, looked up by its content
+    version (one serialization and hash, no validation). Compiled on a miss; a
+    layout stored before elements were validated (verify sends it as is) is
+    compiled from its valid elements only.
+    """
+    version = _version(_serialize(layout_config))
+    plan = _plans_by_version.get(version)
+    if plan is None:
+        try:
+            plan = compile_layout(layout_config)
+        except ValidationError as e:
+            logger.warning(f"Layout {version} has invalid elements, rendered without them: {e}")
+            plan = compile_layout([element for element in layout_config if _valid(element)])
+        _plans_by_version.set(version, plan)
+    return plan
+
+
+def _valid(element: Any) -> bool:
+    try:
+        TemplateElement.model_validate(element)
+        return True
+    except ValidationError:
+        return False
+
+
+def invalidate_layout_plan(template_id: UUID) -> None:
+    _plans.pop(str(template_id))
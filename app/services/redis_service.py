@@ -1,6 +1,6 @@
-import json
-from typing import Optional
+from typing import Iterable, Optional
 from redis.asyncio import Redis
+from app.core.config import settings
 from app.schemas.user import UserProfile
 
 
@@ -9,22 +9,43 @@ class RedisService:
     def __init__(self, redis_client: Redis):
         self.redis = redis_client
         self.prefex = 'user_cache:'
-        self.ttl = 1800 # 30mn
+        self.ttl = settings.PROFILE_CACHE_TTL # 30mn by default
+
 
-    
     async def get_user(self, user_id: str) -> Optional[UserProfile]:
         """Fetch cached profile and convert back to pydantic object"""
         data = await self.redis.get(f"{self.prefex}{user_id}")
-        
+
         if not data:
             return None
 
         return UserProfile.model_validate_json(data)
 
+    async def get_users(self, user_ids: list[str]) -> dict[str, UserProfile]:
+        """Fetch many cached profiles with a single MGET; missing ids are left out"""
+        if not user_ids:
+            return {}
+        values = await self.redis.mget([f"{self.prefex}{user_id}" for user_id in user_ids])
+        return {
+            user_id: UserProfile.model_validate_json(data)
+            for user_id, data in zip(user_ids, values)
+            if data
+        }
+
     async def set_user(self, user_id: str, profile: UserProfile):
         """Store the validated Pydantic profile as JSON string"""
         await self.redis.setex(
             f"{self.prefex}{user_id}",
             self.ttl,
             profile.model_dump_json()
-        )
\ No newline at end of file
+        )
+
+    async def set_users(self, profiles: Iterable[tuple[str, UserProfile]]):
+        """Store many profiles in one pipelined round trip"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for user_id, profile in profiles:
+                pipe.setex(f"{self.prefex}{user_id}", self.ttl, profile.model_dump_json())
+            await pipe.execute()
+
+    async def delete_user(self, user_id: str):
+        await self.redis.delete(f"{self.prefex}{user_id}")
@@ -0,0 +1,244 @@
+import asyncio
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import socket
+import tempfile
+from pathlib import Path
+from typing import NamedTuple, Optional
+import httpx
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.services.certificate_renderer import image_sources, render_certificate
+from app.services.certificate_service import CertificateService
+from app.services.layout_plan import layout_plan_for
+
+
+logger = logging.getLogger(__name__)
+
+# Concurrent requests for the same render share one, and renders are CPU-bound,
+# so only RENDER_CONCURRENCY run at once per worker (each in a thread)
+_render_flight = SingleFlight()
+_render_slots = asyncio.Semaphore(settings.RENDER_CONCURRENCY)
+
+
+def render_key(verify_etag: str, fmt: str) -> str:
+    """
+    The verify ETag hashes the versions of every fragment, including the layout
+    (template + role), so it changes with the template or any data shown; canvas
+    settings are added so a resolution change does not serve old files.
+    """
+    canvas = f"{settings.RENDER_WIDTH}x{settings.RENDER_HEIGHT}@{settings.RENDER_DPI}"
+    return hashlib.blake2b(f"{verify_etag}|{fmt}|{canvas}".encode(), digest_size=16).hexdigest()
+
+
+# Redirects followed per image; each target must pass the same checks as the URL
+_MAX_REDIRECTS = 3
+
+
+class RenderCache:
+    """
+    Content-addressed disk cache of rendered certificates, `{dir}/{key[:2]}/{key}.{fmt}`.
+    Keys change whenever the content would, so entries are never invalidated, and
+    the directory can be wiped at any time. Every RENDER_CACHE_PRUNE_INTERVAL the
+    least recently used files (a hit refreshes the mtime) are deleted until the
+    directory is below RENDER_CACHE_MAX_BYTES.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._prune_task: Optional[asyncio.Task] = None
+
+    def _path(self, key: str, fmt: str) -> Path:
+        return self.directory / key[:2] / f"{key}.{fmt}"
+
+    def _read(self, path: Path) -> Optional[bytes]:
+        try:
+            content = path.read_bytes()
+            os.utime(path)
+            return content
+        except FileNotFoundError:
+            return None
+
+    def _write(self, path: Path, content: bytes) -> None:
+        # Write then rename, so a concurrent reader never sees a partial file
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as file:
+            file.write(content)
+        os.replace(tmp, path)
+
+    async def get(self, key: str, fmt: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, self._path(key, fmt))
+
+    async def set(self, key: str, fmt: str, content: bytes) -> None:
+        await asyncio.to_thread(self._write, self._path(key, fmt), content)
+
+    def _prune(self, max_bytes: int) -> int:
+        """Delete the least recently used files until the cache fits; returns how many"""
+        entries = []
+        for path in self.directory.glob("*/*"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue  # deleted by another worker meanwhile
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+        for _, size, path in sorted(entries):
+            if total <= max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            deleted += 1
+        return deleted
+
+    async def prune(self) -> int:
+        return await asyncio.to_thread(self._prune, settings.RENDER_CACHE_MAX_BYTES)
+
+    async def _prune_loop(self) -> None:
+        while True:
+            try:
+                deleted = await self.prune()
+                if deleted:
+                    logger.info(f"Render cache pruned: {deleted} files")
+            except OSError as e:
+                logger.warning(f"Render cache prune failed: {e}")
+            await asyncio.sleep(settings.RENDER_CACHE_PRUNE_INTERVAL)
+
+    def start(self) -> None:
+        self._prune_task = asyncio.create_task(self._prune_loop())
+
+    def stop(self) -> None:
+        if self._prune_task is not None:
+            self._prune_task.cancel()
+            self._prune_task = None
+
+
+render_cache = RenderCache(settings.RENDER_CACHE_DIR)
+
+
+async def _check_url(url: httpx.URL) -> str:
+    """
+    Image URLs come from templates and Keycloak attributes: only https on a host of
+    RENDER_IMAGE_HOSTS, and only if that host resolves to public addresses, so a
+    URL cannot reach loopback, the private network or cloud metadata endpoints.
+    Returns the checked address to connect to.
+    """
+    if url.scheme != "https" or url.host not in settings.RENDER_IMAGE_HOSTS:
+        raise ValueError("not an https URL on RENDER_IMAGE_HOSTS")
+    infos = await asyncio.get_running_loop().getaddrinfo(url.host, url.port or 443, type=socket.SOCK_STREAM)
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0])
+        if not address.is_global:
+            raise ValueError(f"{url.host} resolves to non-public address {address}")
+    return infos[0][4][0]
+
+
+def _pinned_request(client: httpx.AsyncClient, url: httpx.URL, address: str) -> httpx.Request:
+    """
+    A GET of `url` sent to the address _check_url approved, so a second DNS answer
+    (rebinding) cannot redirect the connection. The Host header and the TLS server
+    name (SNI, and the certificate check) stay those of the original host.
+    """
+    return client.build_request(
+        "GET",
+        url.copy_with(host=address),
+        headers={"Host": url.netloc.decode("ascii")},
+        extensions={"sni_hostname": url.host},
+    )
+
+
+async def _fetch_image(client: httpx.AsyncClient, url: httpx.URL) -> bytes:
+    """Download one image, following redirects only to URLs that pass _check_url"""
+    max_bytes = settings.RENDER_IMAGE_MAX_BYTES
+    for _ in range(_MAX_REDIRECTS + 1):
+        address = await _check_url(url)
+        response = await client.send(_pinned_request(client, url, address), stream=True)
+        try:
+            if response.is_redirect:
+                # Relative to the URL asked for, not the pinned address it went to
+                url = url.join(response.headers["location"])
+                continue
+            response.raise_for_status()
+            if int(response.headers.get("content-length", 0)) > max_bytes:
+                raise ValueError(f"larger than {max_bytes} bytes")
+            content = bytearray()
+            async for chunk in response.aiter_bytes():
+                content += chunk
+                if len(content) > max_bytes:
+                    raise ValueError(f"larger than {max_bytes} bytes")
+            return bytes(content)
+        finally:
+            await response.aclose()
+    raise ValueError(f"more than {_MAX_REDIRECTS} redirects")
+
+
+async def fetch_images(sources: dict[str, str]) -> dict[str, bytes]:
+    """Download the images a layout references; ones that fail or are not allowed are left out"""
+    if not sources:
+        return {}
+
+    # No keep-alive: a pooled connection is matched by address only, and could be
+    # reused for another allowed host on the same address with the wrong server name
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(
+        timeout=settings.RENDER_IMAGE_TIMEOUT, follow_redirects=False, limits=limits
+    ) as client:
+        async def fetch(url: str) -> Optional[bytes]:
+            try:
+                return await _fetch_image(client, httpx.URL(url))
+            except (httpx.HTTPError, httpx.InvalidURL, OSError, ValueError) as e:
+                logger.warning(f"Could not fetch image {url}: {e}")
+                return None
+
+        contents = await asyncio.gather(*(fetch(url) for url in sources.values()))
+    return {label: content for label, content in zip(sources, contents) if content is not None}
+
+
+class RenderJob(NamedTuple):
+    """A verified certificate to render: its verify JSON, and the ETag of the output"""
+    code: str
+    fmt: str
+    body: bytes
+    etag: str
+
+
+class RenderService:
+    """
+    Renders certificates to PNG / PDF from the same cached verify payload the
+    verify endpoint serves, and caches the output on disk, so a re-request is a
+    file read and a conditional re-request is answered without rendering.
+    """
+
+    def __init__(self, certificates: CertificateService):
+        self.certificates = certificates
+
+    async def prepare(self, code: str, fmt: str) -> RenderJob:
+        """Resolve the certificate (raises CertificateNotFoundError) and its render ETag"""
+        result = await self.certificates.get_by_code(code)
+        return RenderJob(code, fmt, result.body, f'"{render_key(result.etag, fmt)}"')
+
+    async def content(self, job: RenderJob) -> bytes:
+        key = job.etag.strip('"')
+        cached = await render_cache.get(key, job.fmt)
+        if cached is not None:
+            return cached
+        return await _render_flight.do(key, lambda: self._render(job, key))
+
+    async def _render(self, job: RenderJob, key: str) -> bytes:
+        payload = json.loads(job.body)
+        plan, data = layout_plan_for(payload["layout_config"]), payload["certificate_data"]
+        images = await fetch_images(image_sources(plan, data))
+
+        async with _render_slots:
+            content = await asyncio.to_thread(render_certificate, plan, data, job.fmt, images)
+
+        try:
+            await render_cache.set(key, job.fmt, content)
+        except OSError as e:
+            logger.warning(f"Render cache write failed for code {job.code}: {e}")
+        return content
@@ -1,13 +1,33 @@
+import logging
 from uuid import UUID
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.core import redis
+from app.core.tracing import span
 from app.models.certificate_template import CertificateTemplate
+from app.models.certificate_type import CertificateType
 from app.schemas.certificate_template import TemplateCreate, TemplateRead, TemplateUpdate
+from app.services.catalog import catalog
+from app.services.layout_plan import invalidate_layout_plan
+from app.services.verify_cache import VerifyCache
+
+
+logger = logging.getLogger(__name__)
 
 
 class TemplateService:
     def __init__(self, db: AsyncSession):
         self.db = db
+        self.verify_cache = VerifyCache(redis.redis_client)
+
+    async def _invalidate_verify_cache(self, template_id: UUID, type_ids: list[int]) -> None:
+        """Drop only the cached layout fragments of the types using this template"""
+        try:
+            with span("verify.invalidate_layouts"):
+                deleted = await self.verify_cache.invalidate_layouts(type_ids)
+            logger.info(f"Invalidated {deleted} verify layout fragments for template {template_id}")
+        except Exception as e:
+            logger.warning(f"Verify cache invalidation failed for template {template_id}: {e}")
 
     async def create(self, payload: TemplateCreate) -> TemplateRead:
         result = await self.db.execute(
@@ -27,24 +47,35 @@ class TemplateService:
         self.db.add(new_template)
         await self.db.commit()
         await self.db.refresh(new_template)
+        await catalog.changed(self.db, redis.redis_client)
 
-        return TemplateRead.model_validate(new_template)
+        return await self.get_by_id(new_template.id)
 
     async def get_all(self) -> list[TemplateRead]:
-        result = await self.db.execute(
-            select(CertificateTemplate)
-        )
-        templates = result.scalars().all()
-        return [TemplateRead.model_validate(t) for t in templates]
+        snapshot = await catalog.get(self.db)
+        return list(snapshot.templates.values())
+
+    async def get_all_json(self) -> bytes:
+        """GET /templates, already serialized"""
+        return (await catalog.get(self.db)).templates_json
 
     async def get_by_id(self, template_id: UUID) -> TemplateRead:
-        result = await self.db.execute(
-            select(CertificateTemplate).where(CertificateTemplate.id == template_id)
-        )
-        template = result.scalar_one_or_none()
+        template = (await catalog.get(self.db)).templates.get(template_id)
         if not template:
             raise ValueError(f"Template with id '{template_id}' not found")
-        return TemplateRead.model_validate(template)
+        return template
+
+    async def get_by_id_json(self, template_id: UUID) -> bytes:
+        template = (await catalog.get(self.db)).template_json.get(template_id)
+        if not template:
+            raise ValueError(f"Template with id '{template_id}' not found")
+        return template
+
+    async def _type_ids_using(self, template_id: UUID) -> list[int]:
+        result = await self.db.execute(
+            select(CertificateType.id).where(CertificateType.template_id == template_id)
+        )
+        return list(result.scalars().all())
 
     async def update(self, template_id: UUID, payload: TemplateUpdate) -> TemplateRead:
         result = await self.db.execute(
@@ -74,7 +105,13 @@ class TemplateService:
 
         await self.db.commit()
         await self.db.refresh(template)
-        return TemplateRead.model_validate(template)
+
+        if payload.layout_config is not None:
+            invalidate_layout_plan(template_id)
+            await self._invalidate_verify_cache(template_id, await self._type_ids_using(template_id))
+        await catalog.changed(self.db, redis.redis_client)
+
+        return await self.get_by_id(template_id)
 
     async def delete(self, template_id: UUID) -> None:
         result = await self.db.execute(
@@ -84,5 +121,9 @@ class TemplateService:
         if not template:
             raise ValueError(f"Template with id '{template_id}' not found")
 
+        type_ids = await self._type_ids_using(template_id)
         await self.db.delete(template)
         await self.db.commit()
+        invalidate_layout_plan(template_id)
+        await self._invalidate_verify_cache(template_id, type_ids)
+        await catalog.changed(self.db, redis.redis_client)
@@ -1,40 +1,153 @@
-from typing import Optional
+import logging
+from typing import Iterable, Optional
 from redis.asyncio import Redis
+from app.core.cache import CacheStats, TTLCache
+from app.core.config import settings
+from app.core.metrics import Counter
 from app.services.redis_service import RedisService
 from app.services.keycloak_service import KeycloakService
+from app.services.verify_cache import VerifyCache
 from app.schemas.user import UserProfile
 
 
+logger = logging.getLogger(__name__)
+
+# L1: bounded in-process LRU shared by every UserService in this worker.
+# Kept shorter-lived than Redis because other workers cannot invalidate it.
+_local_profiles: TTLCache[UserProfile] = TTLCache(
+    maxsize=settings.PROFILE_CACHE_L1_SIZE,
+    ttl=settings.PROFILE_CACHE_L1_TTL,
+)
+# L2: counters for the Redis `user_cache:` tier
+_redis_stats = CacheStats()
+
+
+def get_profile_cache_stats() -> dict[str, dict[str, int]]:
+    """Hit/miss counters of both profile cache tiers"""
+    return {
+        "l1": _local_profiles.stats.as_dict(),
+        "l2": _redis_stats.as_dict(),
+    }
+
+
+def _profile_cache_samples():
+    for tier, counters in get_profile_cache_stats().items():
+        for result, value in counters.items():
+            yield (tier, result), value
+
+
+Counter(
+    "user_cache_total",
+    "Profile cache lookups by tier (l1: in-process, l2: Redis) and result (hits, misses, errors)",
+    ("tier", "result"),
+    collect=_profile_cache_samples,
+)
+
+
 class UserService:
     """
     Service that combine the keycloak and redis service.
-    Check cache in redis first, then Keycloak if not found cache in redis
+    Check the in-process LRU (L1) first, then Redis (L2), then Keycloak if not found.
+    This is the single profile cache every caller should go through.
     """
 
-    def __init__(self, redis_client: Redis):
+    def __init__(self, redis_client: Redis, keycloak_service: Optional[KeycloakService] = None):
         self.redis_service = RedisService(redis_client)
-        self.keycloak_service = KeycloakService()
+        self.keycloak_service = keycloak_service or KeycloakService()
 
     async def get_user_profile(self, user_id: str) -> Optional[UserProfile]:
         """
         Get user profile with caching:
-        1. Try Redis cache first
-        2. If not found, fetch from Keycloak
-        3. Cache the result in Redis
-        4. Return the profile
+        1. Try the in-process L1 cache
+        2. Try Redis cache
+        3. If not found, fetch from Keycloak
+        4. Cache the result in Redis and L1
+        5. Return the profile
         """
+        user_id = str(user_id)
 
-        cached_profile = await self.redis_service.get_user(user_id)
-
-        if cached_profile:
-            print(f"✓ Cache HIT for user {user_id}")
-            return cached_profile
+        profile = _local_profiles.get(user_id)
+        if profile:
+            return profile
 
-        print(f"✗ Cache MISS for user {user_id}")
+        try:
+            profile = await self.redis_service.get_user(user_id)
+        except Exception as e:
+            # Counted as an error only, not also as a miss
+            _redis_stats.errors += 1
+            logger.warning(f"Redis profile lookup failed for user {user_id}: {e}")
+        else:
+            if profile:
+                _redis_stats.hits += 1
+                _local_profiles.set(user_id, profile)
+                return profile
+            _redis_stats.misses += 1
+            logger.debug(f"Cache MISS for user {user_id}")
         profile = await self.keycloak_service.get_user_profile(user_id)
 
         if profile:
-            await self.redis_service.set_user(user_id,profile=profile)
-            print(f"✓ Cached user {user_id} in Redis")
+            _local_profiles.set(user_id, profile)
+            try:
+                await self.redis_service.set_user(user_id, profile=profile)
+            except Exception as e:
+                _redis_stats.errors += 1
+                logger.warning(f"Redis profile write failed for user {user_id}: {e}")
 
         return profile
+
+    async def get_user_profiles(self, user_ids: Iterable[str]) -> dict[str, Optional[UserProfile]]:
+        """
+        Bulk variant of get_user_profile, keyed by user_id.
+        Resolves L1 first, then one Redis MGET, then one bulk Keycloak fetch for the rest.
+        """
+        unique_ids = list(dict.fromkeys(str(user_id) for user_id in user_ids))
+        profiles: dict[str, Optional[UserProfile]] = {}
+
+        missing = []
+        for user_id in unique_ids:
+            profile = _local_profiles.get(user_id)
+            if profile:
+                profiles[user_id] = profile
+            else:
+                missing.append(user_id)
+
+        if missing:
+            try:
+                cached = await self.redis_service.get_users(missing)
+            except Exception as e:
+                _redis_stats.errors += 1
+                logger.warning(f"Redis bulk profile lookup failed: {e}")
+                cached = {}
+            else:
+                _redis_stats.hits += len(cached)
+                _redis_stats.misses += len(missing) - len(cached)
+            for user_id, profile in cached.items():
+                _local_profiles.set(user_id, profile)
+            profiles.update(cached)
+            missing = [user_id for user_id in missing if user_id not in cached]
+
+        if missing:
+            fetched = await self.keycloak_service.get_user_profiles(missing)
+            found = [(user_id, profile) for user_id, profile in fetched.items() if profile]
+            for user_id, profile in found:
+                _local_profiles.set(user_id, profile)
+            if found:
+                try:
+                    await self.redis_service.set_users(found)
+                except Exception as e:
+                    _redis_stats.errors += 1
+                    logger.warning(f"Redis bulk profile write failed: {e}")
+            profiles.update(fetched)
+
+        return profiles
+
+    async def invalidate(self, user_id: str) -> None:
+        """
+        Drop a user's cached profile from L1 and Redis, including the name/photo
+        fragment of their verify responses.
+        L1 copies in other workers expire within PROFILE_CACHE_L1_TTL.
+        """
+        user_id = str(user_id)
+        _local_profiles.pop(user_id)
+        await self.redis_service.delete_user(user_id)
+        await VerifyCache(self.redis_service.redis).invalidate_profile(user_id)
@@ -0,0 +1,481 @@
+import asyncio
+import hashlib
+import json
+import logging
+import secrets
+import time
+from typing import Any, Iterable, NamedTuple, Optional
+from uuid import UUID
+from redis.asyncio import Redis
+from app.core.cache import TTLCache, jittered_ttl
+from app.core.config import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Delete the lock only if we still own it (it may have expired and been re-taken)
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+# How often a worker waiting on another worker's lock re-checks the cache
+_LOCK_POLL_INTERVAL = 0.05
+
+# Stored instead of a payload for codes that do not exist (negative cache)
+_NOT_FOUND_MARKER = b"!"
+
+# Returned by VerifyCache.get for a negatively cached code
+NOT_FOUND = object()
+
+# Fragment values are framed as b"<16 hex version>:<body>"
+_VERSION_LENGTH = 16
+
+# Part names, in the order they are fetched
+SUBJECT, LAYOUT, PROFILE = "subject", "layout", "profile"
+PARTS = (SUBJECT, LAYOUT, PROFILE)
+
+# Strong references to pending second deletes, so they are not garbage collected
+_redelete_tasks: set[asyncio.Task] = set()
+
+
+class Fragment(NamedTuple):
+    """
+    One independently cached piece of a verify response.
+    `body` holds ready-to-splice JSON pieces separated by newlines (compact JSON
+    never contains a raw newline), so a cache hit is assembled without parsing.
+    """
+    version: str
+    body: bytes
+
+
+def _dumps(data: Any) -> bytes:
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def _members(data: dict) -> bytes:
+    """`"a":1,"b":2` - an object's members, to be spliced into an enclosing object"""
+    return _dumps(data)[1:-1]
+
+
+def _fragment(*pieces: bytes) -> Fragment:
+    """Build a fragment whose version is a hash of its content"""
+    body = b"\n".join(pieces)
+    return Fragment(hashlib.blake2b(body, digest_size=_VERSION_LENGTH // 2).hexdigest(), body)
+
+
+def core_fragment(fields: dict, ids: dict) -> Fragment:
+    """Certificate fields, plus the subject_id / type_id / user_id of its parts"""
+    return _fragment(_dumps(ids), _members(fields))
+
+
+def subject_fragment(subject_detail: Optional[dict]) -> Fragment:
+    return _fragment(_dumps(subject_detail))
+
+
+def layout_fragment(target_role: str, layout_config: list | bytes) -> Fragment:
+    """`layout_config` may be given already serialized (a compiled LayoutPlan's json)"""
+    if not isinstance(layout_config, bytes):
+        layout_config = _dumps(layout_config)
+    return _fragment(_members({"target_role": target_role}), layout_config)
+
+
+def profile_fragment(student_name: str, student_photo: Optional[str]) -> Fragment:
+    return _fragment(_members({"student_name": student_name, "student_photo": student_photo}))
+
+
+def core_ids(core: Fragment) -> dict:
+    """Parse the ids line of a core fragment (the only JSON ever parsed on a read)"""
+    return json.loads(core.body.split(b"\n", 1)[0])
+
+
+def _encode(fragment: Fragment) -> bytes:
+    return fragment.version.encode() + b":" + fragment.body
+
+
+def _decode(raw: Optional[bytes]) -> Optional[Fragment]:
+    """Unframe a fragment; anything else (e.g. an old-format entry) is a miss"""
+    if not raw or raw[_VERSION_LENGTH:_VERSION_LENGTH + 1] != b":":
+        return None
+    return Fragment(raw[:_VERSION_LENGTH].decode(), raw[_VERSION_LENGTH + 1:])
+
+
+def _encode_core(core: Fragment, fresh_until: int) -> bytes:
+    """A core is framed with its soft-expiry timestamp: `<fresh_until>:<version>:<body>`"""
+    return b"%010d:" % fresh_until + _encode(core)
+
+
+def _decode_core(raw: Optional[bytes]) -> Optional[tuple[Fragment, int]]:
+    if not raw or raw[10:11] != b":" or not raw[:10].isdigit():
+        return None
+    core = _decode(raw[11:])
+    if core is None:
+        return None
+    return core, int(raw[:10])
+
+
+def core_ttls(type_id: Optional[int]) -> tuple[int, int]:
+    """(soft, hard) TTL of a core entry, overridable per certificate type"""
+    return settings.VERIFY_TYPE_TTLS.get(
+        type_id, (settings.VERIFY_CACHE_SOFT_TTL, settings.VERIFY_CACHE_TTL)
+    )
+
+
+# Parts used when the certificate has no subject / type / user
+DEFAULT_PARTS = {
+    SUBJECT: subject_fragment(None),
+    LAYOUT: layout_fragment("STUDENT", []),
+    PROFILE: profile_fragment("User not Found", None),
+}
+
+# Which core field identifies each part
+_PART_ID_FIELDS = {SUBJECT: "subject_id", LAYOUT: "type_id", PROFILE: "user_id"}
+
+
+def part_id(ids: dict, part: str):
+    """The id (subject_id / type_id / user_id) a part is keyed by, or None"""
+    return ids.get(_PART_ID_FIELDS[part])
+
+
+def assemble(core: Fragment, parts: dict[str, Fragment]) -> bytes:
+    """
+    Splice the fragments into the serialized CertificateVerifyResponse JSON.
+    Pure byte concatenation: cached data was validated when it was written.
+    """
+    core_members = core.body.split(b"\n", 1)[1]
+    role_member, layout_config = parts[LAYOUT].body.split(b"\n", 1)
+    return b"".join((
+        b'{"certificate_data":{',
+        core_members,
+        b",",
+        role_member,
+        b',"subject_detail":',
+        parts[SUBJECT].body,
+        b",",
+        parts[PROFILE].body,
+        b'},"layout_config":',
+        layout_config,
+        b"}",
+    ))
+
+
+class VerifyPayload(NamedTuple):
+    """
+    A serialized verify response and the strong ETag of the content it was built from.
+    `body` is None when the caller's If-None-Match already matched (answer 304).
+    """
+    body: Optional[bytes]
+    etag: str
+
+
+def etag(core: Fragment, parts: dict[str, Fragment]) -> str:
+    """Strong ETag derived from the versions of the core and every part"""
+    versions = "".join([core.version] + [parts[part].version for part in PARTS])
+    return '"' + hashlib.blake2b(versions.encode(), digest_size=12).hexdigest() + '"'
+
+
+def payload(core: Fragment, parts: dict[str, Fragment]) -> VerifyPayload:
+    return VerifyPayload(assemble(core, parts), etag(core, parts))
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison: W/ prefixes are ignored, '*' matches anything"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class CachedVerify(NamedTuple):
+    """A cached core with its parts; `fresh_until` is the soft expiry (epoch seconds)"""
+    core: Fragment
+    ids: dict
+    parts: dict[str, Fragment]
+    fresh_until: int
+
+    @property
+    def stale(self) -> bool:
+        return self.fresh_until <= time.time()
+
+
+# Which certificate a code points to never changes, so each worker remembers the
+# (core, ids) of hot codes and can then fetch core + parts in a single MGET
+_local_cores: TTLCache[tuple[Fragment, dict]] = TTLCache(
+    maxsize=settings.VERIFY_CORE_L1_SIZE,
+    ttl=settings.VERIFY_CORE_L1_TTL,
+)
+
+
+class VerifyCache:
+    """
+    Redis access for cached verification responses, stored as fragments that are
+    assembled at read time:
+        - core     `cert_verify:{code}`          certificate row + generation name
+        - subject  `cert_frag:subject:{id}`      SubjectDetail with topics
+        - layout   `cert_frag:layout:{type_id}`  target_role + the template's layout_config
+        - profile  `cert_frag:profile:{user_id}` student name and photo
+    Fragments hold pre-serialized JSON, so a hit is spliced into the response
+    bytes without parsing or model validation (see `assemble`).
+    Each fragment carries a content-hash version and its own TTL, so a template
+    change only drops the layout fragment of the types using it, and a layout is
+    stored once per type instead of once per certificate.
+    A core has a hard TTL (the Redis expiry) and a soft TTL (stored in the value):
+    past the soft TTL it is still served while the caller refreshes it.
+
+    Unknown codes are cached too, as a short-lived marker, so repeated lookups
+    of a missing code do not reach Postgres. Also provides the short recompute
+    lock (`lock:cert_verify:{code}`) that lets a single worker across all
+    replicas rebuild an expired entry.
+    """
+
+    def __init__(self, redis_client: Redis):
+        self.redis = redis_client
+        self.prefix = "cert_verify:"
+        self.lock_prefix = "lock:cert_verify:"
+        self.part_prefixes = {
+            SUBJECT: "cert_frag:subject:",
+            LAYOUT: "cert_frag:layout:",
+            PROFILE: "cert_frag:profile:",
+        }
+        self.part_ttls = {
+            SUBJECT: settings.VERIFY_SUBJECT_TTL,
+            LAYOUT: settings.VERIFY_LAYOUT_TTL,
+            PROFILE: settings.VERIFY_PROFILE_TTL,
+        }
+
+    def _part_key(self, part: str, key_id) -> str:
+        return f"{self.part_prefixes[part]}{key_id}"
+
+    def _part_keys(self, ids: dict) -> list[str]:
+        """Keys of the parts a core references (parts without an id use defaults)"""
+        return [
+            self._part_key(part, part_id(ids, part))
+            for part in PARTS
+            if part_id(ids, part) is not None
+        ]
+
+    def _collect_parts(self, ids: dict, raw_parts: list) -> dict[str, Fragment]:
+        """Unframe fetched parts; parts that are not cached are left out"""
+        parts = {}
+        values = iter(raw_parts)
+        for part in PARTS:
+            if part_id(ids, part) is None:
+                parts[part] = DEFAULT_PARTS[part]
+                continue
+            fragment = _decode(next(values))
+            if fragment is not None:
+                parts[part] = fragment
+        return parts
+
+    async def get(self, code: str):
+        """
+        Return a CachedVerify for a code, NOT_FOUND for a known-missing code, or
+        None when the core is not cached (or past its hard TTL). Costs one MGET when the code is hot in this
+        worker, otherwise a GET followed by one MGET of the parts.
+        """
+        known = _local_cores.get(code)
+        if known is not None:
+            known_core, ids = known
+            values = await self.redis.mget([f"{self.prefix}{code}"] + self._part_keys(ids))
+            if values[0] == _NOT_FOUND_MARKER:
+                _local_cores.pop(code)
+                return NOT_FOUND
+            decoded = _decode_core(values[0])
+            if decoded is not None and decoded[0] == known_core:
+                core, fresh_until = decoded
+                return CachedVerify(core, ids, self._collect_parts(ids, values[1:]), fresh_until)
+            _local_cores.pop(code)
+
+        raw = await self.redis.get(f"{self.prefix}{code}")
+        if raw == _NOT_FOUND_MARKER:
+            return NOT_FOUND
+        decoded = _decode_core(raw)
+        if decoded is None:
+            return None
+
+        core, fresh_until = decoded
+        ids = core_ids(core)
+        _local_cores.set(code, (core, ids))
+        part_keys = self._part_keys(ids)
+        raw_parts = await self.redis.mget(part_keys) if part_keys else []
+        return CachedVerify(core, ids, self._collect_parts(ids, raw_parts), fresh_until)
+
+    async def get_many(self, codes: list[str]) -> dict[str, Any]:
+        """
+        Batch variant of `get`, keyed by code. Cores and the parts of codes hot in
+        this worker come back in one MGET; parts of the other cores (each shared
+        part fetched once) in at most one more.
+        """
+        prefetch = list(dict.fromkeys(
+            key
+            for known in map(_local_cores.get, codes) if known is not None
+            for key in self._part_keys(known[1])
+        ))
+        values = await self.redis.mget([f"{self.prefix}{code}" for code in codes] + prefetch)
+        fetched = dict(zip(prefetch, values[len(codes):]))
+
+        results: dict[str, Any] = {}
+        found = []
+        for code, raw in zip(codes, values):
+            if raw == _NOT_FOUND_MARKER:
+                results[code] = NOT_FOUND
+                continue
+            decoded = _decode_core(raw)
+            if decoded is None:
+                results[code] = None
+                continue
+            core, fresh_until = decoded
+            ids = core_ids(core)
+            _local_cores.set(code, (core, ids))
+            found.append((code, core, ids, fresh_until))
+
+        missing = list(dict.fromkeys(
+            key for _, _, ids, _ in found for key in self._part_keys(ids) if key not in fetched
+        ))
+        if missing:
+            fetched.update(zip(missing, await self.redis.mget(missing)))
+
+        for code, core, ids, fresh_until in found:
+            raw_parts = [fetched[key] for key in self._part_keys(ids)]
+            results[code] = CachedVerify(core, ids, self._collect_parts(ids, raw_parts), fresh_until)
+        return results
+
+    def _queue_core(self, pipe, code: str, core: Fragment, ids: dict) -> None:
+        """
+        Queue a core write: Redis expires it at the hard TTL, the soft TTL is stored
+        in the value so readers know when to refresh it in the background.
+        """
+        soft_ttl, hard_ttl = core_ttls(ids.get("type_id"))
+        jitter = settings.VERIFY_CACHE_TTL_JITTER
+        fresh_until = int(time.time()) + jittered_ttl(soft_ttl, jitter)
+        pipe.setex(f"{self.prefix}{code}", jittered_ttl(hard_ttl, jitter), _encode_core(core, fresh_until))
+
+    async def set(self, code: str, core: Fragment, parts: dict[str, Fragment]) -> None:
+        """Store a core and its parts in one pipelined round trip"""
+        ids = core_ids(core)
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._queue_core(pipe, code, core, ids)
+            self._queue_parts(pipe, ids, parts)
+            await pipe.execute()
+        _local_cores.set(code, (core, ids))
+
+    async def set_many(self, entries: Iterable[tuple[str, Fragment, dict[str, Fragment]]]) -> int:
+        """
+        Bulk variant of `set` for warm-up: one pipeline for a whole batch, each
+        shared part (a type's layout, a subject) written once. Not memoized in L1.
+        """
+        count = 0
+        async with self.redis.pipeline(transaction=False) as pipe:
+            written = set()
+            for code, core, parts in entries:
+                ids = core_ids(core)
+                self._queue_core(pipe, code, core, ids)
+                fresh = {
+                    part: fragment for part, fragment in parts.items()
+                    if (part, part_id(ids, part)) not in written
+                }
+                written.update((part, part_id(ids, part)) for part in fresh)
+                self._queue_parts(pipe, ids, fresh)
+                count += 1
+            await pipe.execute()
+        return count
+
+    async def set_parts(self, ids: dict, parts: dict[str, Fragment]) -> None:
+        """Store parts that were missing for an already cached core"""
+        async with self.redis.pipeline(transaction=False) as pipe:
+            self._queue_parts(pipe, ids, parts)
+            await pipe.execute()
+
+    def _queue_parts(self, pipe, ids: dict, parts: dict[str, Fragment]) -> None:
+        for part, fragment in parts.items():
+            key_id = part_id(ids, part)
+            if key_id is None:
+                continue
+            ttl = jittered_ttl(self.part_ttls[part], settings.VERIFY_CACHE_TTL_JITTER)
+            pipe.setex(self._part_key(part, key_id), ttl, _encode(fragment))
+
+    async def set_not_found(self, code: str) -> None:
+        """Remember for VERIFY_NEGATIVE_TTL seconds that a code does not exist"""
+        await self.redis.setex(f"{self.prefix}{code}", settings.VERIFY_NEGATIVE_TTL, _NOT_FOUND_MARKER)
+
+    async def set_not_found_many(self, codes: Iterable[str]) -> None:
+        async with self.redis.pipeline(transaction=False) as pipe:
+            for code in codes:
+                pipe.setex(f"{self.prefix}{code}", settings.VERIFY_NEGATIVE_TTL, _NOT_FOUND_MARKER)
+            await pipe.execute()
+
+    async def delete(self, codes: list[str]) -> None:
+        """Drop entries, e.g. negative markers for codes that were just issued"""
+        if codes:
+            await self.redis.delete(*(f"{self.prefix}{code}" for code in codes))
+            for code in codes:
+                _local_cores.pop(code)
+
+    async def invalidate_layouts(self, type_ids: Iterable[int]) -> int:
+        """Drop the layout fragment of these certificate types"""
+        return await self._delete_parts(LAYOUT, type_ids)
+
+    async def invalidate_profile(self, user_id: UUID | str) -> int:
+        return await self._delete_parts(PROFILE, [user_id])
+
+    async def invalidate_subject(self, subject_id: int) -> int:
+        return await self._delete_parts(SUBJECT, [subject_id])
+
+    async def _delete_parts(self, part: str, key_ids: Iterable) -> int:
+        """
+        Delete fragments now, and once more after VERIFY_REDELETE_DELAY: a reload that
+        read the old row before the write committed can still store it after the first
+        delete, and would otherwise serve it until the fragment's TTL.
+        """
+        keys = [self._part_key(part, key_id) for key_id in key_ids]
+        deleted = await self._delete_keys(keys)
+        if keys and settings.VERIFY_REDELETE_DELAY > 0:
+            task = asyncio.create_task(self._redelete(keys))
+            _redelete_tasks.add(task)
+            task.add_done_callback(_redelete_tasks.discard)
+        return deleted
+
+    async def _redelete(self, keys: list[str]) -> None:
+        await asyncio.sleep(settings.VERIFY_REDELETE_DELAY)
+        try:
+            await self._delete_keys(keys)
+        except Exception as e:
+            logger.warning(f"Second delete of {len(keys)} verify fragments failed: {e}")
+
+    async def _delete_keys(self, keys: list[str]) -> int:
+        """Delete keys in pipelined batches of VERIFY_INVALIDATE_BATCH"""
+        deleted = 0
+        batch_size = settings.VERIFY_INVALIDATE_BATCH
+        for start in range(0, len(keys), batch_size):
+            async with self.redis.pipeline(transaction=False) as pipe:
+                for key in keys[start:start + batch_size]:
+                    pipe.delete(key)
+                deleted += sum(await pipe.execute())
+        return deleted
+
+    async def acquire_lock(self, code: str) -> Optional[str]:
+        """Try to take the recompute lock; returns the owner token, or None if held elsewhere"""
+        token = secrets.token_hex(8)
+        acquired = await self.redis.set(
+            f"{self.lock_prefix}{code}", token, nx=True, px=settings.VERIFY_LOCK_TTL_MS
+        )
+        return token if acquired else None
+
+    async def release_lock(self, code: str, token: str) -> None:
+        await self.redis.eval(_RELEASE_LOCK_SCRIPT, 1, f"{self.lock_prefix}{code}", token)
+
+    async def wait_for(self, code: str, timeout: float):
+        """Poll for the entry another worker is rebuilding, up to `timeout` seconds"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while loop.time() < deadline:
+            await asyncio.sleep(_LOCK_POLL_INTERVAL)
+            cached = await self.get(code)
+            if cached is not None:
+                return cached
+        return None
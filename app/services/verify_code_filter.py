@@ -0,0 +1,245 @@
+import asyncio
+import logging
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+from redis.asyncio import Redis
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+from app.models.certificate import Certificate
+
+
+logger = logging.getLogger(__name__)
+
+_BITS_KEY = "cert_bloom:bits"
+_META_KEY = "cert_bloom:meta"  # hash: size_bits, hash_count, version, epoch, log_base, built_at
+# Codes added since the last rebuild, one space-joined entry per add_codes call;
+# workers replay the entries they have not seen instead of re-reading the bits.
+# Capped at VERIFY_FILTER_LOG_MAX entries: the oldest are trimmed and counted in
+# `log_base`, so entry i of the list is entry log_base + i since the rebuild
+_LOG_KEY = "cert_bloom:log"
+_REBUILD_LOCK_KEY = "lock:cert_bloom:rebuild"
+
+# Rows created this long before a rebuild started are re-added afterwards, to cover
+# certificates committed by transactions that were still open while we streamed
+_REBUILD_CATCH_UP = timedelta(minutes=5)
+
+
+class VerifyCodeFilter:
+    """
+    Bloom filter of every issued `verify_code`. A code it does not contain was
+    never issued, so callers answer 404 without any Redis or DB lookup.
+
+    The authoritative bits live in Redis (`cert_bloom:bits`). Each worker keeps an
+    in-memory copy, so a lookup costs no I/O. When the version in `cert_bloom:meta`
+    changes, a worker replays the codes added since its copy (`cert_bloom:log`);
+    it only downloads the whole bitmap after a rebuild (a new `epoch`) or when the
+    log was trimmed past the entries it had seen.
+    Until a filter has been built, every code is treated as possibly valid.
+
+    IssuanceService adds the codes it issues; other workers know them within
+    VERIFY_FILTER_SYNC_INTERVAL. Certificates inserted any other way are only
+    known after a rebuild: the rebuild CLI, or the one a worker runs every
+    VERIFY_FILTER_REBUILD_INTERVAL.
+    """
+
+    def __init__(self):
+        self.bloom: Optional[BloomFilter] = None
+        self.version: Optional[int] = None
+        self.epoch: Optional[bytes] = None
+        self.applied = 0  # entries of the log already in our copy, counting trimmed ones
+        self.log_base = 0
+        self.built_at = 0.0
+        self._sync_task: Optional[asyncio.Task] = None
+
+    def might_exist(self, code: str) -> bool:
+        """False if the filter has never seen the code (see the class docstring)"""
+        if self.bloom is None or not settings.VERIFY_FILTER_ENABLED:
+            return True
+        return code in self.bloom
+
+    async def load(self, redis_client: Redis) -> bool:
+        """Load the filter from Redis; returns False if none has been built yet"""
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hgetall(_META_KEY)
+            pipe.get(_BITS_KEY)
+            pipe.llen(_LOG_KEY)
+            meta, bits, applied = await pipe.execute()
+
+        if not meta:
+            self.bloom = None
+            self.version = None
+            return False
+
+        self.bloom = BloomFilter(int(meta[b"size_bits"]), int(meta[b"hash_count"]), bits)
+        self.version = int(meta[b"version"])
+        self.epoch = meta.get(b"epoch")
+        self.log_base = int(meta.get(b"log_base", 0))
+        self.built_at = float(meta.get(b"built_at", 0))
+        self.applied = self.log_base + applied  # the bits already include every logged code
+        return True
+
+    async def sync(self, redis_client: Redis) -> None:
+        """Bring the in-memory copy up to date, replaying only what changed in Redis"""
+        version = await redis_client.hget(_META_KEY, "version")
+        if version is None or self.bloom is None:
+            await self.load(redis_client)
+            return
+        if int(version) == self.version:
+            return
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.hmget(_META_KEY, "version", "epoch", "log_base")
+            pipe.lrange(_LOG_KEY, self.applied - self.log_base, -1)
+            (version, epoch, log_base), entries = await pipe.execute()
+        if version is None or epoch != self.epoch or int(log_base or 0) != self.log_base:
+            await self.load(redis_client)  # rebuilt or trimmed since our copy
+            return
+
+        for entry in entries:
+            self.bloom.update(entry.decode().split())
+        self.applied += len(entries)
+        self.version = int(version)
+
+    async def add_codes(self, redis_client: Redis, codes: Iterable[str]) -> None:
+        """Add newly issued codes in Redis (one transaction), then to our copy"""
+        codes = list(codes)
+        await self.sync(redis_client)
+        if self.bloom is None or not codes:
+            return  # No filter built yet, nothing to keep in sync
+
+        async with redis_client.pipeline(transaction=True) as pipe:
+            for code in codes:
+                for offset in self.bloom.positions(code):
+                    pipe.setbit(_BITS_KEY, offset, 1)
+            pipe.rpush(_LOG_KEY, " ".join(codes))
+            pipe.hincrby(_META_KEY, "version", 1)
+            pipe.hget(_META_KEY, "log_base")
+            length, version, log_base = (await pipe.execute())[-3:]
+
+        # Only once Redis has them, so no worker knows codes the others cannot see
+        self.bloom.update(codes)
+        # Skip the replay of our own entry unless others wrote too
+        log_base = int(log_base or 0)
+        if log_base == self.log_base and log_base + length == self.applied + 1 and version == self.version + 1:
+            self.applied, self.version = self.applied + 1, version
+
+        if length > settings.VERIFY_FILTER_LOG_MAX:
+            await self._trim_log(redis_client, length - settings.VERIFY_FILTER_LOG_MAX // 2)
+
+    async def _trim_log(self, redis_client: Redis, count: int) -> None:
+        """
+        Drop the oldest log entries (their codes stay in the bits). Trimmed down to
+        half the cap, so workers that fall behind reload the bitmap only now and then.
+        """
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.ltrim(_LOG_KEY, count, -1)
+            pipe.hincrby(_META_KEY, "log_base", count)
+            _, log_base = await pipe.execute()
+        if log_base - count == self.log_base and log_base <= self.applied:
+            self.log_base = log_base  # our copy already had every trimmed entry
+
+    async def rebuild(self, db: AsyncSession, redis_client: Redis) -> int:
+        """Build the filter from every verify_code in Postgres and publish it to Redis"""
+        started_at = datetime.now(timezone.utc)
+        count = await db.scalar(select(func.count()).select_from(Certificate))
+        bloom = BloomFilter.for_capacity(
+            max(settings.VERIFY_FILTER_CAPACITY, count * 2),
+            settings.VERIFY_FILTER_ERROR_RATE,
+        )
+
+        codes = await db.stream_scalars(
+            select(Certificate.verify_code).execution_options(yield_per=10_000)
+        )
+        async for code in codes:
+            bloom.add(code)
+
+        epoch = secrets.token_hex(8).encode()
+        async with redis_client.pipeline(transaction=True) as pipe:
+            pipe.set(_BITS_KEY, bytes(bloom.bits))
+            pipe.delete(_LOG_KEY)
+            pipe.hset(
+                _META_KEY,
+                mapping={
+                    "size_bits": bloom.size_bits,
+                    "hash_count": bloom.hash_count,
+                    "epoch": epoch,
+                    "log_base": 0,
+                    "built_at": started_at.timestamp(),
+                },
+            )
+            pipe.hincrby(_META_KEY, "version", 1)
+            results = await pipe.execute()
+
+        self.bloom = bloom
+        self.version = results[-1]
+        self.epoch = epoch
+        self.applied = self.log_base = 0
+        self.built_at = started_at.timestamp()
+
+        # Catch up on certificates committed while we were streaming
+        recent = await db.scalars(
+            select(Certificate.verify_code).where(
+                Certificate.created_at >= started_at - _REBUILD_CATCH_UP
+            )
+        )
+        await self.add_codes(redis_client, recent.all())
+
+        logger.info(f"Verify code filter rebuilt: {count} codes, {bloom.size_bits} bits")
+        return count
+
+    async def start(self, redis_client: Redis, session_factory) -> None:
+        """Load the filter and start the background task that keeps it in sync"""
+        if not settings.VERIFY_FILTER_ENABLED:
+            return
+
+        try:
+            await self.load(redis_client)
+        except Exception as e:
+            logger.warning(f"Verify code filter unavailable, all codes allowed: {e}")
+
+        self._sync_task = asyncio.create_task(self._sync_loop(redis_client, session_factory))
+
+    def _rebuild_due(self) -> bool:
+        interval = settings.VERIFY_FILTER_REBUILD_INTERVAL
+        return self.bloom is None or (interval > 0 and time.time() - self.built_at >= interval)
+
+    async def _rebuild_if_due(self, redis_client: Redis, session_factory) -> None:
+        """
+        Build the filter if nobody has, or rebuild it once it is older than
+        VERIFY_FILTER_REBUILD_INTERVAL (picking up certificates inserted outside
+        IssuanceService). One worker does it; the others pick it up on sync.
+        """
+        if not await redis_client.set(_REBUILD_LOCK_KEY, "1", nx=True, ex=600):
+            return
+        try:
+            # Another worker may have finished a rebuild just before we took the lock
+            await self.sync(redis_client)
+            if not self._rebuild_due():
+                return
+            async with session_factory() as db:
+                await self.rebuild(db, redis_client)
+        finally:
+            await redis_client.delete(_REBUILD_LOCK_KEY)
+
+    async def _sync_loop(self, redis_client: Redis, session_factory) -> None:
+        while True:
+            try:
+                await self.sync(redis_client)
+                if self._rebuild_due():
+                    await self._rebuild_if_due(redis_client, session_factory)
+            except Exception as e:
+                logger.warning(f"Verify code filter sync failed: {e}")
+            await asyncio.sleep(settings.VERIFY_FILTER_SYNC_INTERVAL)
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            self._sync_task = None
+
+
+# Process-wide filter instance
+verify_code_filter = VerifyCodeFilter()
@@ -0,0 +1,121 @@
+"""
+Verify read model: everything a verify response is built from, as one JSON
+document per certificate assembled by Postgres (`json_build_object` / `json_agg`).
+
+One statement, one round trip, no ORM hydration: the joined type / template /
+user / generation rows and the subject's topics (a correlated `json_agg`, where
+the ORM path needed two extra `selectinload` queries) come back as plain dicts.
+
+A document looks like:
+    {"certificate_number", "issued_date", "verify_code", "generation_name",
+     "subject_id", "type_id", "user_id",
+     "subject": {"id", "name", "level", "topics": [{"name", "sort_order"}]} | null,
+     "layout": {"target_role", "template_id", "layout_config"} | null}
+"""
+from sqlalchemy import String, any_, bindparam, case, func, literal_column, null, select, type_coerce
+from sqlalchemy.dialects.postgresql import ARRAY, JSON, UUID, aggregate_order_by
+from app.db.statements import register
+from app.models.certificate import Certificate
+from app.models.certificate_template import CertificateTemplate
+from app.models.certificate_type import CertificateType
+from app.models.curriculum import Subject, Topic
+from app.models.generation import Generation
+from app.models.user import User
+
+
+def _topics():
+    """
+    The subject's topics in display order (sort_order, then id). The ORM path sent
+    them in whatever order Postgres returned, so subject fragments built before
+    this order differ, and their ETags changed once when they were rebuilt.
+    """
+    topic = func.json_build_object("name", Topic.name, "sort_order", Topic.sort_order)
+    return (
+        select(func.coalesce(
+            func.json_agg(aggregate_order_by(topic, Topic.sort_order, Topic.id)),
+            literal_column("'[]'::json"),
+        ))
+        .where(Topic.subject_id == Subject.id)
+        .correlate(Subject)
+        .scalar_subquery()
+    )
+
+
+def _subject():
+    """SubjectDetail of the joined subject, null without one"""
+    return case(
+        (Subject.id.is_(None), null()),
+        else_=func.json_build_object(
+            "id", Subject.id, "name", Subject.name, "level", Subject.level, "topics", _topics()
+        ),
+    )
+
+
+def _layout():
+    """target_role and the template (id + layout_config) of the joined type, null without one"""
+    return case(
+        (CertificateType.id.is_(None), null()),
+        else_=func.json_build_object(
+            "target_role", CertificateType.target_role,
+            "template_id", CertificateTemplate.id,
+            "layout_config", CertificateTemplate.layout_config,
+        ),
+    )
+
+
+def verify_documents(where):
+    """`SELECT doc` for every certificate matching `where` (an expression on Certificate)"""
+    document = func.json_build_object(
+        "certificate_number", Certificate.certificate_number,
+        "issued_date", Certificate.issued_date,
+        "verify_code", Certificate.verify_code,
+        "generation_name", func.coalesce(Generation.name, "N/A"),
+        "subject_id", Certificate.subject_id,
+        "type_id", Certificate.type_id,
+        "user_id", Certificate.user_id,
+        "subject", _subject(),
+        "layout", _layout(),
+        type_=JSON,
+    )
+    return (
+        select(document)
+        .select_from(Certificate)
+        .outerjoin(Subject, Subject.id == Certificate.subject_id)
+        .outerjoin(CertificateType, CertificateType.id == Certificate.type_id)
+        .outerjoin(CertificateTemplate, CertificateTemplate.id == CertificateType.template_id)
+        .outerjoin(User, User.id == Certificate.user_id)
+        .outerjoin(Generation, Generation.id == User.generation_id)
+        .where(where)
+    )
+
+
+def subject_document(subject_id):
+    """The "subject" member of a verify document, on its own"""
+    return select(type_coerce(_subject(), JSON)).select_from(Subject).where(Subject.id == subject_id)
+
+
+def layout_document(type_id):
+    """The "layout" member of a verify document, on its own"""
+    return (
+        select(type_coerce(_layout(), JSON))
+        .select_from(CertificateType)
+        .outerjoin(CertificateTemplate, CertificateTemplate.id == CertificateType.template_id)
+        .where(CertificateType.id == type_id)
+    )
+
+
+# The statements the verify path runs, built once (see app.db.statements). Lists are
+# bound as one array (`= ANY($1)`), so every batch size shares one prepared statement.
+VERIFY_BY_CODE = register(
+    "verify_by_code", verify_documents(Certificate.verify_code == bindparam("code"))
+)
+VERIFY_BY_CODES = register(
+    "verify_by_codes",
+    verify_documents(Certificate.verify_code == any_(bindparam("codes", type_=ARRAY(String)))),
+)
+VERIFY_BY_IDS = register(
+    "verify_by_ids",
+    verify_documents(Certificate.id == any_(bindparam("ids", type_=ARRAY(UUID(as_uuid=True))))),
+)
+VERIFY_SUBJECT = register("verify_subject", subject_document(bindparam("id")))
+VERIFY_LAYOUT = register("verify_layout", layout_document(bindparam("id")))
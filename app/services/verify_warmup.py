@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import secrets
+import time
+from datetime import date, timedelta
+from typing import Optional
+from redis.asyncio import Redis
+from sqlalchemy import select
+from app.core.config import settings
+from app.models.certificate import Certificate
+from app.models.user import User
+from app.services.certificate_service import CertificateService
+from app.services.user_service import UserService
+from app.services.verify_cache import _RELEASE_LOCK_SCRIPT
+
+
+logger = logging.getLogger(__name__)
+
+_WARMUP_LOCK_KEY = "lock:cert_verify:warmup"
+
+
+async def warm_verify_cache(
+    session_factory,
+    redis_client: Redis,
+    issued_since: Optional[date] = None,
+    generation_id: Optional[int] = None,
+    type_id: Optional[int] = None,
+    limit: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    concurrency: Optional[int] = None,
+) -> int:
+    """
+    Pre-populate `cert_verify:*` (and its fragments) for the selected certificates,
+    most recently issued first, so verifications after a deploy or a Redis failover
+    do not all start as cold misses.
+    Batches run concurrently, up to `concurrency`, each with its own DB session.
+    Returns the number of entries written.
+    """
+    batch_size = batch_size or settings.VERIFY_WARMUP_BATCH
+    concurrency = concurrency or settings.VERIFY_WARMUP_CONCURRENCY
+
+    query = select(Certificate.id).order_by(Certificate.issued_date.desc(), Certificate.id)
+    if issued_since is not None:
+        query = query.where(Certificate.issued_date >= issued_since)
+    if type_id is not None:
+        query = query.where(Certificate.type_id == type_id)
+    if generation_id is not None:
+        query = query.join(Certificate.user).where(User.generation_id == generation_id)
+    if limit:
+        query = query.limit(limit)
+
+    async with session_factory() as db:
+        cert_ids = (await db.scalars(query)).all()
+
+    total = len(cert_ids)
+    batches = [cert_ids[start:start + batch_size] for start in range(0, total, batch_size)]
+    users = UserService(redis_client)
+    semaphore = asyncio.Semaphore(concurrency)
+    started = time.perf_counter()
+    done = 0
+
+    async def warm_batch(batch) -> None:
+        nonlocal done
+        async with semaphore:
+            async with session_factory() as db:
+                written = await CertificateService(db, users).warm(batch)
+        done += written
+        logger.info(
+            f"Verify cache warm-up: {done}/{total} entries "
+            f"({time.perf_counter() - started:.1f}s)"
+        )
+
+    results = await asyncio.gather(*(warm_batch(batch) for batch in batches), return_exceptions=True)
+    failed = [result for result in results if isinstance(result, Exception)]
+    for error in failed:
+        logger.warning(f"Verify cache warm-up batch failed: {error}")
+
+    logger.info(
+        f"Verify cache warm-up finished: {done}/{total} entries, "
+        f"{len(failed)} failed batches, {time.perf_counter() - started:.1f}s"
+    )
+    return done
+
+
+async def warm_on_startup(session_factory, redis_client: Redis) -> None:
+    """
+    Lifespan task: warm the certificates issued in the last VERIFY_WARMUP_DAYS.
+    A Redis lock makes only one worker across replicas run it; it is released when
+    the warm-up ends, so the next deploy warms again.
+    """
+    token = secrets.token_hex(8)
+    acquired = False
+    try:
+        acquired = await redis_client.set(_WARMUP_LOCK_KEY, token, nx=True, ex=600)
+        if not acquired:
+            return
+        await warm_verify_cache(
+            session_factory,
+            redis_client,
+            issued_since=date.today() - timedelta(days=settings.VERIFY_WARMUP_DAYS),
+            limit=settings.VERIFY_WARMUP_LIMIT,
+        )
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.warning(f"Verify cache warm-up failed: {e}")
+    finally:
+        if acquired:
+            try:
+                # Only if still ours: a warm-up past the expiry may have lost it to another worker
+                await redis_client.eval(_RELEASE_LOCK_SCRIPT, 1, _WARMUP_LOCK_KEY, token)
+            except Exception as e:
+                logger.warning(f"Verify cache warm-up lock release failed: {e}")
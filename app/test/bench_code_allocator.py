@@ -0,0 +1,55 @@
+"""
+Benchmark for the block-allocated verify code generator (not collected by pytest;
+the behaviour is covered by test_code_allocator.py).
+Compares reserving one sequence value per code (a Postgres round trip each) with
+reserving blocks of VERIFY_CODE_BLOCK_SIZE, using a fake session that adds a
+fixed round-trip latency.
+No server or database is needed.
+
+Usage:
+    poetry run python -m app.test.bench_code_allocator [codes]
+"""
+import asyncio
+import sys
+import time
+
+from app.core.config import settings
+from app.services.code_allocator import encode_verify_code
+from app.test.test_code_allocator import FakeSequence, allocate_all
+
+CODES = 20_000
+ROUND_TRIP = 0.0005  # 0.5 ms, a Postgres round trip on a fast network
+
+
+def timed_allocation(block_size: int, count: int) -> tuple[list[int], float, int]:
+    sequence = FakeSequence(block_size, latency=ROUND_TRIP)
+    configured, settings.VERIFY_CODE_BLOCK_SIZE = settings.VERIFY_CODE_BLOCK_SIZE, block_size
+    try:
+        start = time.perf_counter()
+        values = asyncio.run(allocate_all(sequence, count))
+        return values, time.perf_counter() - start, sequence.round_trips
+    finally:
+        settings.VERIFY_CODE_BLOCK_SIZE = configured
+
+
+def run(count: int = CODES):
+    block_size = settings.VERIFY_CODE_BLOCK_SIZE
+
+    _, row_elapsed, row_trips = timed_allocation(1, count // 10)
+    values, block_elapsed, block_trips = timed_allocation(block_size, count)
+
+    encode_start = time.perf_counter()
+    codes = [encode_verify_code(value) for value in values]
+    encode_elapsed = time.perf_counter() - encode_start
+
+    row_rate = (count // 10) / row_elapsed
+    block_rate = count / (block_elapsed + encode_elapsed)
+    print(f"--- Verify code allocation, {count} codes, block size {block_size} ---")
+    print(f"Per-row sequence:   {row_rate:,.0f} codes/s ({row_trips} round trips for {count // 10})")
+    print(f"Block allocator:    {block_rate:,.0f} codes/s ({block_trips} round trips)")
+    print(f"Encoding only:      {count / encode_elapsed:,.0f} codes/s")
+    print(f"Sample codes:       {', '.join(codes[:3])}")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else CODES)
@@ -0,0 +1,47 @@
+"""
+Benchmark for the verify cache-hit path (not collected by pytest; the behaviour
+is covered by test_verify_fast_path.py).
+Compares the old hit path (json.loads -> CertificateVerifyResponse(**result) ->
+response_model re-validation -> JSON serialization) with the fragment fast path,
+which splices the stored, already-serialized bytes.
+No server, database or Redis is needed.
+
+Usage:
+    poetry run python -m app.test.bench_verify_fast_path [iterations]
+"""
+import sys
+import time
+
+from app.services.verify_cache import assemble
+from app.test.test_verify_fast_path import build_fragments, old_hit_path
+
+ITERATIONS = 20_000
+
+
+def fast_hit_path(core, parts) -> bytes:
+    return assemble(core, parts)
+
+
+def bench(fn, *args, iterations: int) -> float:
+    """Return microseconds per call"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(*args)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def run(iterations: int = ITERATIONS):
+    core, parts = build_fragments()
+    body = assemble(core, parts)
+
+    old_us = bench(old_hit_path, body, iterations=iterations)
+    fast_us = bench(fast_hit_path, core, parts, iterations=iterations)
+
+    print(f"--- Verify cache-hit path, {iterations} iterations, {len(body)} byte payload ---")
+    print(f"Old path (parse + validate + serialize): {old_us:.2f} µs/request")
+    print(f"Fast path (splice stored bytes):         {fast_us:.2f} µs/request")
+    print(f"Speed-up: {old_us / fast_us:.1f}x")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else ITERATIONS)
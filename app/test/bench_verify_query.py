@@ -0,0 +1,46 @@
+"""
+Benchmark for the verify read model against the ORM path it replaced (not
+collected by pytest; test_verify_query.py checks both give the same fragments).
+For up to CODES existing certificates, loads each one
+  - ORM:      select(Certificate) + joinedload type/template and user/generation
+              + selectinload subject/topics (3 round trips), then flattened
+  - document: one json_build_object statement (1 round trip)
+Needs the database from .env; no Redis or Keycloak.
+
+Usage:
+    poetry run python -m app.test.bench_verify_query [codes]
+"""
+import asyncio
+import sys
+import time
+
+from app.db.database import engine
+from app.test.test_verify_query import CODES, load_documents, load_orm, sample_codes
+
+
+async def run(count: int = CODES):
+    # One event loop for every load: pooled asyncpg connections belong to theirs
+    try:
+        codes = await sample_codes(count)
+        if not codes:
+            print("No certificates in the database")
+            return
+
+        start = time.perf_counter()
+        await load_orm(codes)
+        orm_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await load_documents(codes)
+        doc_elapsed = time.perf_counter() - start
+    finally:
+        await engine.dispose()
+
+    print(f"--- Verify query, {len(codes)} certificates ---")
+    print(f"ORM (3 round trips):      {orm_elapsed / len(codes) * 1000:.2f} ms/certificate")
+    print(f"Document (1 round trip):  {doc_elapsed / len(codes) * 1000:.2f} ms/certificate")
+    print(f"Speedup:                  {orm_elapsed / doc_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else CODES))
@@ -0,0 +1,115 @@
+"""
+Tests for the block-allocated verify code generator.
+Two workers sharing a sequence must never hand out the same value, and a block
+costs one round trip; codes must be unique, fixed-length, match the verify
+endpoint pattern and carry a check digit that catches a mistyped character.
+No server or database is needed; for timings see bench_code_allocator.py.
+
+Usage:
+    poetry run pytest app/test/test_code_allocator.py
+"""
+import asyncio
+import re
+
+from app.core.config import settings
+from app.services.code_allocator import _ALPHABET, _CODE_PREFIX, _check_digit, CodeAllocator, encode_verify_code
+
+VERIFY_PATTERN = re.compile(r"^[A-Z0-9-]+$")
+
+
+class FakeSequence:
+    """A Postgres sequence shared by the sessions it opens; counts statements as round trips"""
+
+    def __init__(self, increment: int, latency: float = 0.0):
+        self.increment = increment
+        self.latency = latency
+        self.value = 1
+        self.round_trips = 0
+
+    def session(self) -> "FakeSequenceSession":
+        return FakeSequenceSession(self)
+
+
+class FakeSequenceSession:
+    """Stands in for an AsyncSession on a FakeSequence"""
+
+    def __init__(self, sequence: FakeSequence):
+        self.sequence = sequence
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def _round_trip(self):
+        self.sequence.round_trips += 1
+        if self.sequence.latency:
+            await asyncio.sleep(self.sequence.latency)
+
+    async def execute(self, statement, params=None):
+        await self._round_trip()
+
+    async def scalar(self, statement, params=None):
+        await self._round_trip()
+        if "increment_by" in str(statement):
+            return self.sequence.increment
+        value = self.sequence.value
+        self.sequence.value += self.sequence.increment
+        return value
+
+    async def commit(self):
+        pass
+
+
+async def allocate_all(sequence: FakeSequence, count: int, batch: int = 100) -> list[int]:
+    """Allocate `count` values in batches, alternating between two workers"""
+    workers = [CodeAllocator(sequence.session) for _ in range(2)]
+    values = []
+    for batch_start in range(0, count, batch):
+        worker = workers[(batch_start // batch) % 2]
+        values.extend(await worker.allocate(min(batch, count - batch_start)))
+    return values
+
+
+def well_formed(code: str) -> bool:
+    """True if a code has the generated shape and a valid check digit"""
+    digits = code.removeprefix(_CODE_PREFIX)
+    if digits == code or any(char not in _ALPHABET for char in digits):
+        return False
+    return _check_digit(digits[:-1]) == digits[-1]
+
+
+def test_workers_never_share_values(monkeypatch):
+    monkeypatch.setattr(settings, "VERIFY_CODE_BLOCK_SIZE", 250)
+    sequence = FakeSequence(increment=250)
+
+    values = asyncio.run(allocate_all(sequence, 5000))
+
+    assert len(set(values)) == len(values) == 5000
+    # One nextval per block, plus creating / reading the sequence once per worker
+    assert sequence.round_trips <= 5000 // 250 + 2 * 2
+
+
+def test_allocator_uses_the_sequence_increment(monkeypatch):
+    # A sequence created with another block size keeps its own increment
+    monkeypatch.setattr(settings, "VERIFY_CODE_BLOCK_SIZE", 1000)
+    sequence = FakeSequence(increment=10)
+
+    values = asyncio.run(allocate_all(sequence, 95, batch=7))
+
+    assert len(set(values)) == 95
+    assert all(value < sequence.value for value in values)
+
+
+def test_codes_are_unique_fixed_length_and_checked():
+    codes = [encode_verify_code(value) for value in range(1, 20_001)]
+
+    assert len(set(codes)) == len(codes)
+    assert len({len(code) for code in codes}) == 1
+    assert all(VERIFY_PATTERN.match(code) and well_formed(code) for code in codes)
+    # A single mistyped character is always caught by the check digit
+    for code in codes[:100]:
+        position = len(_CODE_PREFIX) + 3
+        typo = code[:position] + ("0" if code[position] != "0" else "1") + code[position + 1:]
+        assert not well_formed(typo)
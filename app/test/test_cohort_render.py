@@ -0,0 +1,102 @@
+"""
+Tests for the cohort render job.
+A rerun must skip the certificates whose part file is already on disk, and the
+ZIP must hold one entry per rendered certificate (codes that no longer exist are
+left out). The next batch must be loaded while the current one renders, not
+after it. The verify lookup and the renderer are stubbed: no server, database,
+Redis or fonts are needed.
+
+Usage:
+    poetry run pytest app/test/test_cohort_render.py
+"""
+import asyncio
+import json
+import time
+import zipfile
+
+from app.core.config import settings
+from app.services import cohort_render
+from app.services.certificate_service import CertificateService
+from app.services.cohort_render import CohortRender
+from app.services.verify_cache import VerifyPayload
+
+CODES = ["KSHRD-AAAA", "KSHRD-BBBB", "KSHRD-CCCC", "KSHRD-DDDD", "KSHRD-EEEE"]
+DELETED = "KSHRD-DDDD"
+RENDER_SECONDS = 0.2
+
+
+def fake_render(plan, data, fmt, images) -> bytes:
+    """Stands in for render_certificate (runs in the pool, so it must be importable)"""
+    time.sleep(RENDER_SECONDS)
+    return f"{fmt}:{data['verify_code']}".encode()
+
+
+class FakeSession:
+    """Answers the one query CohortRender runs itself: the cohort's codes"""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def scalars(self, query):
+        return FakeResult(CODES)
+
+
+class FakeResult:
+    def __init__(self, values):
+        self.values = values
+
+    def all(self):
+        return self.values
+
+
+def run_job(monkeypatch, tmp_path) -> tuple[CohortRender, list, list, int]:
+    """Render the cohort into tmp_path: (job, batches asked for, parts on disk at each ask, count)"""
+    batches = []
+    parts_when_asked = []
+
+    async def get_many_by_code(self, codes):
+        batches.append(list(codes))
+        parts_when_asked.append(len(list(job.parts_dir.iterdir())))
+        body = lambda code: json.dumps({"layout_config": [], "certificate_data": {"verify_code": code}})
+        return {
+            code: None if code == DELETED else VerifyPayload(body(code).encode(), '"etag"')
+            for code in codes
+        }
+
+    async def no_images(sources):
+        return {}
+
+    monkeypatch.setattr(CertificateService, "get_many_by_code", get_many_by_code)
+    monkeypatch.setattr(cohort_render, "render_certificate", fake_render)
+    monkeypatch.setattr(cohort_render, "fetch_images", no_images)
+    monkeypatch.setattr(settings, "VERIFY_BATCH_MAX_CODES", 2)
+
+    job = CohortRender(FakeSession, None, tmp_path / "cohort.zip", "png", workers=2)
+    job.parts_dir.mkdir()
+    (job.parts_dir / f"{CODES[0]}.png").write_bytes(b"rendered before the crash")
+    count = asyncio.run(job.run(generation_id=13))
+    return job, batches, parts_when_asked, count
+
+
+def test_rerun_skips_rendered_parts_and_zips_all(monkeypatch, tmp_path):
+    job, batches, _, count = run_job(monkeypatch, tmp_path)
+
+    assert batches == [CODES[1:3], CODES[3:5]]
+    assert count == len(CODES) - 1
+    with zipfile.ZipFile(job.output) as archive:
+        assert sorted(archive.namelist()) == sorted(f"{code}.png" for code in CODES if code != DELETED)
+        assert archive.read(f"{CODES[0]}.png") == b"rendered before the crash"
+        assert archive.read(f"{CODES[4]}.png") == f"png:{CODES[4]}".encode()
+        assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+    assert not job.parts_dir.exists()
+
+
+def test_next_batch_loads_while_renders_run(monkeypatch, tmp_path):
+    _, batches, parts_when_asked, _ = run_job(monkeypatch, tmp_path)
+
+    # Only the part left by the "crash" was on disk when the second batch was asked for
+    assert len(batches) == 2
+    assert parts_when_asked == [1, 1]
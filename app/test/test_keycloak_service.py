@@ -64,7 +64,7 @@ async def test_keycloak_service():
     if debug_mode:
         print("\n[2.5/4] Fetching raw Keycloak user data...")
         try:
-            raw_user_data = service.admin.get_user(user_id=user_id)
+            raw_user_data = await service.admin.get_user(user_id)
             print("   ✓ Raw user data retrieved")
             print("\n   Full Raw Keycloak User Data (JSON):")
             print("   " + "-" * 66)
@@ -0,0 +1,188 @@
+"""
+Tests for the verify cache-hit fast path.
+The fragments spliced by assemble() must be the same document the old path
+(json.loads -> CertificateVerifyResponse -> response_model re-validation) served,
+and the ETag must follow the content of every fragment. Through the endpoint, a
+hit must send the cached bytes with their ETag (or a 304) without touching the
+database or Keycloak.
+No server, database or Redis is needed (Redis is an in-memory stub); for timings
+see bench_verify_fast_path.py.
+
+Usage:
+    poetry run pytest app/test/test_verify_fast_path.py
+"""
+import asyncio
+import json
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.v1.endpoints import certificate
+from app.core import redis
+from app.schemas.certificate import CertificateVerifyResponse
+from app.services.certificate_service import CertificateService
+from app.services.verify_cache import (
+    DEFAULT_PARTS,
+    LAYOUT,
+    PROFILE,
+    SUBJECT,
+    VerifyCache,
+    _local_cores,
+    assemble,
+    core_fragment,
+    core_ids,
+    etag,
+    layout_fragment,
+    profile_fragment,
+    subject_fragment,
+)
+
+LAYOUT_CONFIG = [
+    {"type": "text", "label": f"field_{i}", "x": 40 * i, "y": 30 * i, "width": 300, "height": 40,
+     "style": {"fontSize": 18, "fontFamily": "Kantumruy Pro", "color": "#1f2937"}}
+    for i in range(3)
+]
+SUBJECT_DETAIL = {
+    "id": 3,
+    "name": "Spring Boot",
+    "level": "ADVANCED",
+    "topics": [{"name": f"Topic {i}", "sort_order": i} for i in range(3)],
+}
+IDS = {"subject_id": 3, "type_id": 2, "user_id": "0b5f3c2e-8d1e-4c55-9a7e-2f3b6c8d9e10"}
+CODE = "KSHRD-7K3M9Q2X4"
+
+
+class StubRedis:
+    """Just the commands the verify cache reads and writes with, over a dict"""
+
+    def __init__(self):
+        self.values: dict[str, bytes] = {}
+
+    async def get(self, key):
+        return self.values.get(key)
+
+    async def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def pipeline(self, transaction: bool = True) -> "StubPipeline":
+        return StubPipeline(self)
+
+
+class StubPipeline:
+    def __init__(self, redis_client: StubRedis):
+        self.redis = redis_client
+        self.queued = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def setex(self, key, ttl, value):
+        self.queued.append((key, value))
+
+    async def execute(self):
+        self.redis.values.update(self.queued)
+        return [True] * len(self.queued)
+
+
+class Untouchable:
+    """Stands in for the DB session and the UserService: a cache hit must not use them"""
+
+    def __getattr__(self, name):
+        raise AssertionError(f"cache hit used {name}")
+
+
+def build_fragments():
+    core = core_fragment(
+        {
+            "certificate_number": "KSHRD-2026-000123",
+            "issued_date": "2026-06-30",
+            "verify_code": CODE,
+            "generation_name": "Generation 13",
+        },
+        IDS,
+    )
+    parts = {
+        SUBJECT: subject_fragment(SUBJECT_DETAIL),
+        LAYOUT: layout_fragment("STUDENT", LAYOUT_CONFIG),
+        PROFILE: profile_fragment("Sok Chan", "https://cdn.kshrd.app/photos/sok-chan.png"),
+    }
+    return core, parts
+
+
+def old_hit_path(cached: bytes) -> bytes:
+    """The hit path before fragments: parse, validate, re-validate, serialize"""
+    response = CertificateVerifyResponse(**json.loads(cached))
+    validated = CertificateVerifyResponse.model_validate(response.model_dump())
+    return validated.model_dump_json().encode()
+
+
+def test_assembled_body_matches_old_path():
+    core, parts = build_fragments()
+    body = assemble(core, parts)
+
+    document = json.loads(body)
+    assert document == json.loads(old_hit_path(body))
+    assert document["certificate_data"]["student_name"] == "Sok Chan"
+    assert document["certificate_data"]["subject_detail"] == SUBJECT_DETAIL
+    assert document["layout_config"] == LAYOUT_CONFIG
+    assert core_ids(core) == IDS
+
+
+def test_default_parts_assemble_valid_response():
+    core, _ = build_fragments()
+    body = assemble(core, DEFAULT_PARTS)
+    assert json.loads(body) == json.loads(old_hit_path(body))
+
+
+def test_etag_follows_fragment_content():
+    core, parts = build_fragments()
+    assert etag(core, parts) == etag(*build_fragments())
+
+    renamed = dict(parts, **{PROFILE: profile_fragment("Sok Chan Dara", None)})
+    assert etag(core, renamed) != etag(core, parts)
+
+
+def verify_client(monkeypatch) -> tuple[TestClient, StubRedis]:
+    """The verify router on a stub Redis, with a service that cannot reach Postgres or Keycloak"""
+    stub = StubRedis()
+    monkeypatch.setattr(redis, "redis_client", stub)
+    app = FastAPI()
+    app.include_router(certificate.router, prefix="/api/v1/certificate")
+    app.dependency_overrides[certificate.get_certificate_service] = (
+        lambda: CertificateService(db=Untouchable(), users=Untouchable())
+    )
+    return TestClient(app), stub
+
+
+def test_cache_hit_sends_stored_bytes_without_db(monkeypatch):
+    client, stub = verify_client(monkeypatch)
+    core, parts = build_fragments()
+    asyncio.run(VerifyCache(stub).set(CODE, core, parts))
+
+    # Cold worker (GET core, then MGET parts), then hot worker (one MGET)
+    _local_cores.pop(CODE)
+    for _ in range(2):
+        response = client.get(f"/api/v1/certificate/{CODE}/verify")
+        assert response.status_code == 200
+        assert response.content == assemble(core, parts)
+        assert response.headers["etag"] == etag(core, parts)
+        assert "max-age=" in response.headers["cache-control"]
+
+
+def test_matching_etag_is_answered_with_304(monkeypatch):
+    client, stub = verify_client(monkeypatch)
+    core, parts = build_fragments()
+    asyncio.run(VerifyCache(stub).set(CODE, core, parts))
+
+    headers = {"If-None-Match": f'"stale", W/{etag(core, parts)}'}
+    response = client.get(f"/api/v1/certificate/{CODE}/verify", headers=headers)
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag(core, parts)
+
+    response = client.get(f"/api/v1/certificate/{CODE}/verify", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+    assert response.content == assemble(core, parts)
@@ -0,0 +1,117 @@
+"""
+Tests for the verify read model against the ORM path it replaced.
+For up to CODES existing certificates, loads each one
+  - ORM:      select(Certificate) + joinedload type/template and user/generation
+              + selectinload subject/topics, then flattened
+  - document: one json_build_object statement
+and checks that both produce the same verify fragments.
+Needs the database from .env (skipped when it is unreachable); no Redis or Keycloak.
+For timings see bench_verify_query.py.
+
+Usage:
+    poetry run pytest app/test/test_verify_query.py
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import joinedload, selectinload
+from app.db.database import AsyncSessionLocal, engine
+from app.models.certificate import Certificate
+from app.models.certificate_type import CertificateType
+from app.models.curriculum import Subject
+from app.models.user import User
+from app.services.certificate_service import _core_fragment, _parts
+from app.services.verify_query import verify_documents
+
+CODES = 200
+
+
+def orm_query():
+    """The verify query before the read model"""
+    return select(Certificate).options(
+        joinedload(Certificate.type).joinedload(CertificateType.template),
+        selectinload(Certificate.subject).selectinload(Subject.topics),
+        joinedload(Certificate.user).joinedload(User.generation),
+    )
+
+
+def flatten(cert: Certificate) -> dict:
+    """The ORM objects, flattened into the shape of a verify document"""
+    subject = None
+    if cert.subject:
+        subject = {
+            "id": cert.subject.id,
+            "name": cert.subject.name,
+            "level": cert.subject.level,
+            "topics": [
+                {"name": topic.name, "sort_order": topic.sort_order}
+                for topic in sorted(cert.subject.topics, key=lambda topic: (topic.sort_order, topic.id))
+            ],
+        }
+    layout = None
+    if cert.type:
+        template = cert.type.template
+        layout = {
+            "target_role": cert.type.target_role,
+            "template_id": str(template.id) if template else None,
+            "layout_config": template.layout_config if template else None,
+        }
+    return {
+        "certificate_number": cert.certificate_number,
+        "issued_date": cert.issued_date.isoformat(),
+        "verify_code": cert.verify_code,
+        "generation_name": cert.user.generation.name if cert.user and cert.user.generation else "N/A",
+        "subject_id": cert.subject_id,
+        "type_id": cert.type_id,
+        "user_id": str(cert.user_id) if cert.user_id else None,
+        "subject": subject,
+        "layout": layout,
+    }
+
+
+async def load_orm(codes: list[str]) -> list[dict]:
+    async with AsyncSessionLocal() as db:
+        docs = []
+        for code in codes:
+            result = await db.execute(orm_query().where(Certificate.verify_code == code))
+            docs.append(flatten(result.scalar_one()))
+            db.expunge_all()  # like a fresh request session
+        return docs
+
+
+async def load_documents(codes: list[str]) -> list[dict]:
+    async with AsyncSessionLocal() as db:
+        return [await db.scalar(verify_documents(Certificate.verify_code == code)) for code in codes]
+
+
+async def sample_codes(count: int) -> list[str]:
+    async with AsyncSessionLocal() as db:
+        return list((await db.scalars(select(Certificate.verify_code).limit(count))).all())
+
+
+async def load_both(count: int = CODES) -> tuple[list[dict], list[dict]]:
+    """
+    Up to `count` certificates loaded both ways; skips the test without a database
+    or data. One event loop for everything, and the pool is emptied before it
+    closes: pooled asyncpg connections only work on the loop that opened them.
+    """
+    try:
+        try:
+            codes = await sample_codes(count)
+        except (OSError, SQLAlchemyError) as e:
+            pytest.skip(f"Database unreachable: {e}")
+        if not codes:
+            pytest.skip("No certificates in the database")
+        return await load_orm(codes), await load_documents(codes)
+    finally:
+        await engine.dispose()
+
+
+def test_documents_match_orm_fragments():
+    orm_docs, docs = asyncio.run(load_both())
+
+    for orm_doc, doc in zip(orm_docs, docs):
+        assert _core_fragment(doc) == _core_fragment(orm_doc)
+        assert _parts(doc, None) == _parts(orm_doc, None)